@@ -0,0 +1,82 @@
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+
+from app.core.security import require_admin
+from app.core.profiling import profiler
+from app.core.compression import compression_stats
+from app.core.loop_monitor import loop_monitor
+from app.db.session import query_stats
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.get("/profiling")
+async def get_profiling():
+    return profiler.snapshot()
+
+
+@router.post("/profiling/start")
+async def start_profiling(
+    sample_rate: float = Query(..., ge=0.0, le=1.0),
+    mode: Literal["sample", "cprofile"] = Query("sample"),
+):
+    """Profile this share of requests until stopped; results add to what's already collected"""
+    profiler.start(sample_rate, mode)
+    return profiler.snapshot()
+
+
+@router.post("/profiling/stop")
+async def stop_profiling():
+    profiler.stop()
+    return profiler.snapshot()
+
+
+@router.delete("/profiling")
+async def reset_profiling():
+    profiler.reset()
+    return profiler.snapshot()
+
+
+@router.get("/profiling/collapsed")
+async def download_collapsed_stacks(route: Optional[str] = Query(None, description='e.g. "GET /{slug}"')):
+    """Sampled stacks for flamegraph.pl or speedscope, for one route or all of them"""
+    body = profiler.collapsed(route)
+    if not body:
+        raise HTTPException(status_code=404, detail="No samples collected")
+    return Response(
+        content=body,
+        media_type="text/plain",
+        headers={"Content-Disposition": 'attachment; filename="profile.collapsed"'},
+    )
+
+
+@router.get("/profiling/pstats")
+async def download_pstats(route: str = Query(..., description='e.g. "GET /{slug}"')):
+    """A route's cProfile data; load it with pstats, snakeviz or flameprof"""
+    body = profiler.pstats_dump(route)
+    if body is None:
+        raise HTTPException(status_code=404, detail="No cProfile data for this route")
+    return Response(
+        content=body,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": 'attachment; filename="profile.pstats"'},
+    )
+
+
+@router.get("/stats/loop")
+async def get_loop_stats():
+    """Loop lag and recent stalls, with the stacks that caused them"""
+    return loop_monitor.snapshot()
+
+
+@router.get("/stats/queries")
+async def get_query_stats(limit: int = Query(50, ge=1, le=500)):
+    """Database and storage calls that took the most total time, by call site"""
+    return query_stats.snapshot(limit)
+
+
+@router.get("/stats/compression")
+async def get_compression_stats():
+    """Compression ratio and CPU cost per route"""
+    return compression_stats.snapshot()
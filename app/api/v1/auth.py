@@ -5,8 +5,10 @@ from ...schemas.user.user import UserCreate, UserLogin, UserResponse, GoogleOAut
 from ...schemas.user.base import Token
 from ...services.auth import AuthService, validate_google_oauth_token
 from ...core.config import settings
+from ...db.columns import USER_LOGIN_COLUMNS
 from ...core.security import create_access_token, get_password_hash, verify_password
 from ...services.user import UserService
+from ...services.slug_routes import slug_routes
 import httpx
 from pydantic import BaseModel
 import random
@@ -136,6 +138,8 @@ async def register(user: UserCreate):
         result = supabase.table("users").insert(new_user).execute()
 
         if result.data and isinstance(result.data, list):
+            if result.data[0].get("slug"):
+                slug_routes.set_user(result.data[0]["slug"], result.data[0]["id"])
             return result.data[0]
         else:
             raise HTTPException(status_code=400, detail="Error inserting user into custom users table")
@@ -147,7 +151,7 @@ async def register(user: UserCreate):
 @router.post("/login", response_model=Token)
 async def login(user_credentials: UserLogin):
     try:
-        result = supabase.table("users").select("*").eq("email", user_credentials.email).execute()
+        result = supabase.table("users").select(USER_LOGIN_COLUMNS).eq("email", user_credentials.email).execute()
 
         if not result.data:
             raise HTTPException(status_code=401, detail="Incorrect email or password")
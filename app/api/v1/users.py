@@ -1,15 +1,41 @@
-from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Form, Query, Body
-from typing import Optional, Dict, Any, List
+from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Form, Query, Body, Request, Response
+from typing import Optional, Dict, Any, List, Tuple
+from datetime import datetime
 from sqlalchemy.exc import IntegrityError
 from pydantic import EmailStr, HttpUrl
 from app.schemas.user.business_card import BusinessCard, BusinessCardCreate, BusinessCardUpdate
 from app.schemas.user.user import UserResponse
+from app.db.columns import USER_COLUMNS, CARD_FIELDS, CARD_COLUMNS, select_fields
+from app.schemas.user.slug import SlugBatchCheck, SlugBatchCheckResponse
+from app.schemas.user.upload import SignedUploadRequest, SignedUploadResponse, FinalizeUpload
+from app.core.uploads import tier_cache, upload_limits
 from app.services.user import UserService
-from app.core.security import get_current_user
+from app.core.responses import trusted
+from app.core.http_cache import version_etag, latest, is_not_modified, validators, not_modified
+from app.core.security import get_current_user, get_token_subject, fetch_user_by_email, fetch_user_version_by_email, to_user_response, credentials_exception
 from app.services.business_card import BusinessCardService
+from app.services.slug_index import slug_index, normalize_slug, validate_slug
+from app.services.slug_resolver import slug_resolver
 import json
+import asyncio
+import logging
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+def _is_conditional(request: Request) -> bool:
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+def _me_version(user: Dict[str, Any], card: Optional[Dict[str, Any]]) -> Tuple[str, Optional[datetime]]:
+    card = card or {}
+    etag = version_etag("me", user["id"], user.get("updated_at"), card.get("id"), card.get("updated_at"))
+    return etag, latest(user.get("updated_at"), card.get("updated_at"))
+
+def _cards_version(cards: List[Dict[str, Any]], columns: str) -> Tuple[str, Optional[datetime]]:
+    versions = sorted((card["id"], card.get("updated_at") or "") for card in cards)
+    etag = version_etag("cards", columns, versions)
+    return etag, latest(*(updated_at for _, updated_at in versions))
 
 @router.get("/by-email")
 async def get_user_by_email(email: str = Query(...)):
@@ -17,12 +43,14 @@ async def get_user_by_email(email: str = Query(...)):
     Get user data by email with their primary business card information
     """
     try:
-        user = await UserService.get_by_email(email)
+        # The user and their primary card are independent lookups by email
+        user, business_card = await asyncio.gather(
+            UserService.get_by_email(email),
+            BusinessCardService.get_primary_by_user_email(email)
+        )
         
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
-        
-        business_card = await BusinessCardService.get_primary_by_user_id(user["id"])
     
         if not business_card:
             card_data = BusinessCardCreate(
@@ -40,14 +68,13 @@ async def get_user_by_email(email: str = Query(...)):
             "id": user["id"],
             "email": user["email"],
             "full_name": user["full_name"],
-            "username": user.get("username"),
             "slug": user["slug"],
             "business_card": business_card
         }
     except HTTPException as e:
         raise e
     except Exception as e:
-        print(f"Error in get_user_by_email: {str(e)}")
+        logger.error("Error in get_user_by_email: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
     
 @router.get("/by-email/{email}")
@@ -59,7 +86,7 @@ async def get_user_by_email(email: str):
             raise HTTPException(status_code=400, detail="Invalid email format")
             
         # Get user from database
-        user = await UserService.get_by_email(email)
+        user = await UserService.get_by_email(email, columns=f"{USER_COLUMNS}, subscription_tier")
         
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
@@ -77,17 +104,35 @@ async def get_user_by_email(email: str):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error fetching user by email: {str(e)}")
+        logger.error("Error fetching user by email: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user_data(current_user = Depends(get_current_user)):
+async def get_current_user_data(request: Request, response: Response, email: str = Depends(get_token_subject)):
+    # Revalidation only needs versions, so it is answered from a small probe
+    if _is_conditional(request):
+        version = await fetch_user_version_by_email(email)
+        if not version:
+            raise credentials_exception
+        cards = version.pop("business_cards", None) or []
+        etag, last_modified = _me_version(version, cards[0] if cards else None)
+        if is_not_modified(request.headers, etag, last_modified):
+            return not_modified(validators(etag, last_modified))
+
+    # The user and their primary card are fetched concurrently; both only need the email
+    user, business_card = await asyncio.gather(
+        fetch_user_by_email(email),
+        BusinessCardService.get_primary_by_user_email(email)
+    )
+    if not user:
+        raise credentials_exception
+
     try:
-        # Get user's primary business card
-        business_card = await BusinessCardService.get_primary_by_user_id(current_user.id)
-        
+        current_user = to_user_response(user)
+        response.headers.update(validators(*_me_version(user, business_card)))
+
         return {
             "id": current_user.id,
             "email": current_user.email,
@@ -145,24 +190,81 @@ async def check_slug_availability(slug: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/check-slugs", response_model=SlugBatchCheckResponse)
+async def check_slugs_availability(request: SlugBatchCheck):
+    """
+    Check many slug candidates at once and suggest available alternatives
+    for the ones that are taken
+    """
+    try:
+        await slug_index.ensure_loaded()
+
+        results = {}
+        valid = []
+        for raw in request.slugs:
+            slug = normalize_slug(raw)
+            error = validate_slug(slug)
+            if error:
+                results[slug] = {"available": False, "error": error}
+            elif slug not in results:
+                results[slug] = {"available": True}
+                valid.append(slug)
+
+        # Suggestion candidates for every slug are verified in the same batch
+        # lookup as the requested slugs, since the index may not know a slug is taken yet
+        candidates = {}
+        if request.suggestions:
+            for slug in valid:
+                candidates[slug] = slug_index.candidates(slug, request.title)[:request.suggestions * 2]
+
+        to_check = valid + [c for ranked in candidates.values() for c in ranked]
+        availability = await BusinessCardService.check_slugs_availability(list(dict.fromkeys(to_check)))
+
+        suggestions = {}
+        for slug in valid:
+            if availability.get(slug, False):
+                continue
+            results[slug] = {"available": False}
+            slug_index.add(slug)
+            if not request.suggestions:
+                continue
+            # Only candidates the query confirmed are offered
+            suggestions[slug] = [c for c in candidates[slug] if availability.get(c, False)][:request.suggestions]
+
+        return {"results": results, "suggestions": suggestions}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/{user_id}/business-cards", response_model=List[BusinessCard])
 async def get_user_business_cards(
     user_id: int,
+    request: Request,
+    fields: Optional[str] = Query(None),
     current_user = Depends(get_current_user)
 ):
     # Only allow users to access their own business cards
     if str(current_user.id) != str(user_id):
         raise HTTPException(status_code=403, detail="Not authorized to access this resource")
     
-    business_cards = await BusinessCardService.get_by_user_id(user_id)
-    return business_cards
+    # id and updated_at are always selected; they make up the version
+    columns = select_fields(fields, CARD_FIELDS, CARD_COLUMNS, always=("id", "updated_at"))
+    if _is_conditional(request):
+        versions = await BusinessCardService.get_versions_by_user_id(user_id)
+        etag, last_modified = _cards_version(versions, columns)
+        if is_not_modified(request.headers, etag, last_modified):
+            return not_modified(validators(etag, last_modified))
+
+    business_cards = await BusinessCardService.get_by_user_id(user_id, columns=columns)
+    # Rows come straight from our table; skip response_model re-validation
+    return trusted(business_cards, headers=validators(*_cards_version(business_cards, columns)))
 
 @router.get("/{user_id}/business-card", response_model=BusinessCard)
-async def get_user_primary_business_card(user_id: int):
-    business_card = await BusinessCardService.get_primary_by_user_id(user_id)
+async def get_user_primary_business_card(user_id: int, fields: Optional[str] = Query(None)):
+    columns = select_fields(fields, CARD_FIELDS, CARD_COLUMNS)
+    business_card = await BusinessCardService.get_primary_by_user_id(user_id, columns=columns)
     if not business_card:
         raise HTTPException(status_code=404, detail="Business card not found")
-    return business_card
+    return trusted(business_card)
 
 @router.post("/business-card", response_model=BusinessCard)
 async def create_business_card(
@@ -241,7 +343,7 @@ async def create_business_card(
         if not business_card:
             raise HTTPException(status_code=500, detail="Failed to create business card")
         
-        return business_card
+        return trusted(business_card)
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -259,16 +361,17 @@ async def update_business_card(
     contact: Optional[str] = Form(None),
     is_primary: Optional[bool] = Form(None),
     base_url: Optional[str] = Form(None),
+    expected_updated_at: Optional[str] = Form(None),
     photo: Optional[UploadFile] = File(None),
     company_logo: Optional[UploadFile] = File(None),
     current_user = Depends(get_current_user)
 ):
+    """
+    Update a business card. Ownership is enforced by the update itself, and
+    passing the card's last seen updated_at as expected_updated_at turns a
+    concurrent edit into a 409 instead of a silent overwrite.
+    """
     try:
-        # Verify card belongs to user
-        card = await BusinessCardService.get_by_id(card_id)
-        if not card or card.get('user_id') != current_user.id:
-            raise HTTPException(status_code=404, detail="Business card not found")
-        
         # Validate inputs
         if display_name is not None:
             if not display_name.strip():
@@ -286,12 +389,6 @@ async def update_business_card(
             if ' ' in slug:
                 raise HTTPException(status_code=400, detail="Slug cannot contain spaces")
                 
-            # Check slug availability (unless it's the same as current)
-            if slug != card.get('slug'):
-                slug_available = await UserService.check_slug_availability(slug)
-                if not slug_available:
-                    raise HTTPException(status_code=400, detail="Slug is already taken")
-                
         # Validate title
         if title is not None and len(title.strip()) > 40:
             raise HTTPException(status_code=400, detail="Title must be 40 characters or less")
@@ -328,10 +425,11 @@ async def update_business_card(
             photo=photo,
             company_logo=company_logo,
             current_user=current_user,
-            base_url=base_url
+            base_url=base_url,
+            expected_updated_at=expected_updated_at
         )
         
-        return updated_card
+        return trusted(updated_card)
         
     except HTTPException as e:
         raise e
@@ -384,42 +482,32 @@ async def set_primary_business_card(
         
         # Set as primary
         updated_card = await BusinessCardService.set_as_primary(card_id, current_user.id)
-        return updated_card
+        return trusted(updated_card)
     except HTTPException as e:
         raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/uploads/sign", response_model=SignedUploadResponse)
+async def sign_upload(request: SignedUploadRequest, current_user = Depends(get_current_user)):
+    """Signed URL to PUT a photo or logo straight to storage, then finalize it on a card"""
+    return await BusinessCardService.sign_upload(current_user.id, request.content_type)
+
+@router.post("/business-card/{card_id}/upload", response_model=BusinessCard)
+async def finalize_upload(card_id: int, upload: FinalizeUpload, current_user = Depends(get_current_user)):
+    tier = await tier_cache.get(current_user.email)
+    max_file_bytes, _ = upload_limits(tier)
+    card = await BusinessCardService.attach_upload(card_id, current_user.id, upload.kind.value, upload.path, max_file_bytes)
+    return trusted(card)
+
 @router.get("/{slug}", response_model=UserResponse)
 async def get_user_by_slug(slug: str):
     try:
-        user = await UserService.get_by_slug(slug)
-        
-        if not user:
-            # Check if the slug belongs to a business card
-            business_card = await BusinessCardService.get_by_slug(slug)
-            if not business_card:
-                raise HTTPException(status_code=404, detail="User not found")
-                
-            # Get the user associated with this business card
-            user = await UserService.get_user_by_id(business_card["user_id"])
-            if not user:
-                raise HTTPException(status_code=404, detail="User not found")
-                
-            return {
-                "id": user["id"],
-                "email": user["email"],
-                "full_name": user["full_name"],
-                "slug": user["slug"],
-                "created_at": user["created_at"],
-                "updated_at": user["updated_at"],
-                "google_id": None,
-                "business_card": business_card
-            }
-        
-        # Get user's primary business card
-        business_card = await BusinessCardService.get_primary_by_user_id(user["id"])
-        
+        resolved = await slug_resolver.resolve(slug)
+        if not resolved:
+            raise HTTPException(status_code=404, detail="User or business card not found")
+
+        user = resolved["user"]
         return {
             "id": user["id"],
             "email": user["email"],
@@ -428,17 +516,28 @@ async def get_user_by_slug(slug: str):
             "created_at": user["created_at"],
             "updated_at": user["updated_at"],
             "google_id": None,
-            "business_card": business_card
+            "business_card": resolved["card"]
         }
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        logger.error("Error in get_user_by_slug: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
 
 @router.get("/business-card/{slug}", response_model=BusinessCard)
-async def get_business_card_by_slug(slug: str):
-    business_card = await BusinessCardService.get_by_slug(slug)
-    if not business_card:
-        raise HTTPException(status_code=404, detail="Business card not found")
-    return business_card
+async def get_business_card_by_slug(slug: str, fields: Optional[str] = Query(None)):
+    try:
+        columns = select_fields(fields, CARD_FIELDS, CARD_COLUMNS, always=("id", "user_id", "slug"))
+        resolved = await slug_resolver.resolve(slug, card_columns=columns)
+        if not resolved or not resolved["card"]:
+            raise HTTPException(status_code=404, detail="Business card not found")
+
+        return trusted(resolved["card"])
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error in get_business_card_by_slug: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 @router.get("/me/qrcode", response_model=Dict[str, str])
 async def get_qr_code(
@@ -542,18 +641,13 @@ async def get_public_qr_code(
     base_url: Optional[str] = Query(None)
 ):
     try:
-        # Try to find business card by slug
-        business_card = await BusinessCardService.get_by_slug(slug)
-        
+        resolved = await slug_resolver.resolve(slug)
+        if not resolved:
+            raise HTTPException(status_code=404, detail="User or business card not found")
+
+        business_card = resolved["card"]
         if not business_card:
-            # If no direct match, try to find user and their primary card
-            user = await UserService.get_by_slug(slug)
-            if not user:
-                raise HTTPException(status_code=404, detail="User or business card not found")
-            
-            business_card = await BusinessCardService.get_primary_by_user_id(user["id"])
-            if not business_card:
-                raise HTTPException(status_code=404, detail="Business card not found")
+            raise HTTPException(status_code=404, detail="Business card not found")
         
         # Get QR code data
         qr_data = business_card.get('qr_code_url')
@@ -571,85 +665,3 @@ async def get_public_qr_code(
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate QR code: {str(e)}")
-    
-    
-# Fix for the FastAPI routes to properly handle slug lookups
-# Replace the current implementation of get_user_by_slug with this improved version
-
-@router.get("/{slug}", response_model=UserResponse)
-async def get_user_by_slug(slug: str):
-    try:
-        # Add logging to debug the issue
-        print(f"Looking up slug: {slug}")
-        
-        # First try to find a user with this slug
-        user = await UserService.get_by_slug(slug)
-        
-        if user:
-            # User found - get their primary business card
-            print(f"User found with slug: {slug}, user_id: {user['id']}")
-            business_card = await BusinessCardService.get_primary_by_user_id(user["id"])
-            
-            # Return user data with their business card
-            return {
-                "id": user["id"],
-                "email": user["email"],
-                "full_name": user["full_name"],
-                "slug": user["slug"],
-                "created_at": user["created_at"],
-                "updated_at": user["updated_at"],
-                "google_id": None,
-                "business_card": business_card
-            }
-        
-        # If no user found, try to find a business card with this slug
-        print(f"No user found with slug: {slug}, checking business cards")
-        business_card = await BusinessCardService.get_by_slug(slug)
-        
-        if not business_card:
-            print(f"No business card found with slug: {slug}")
-            raise HTTPException(status_code=404, detail="User or business card not found")
-        
-        # Business card found - get the associated user
-        print(f"Business card found with slug: {slug}, user_id: {business_card['user_id']}")
-        user_id = business_card["user_id"]
-        user = await UserService.get_user_by_id(user_id)
-        
-        if not user:
-            print(f"User not found for business card user_id: {user_id}")
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        # Found both the business card and its owner - return the data
-        return {
-            "id": user["id"],
-            "email": user["email"],
-            "full_name": user["full_name"],
-            "slug": user["slug"],
-            "created_at": user["created_at"],
-            "updated_at": user["updated_at"],
-            "google_id": None,
-            "business_card": business_card
-        }
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"Error in get_user_by_slug: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
-
-# Also fix the business card specific endpoint to be more robust
-@router.get("/business-card/{slug}", response_model=BusinessCard)
-async def get_business_card_by_slug(slug: str):
-    try:
-        print(f"Looking up business card with slug: {slug}")
-        business_card = await BusinessCardService.get_by_slug(slug)
-        
-        if not business_card:
-            print(f"No business card found with slug: {slug}")
-            raise HTTPException(status_code=404, detail="Business card not found")
-            
-        return business_card
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"Error in get_business_card_by_slug: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,174 @@
+# core/compression.py
+import time
+import zlib
+from typing import Optional, Dict, Any
+
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.http_cache import choose_encoding
+
+# Content types that are already compressed and don't shrink any further
+INCOMPRESSIBLE_TYPES = (
+    "image/png", "image/jpeg", "image/gif", "image/webp", "image/avif",
+    "video/", "audio/", "application/zip", "application/gzip", "font/woff",
+)
+
+
+def route_label(scope: Scope) -> str:
+    """Route template for a request (``/api/v1/profiles/{slug}``), never the raw path"""
+    route = scope.get("route")
+    if route is not None and hasattr(route, "path"):
+        return route.path
+    return "unmatched"
+
+
+class CompressionStats:
+    """Per-route bytes in/out and CPU time spent compressing"""
+
+    def __init__(self):
+        self.routes: Dict[str, Dict[str, float]] = {}
+
+    def record(self, route: str, encoding: str, bytes_in: int, bytes_out: int, cpu_seconds: float) -> None:
+        entry = self.routes.setdefault(route, {"responses": 0, "bytes_in": 0, "bytes_out": 0, "cpu_seconds": 0.0})
+        entry["responses"] += 1
+        entry["bytes_in"] += bytes_in
+        entry["bytes_out"] += bytes_out
+        entry["cpu_seconds"] += cpu_seconds
+        entry[encoding] = entry.get(encoding, 0) + 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        report = {}
+        for route, entry in self.routes.items():
+            report[route] = {
+                **entry,
+                "ratio": round(entry["bytes_out"] / entry["bytes_in"], 3) if entry["bytes_in"] else None,
+                "cpu_ms_per_response": round(entry["cpu_seconds"] * 1000 / entry["responses"], 3),
+            }
+        return report
+
+
+compression_stats = CompressionStats()
+
+
+class _Compressor:
+    """Incremental gzip or brotli encoder; every chunk is flushed so streams stay live"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits=31 writes the gzip header and trailer
+            self._gz = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, chunk: bytes, final: bool) -> bytes:
+        if self.encoding == "br":
+            out = self._br.process(chunk)
+            return out + (self._br.finish() if final else self._br.flush())
+        out = self._gz.compress(chunk)
+        return out + self._gz.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """Pure ASGI response compression.
+
+    Negotiates br or gzip from Accept-Encoding. Single-message responses
+    smaller than ``minimum_size`` are sent as-is, as are responses that
+    already carry a Content-Encoding (the public profile cache serves
+    pre-compressed bodies) and binary formats that are compressed already.
+    Streamed responses are compressed chunk by chunk rather than buffered.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 500, gzip_level: int = 6,
+                 brotli_quality: int = 4, stats: Optional[CompressionStats] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.stats = stats if stats is not None else compression_stats
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressingResponder(self, scope, send, encoding)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressingResponder:
+    def __init__(self, middleware: CompressionMiddleware, scope: Scope, send: Send, encoding: str):
+        self.middleware = middleware
+        self.scope = scope
+        self._send = send
+        self.encoding = encoding
+        self.start: Optional[Message] = None
+        self.compressor: Optional[_Compressor] = None
+        self.passthrough = False
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_seconds = 0.0
+
+    def _should_compress(self, headers: Headers, first_chunk: bytes, more_body: bool) -> bool:
+        if self.start["status"] < 200 or self.start["status"] in (204, 304):
+            return False
+        if "content-encoding" in headers or "no-transform" in headers.get("cache-control", ""):
+            return False
+        content_type = headers.get("content-type", "").lower()
+        if content_type.startswith(INCOMPRESSIBLE_TYPES):
+            return False
+        if more_body:
+            declared = headers.get("content-length")
+            return declared is None or int(declared) >= self.middleware.minimum_size
+        return len(first_chunk) >= self.middleware.minimum_size
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Held back until the first body chunk decides whether to compress
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None:
+            headers = MutableHeaders(raw=self.start["headers"])
+            if not self._should_compress(headers, body, more_body):
+                self.passthrough = True
+                await self._send(self.start)
+                await self._send(message)
+                return
+
+            self.compressor = _Compressor(self.encoding, self.middleware.gzip_level, self.middleware.brotli_quality)
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if "content-length" in headers:
+                del headers["Content-Length"]
+            # The encoded bytes differ, so a strong validator no longer applies
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = "W/" + etag
+            await self._send(self.start)
+
+        started = time.thread_time()
+        compressed = self.compressor.compress(body, final=not more_body)
+        self.cpu_seconds += time.thread_time() - started
+        self.bytes_in += len(body)
+        self.bytes_out += len(compressed)
+
+        await self._send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+        if not more_body:
+            self.middleware.stats.record(
+                route_label(self.scope), self.encoding, self.bytes_in, self.bytes_out, self.cpu_seconds
+            )
@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -12,6 +13,66 @@ class Settings(BaseSettings):
     GOOGLE_CLIENT_SECRET: str
     GOOGLE_CALLBACK_URL: str
 
+    # Where public profile pages live; QR codes point at {PUBLIC_BASE_URL}/{slug}
+    PUBLIC_BASE_URL: str = "http://localhost:5173"
+
+    # Per-worker slug routing table refresh
+    SLUG_ROUTES_ENABLED: bool = True
+    SLUG_ROUTES_POLL_SECONDS: float = 10.0
+
+    # Response compression; bodies below the threshold aren't worth the CPU
+    COMPRESSION_MINIMUM_SIZE: int = 500
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+
+    # Per-file upload caps by subscription tier
+    UPLOAD_MAX_FILE_MB_BASIC: int = 5
+    UPLOAD_MAX_FILE_MB_PREMIUM: int = 20
+
+    # Image derivatives rendered at upload time
+    IMAGE_WORKERS: int = 2
+    IMAGE_QUALITY: int = 80
+    IMAGE_AVIF_ENABLED: bool = False
+
+    # Background jobs for deferred side effects
+    JOBS_ENABLED: bool = True
+    JOB_WORKERS: int = 4
+    JOB_POLL_SECONDS: float = 5.0
+    JOB_MAX_ATTEMPTS: int = 8
+
+    # Trace spans: "file" writes JSON lines to TRACING_FILE, "otlp" needs the
+    # OpenTelemetry SDK and exporter installed
+    TRACING_ENABLED: bool = False
+    TRACING_EXPORTER: str = "file"
+    TRACING_FILE: str = "traces.jsonl"
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4317"
+    TRACING_SAMPLE_RATE: float = 1.0
+
+    # Database and storage calls slower than this go to the slow query log
+    SLOW_QUERY_MS: float = 250.0
+
+    # Admin endpoints are off unless this is set; send it as X-Admin-Token.
+    # A request with PROFILE_HEADER set to it is profiled on its own
+    ADMIN_TOKEN: Optional[str] = None
+    PROFILE_HEADER: str = "X-Profile"
+    PROFILE_SAMPLE_INTERVAL_MS: float = 5.0
+
+    # Root log level and "json" or "text" lines; DEBUG lines are kept for
+    # this share of requests
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"
+    LOG_DEBUG_SAMPLE_RATE: float = 0.01
+
+    # Event loop heartbeat; the loop thread's stack is captured when a
+    # callback holds the loop this long past a beat
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_MONITOR_INTERVAL_MS: float = 100.0
+    LOOP_STALL_THRESHOLD_MS: float = 100.0
+
+    # Storage objects younger than this are never collected as orphans; it
+    # must outlast a signed upload URL (2 hours) plus the attach call
+    STORAGE_GC_GRACE_HOURS: int = 24
+
     class Config:
         env_file = ".env"
 
@@ -0,0 +1,123 @@
+# core/http_cache.py
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional, Iterable, Dict, Any, Mapping
+
+from fastapi import Response
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag for a response body"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison, so W/ prefixes are ignored"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == wanted:
+            return True
+    return False
+
+
+def choose_encoding(accept_encoding: Optional[str], available: Iterable[str] = ("br", "gzip")) -> Optional[str]:
+    """Pick the best content coding the client accepts, or None for identity.
+
+    Server preference is the order of ``available``; a q-value of 0 excludes a
+    coding, and ``*`` stands for any coding not listed explicitly.
+    """
+    if not accept_encoding:
+        return None
+
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+
+    best, best_q = None, 0.0
+    for coding in available:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def version_etag(*parts: Any) -> str:
+    """Weak ETag from row versions (ids, updated_at stamps, projection).
+
+    Weak because it identifies the data rather than the exact bytes, which
+    also lets it survive re-serialization and content coding.
+    """
+    return 'W/"' + hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest() + '"'
+
+
+def parse_timestamp(value: Any) -> Optional[datetime]:
+    """Parse a DB timestamp (ISO string or datetime), None if missing or invalid"""
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def latest(*values: Any) -> Optional[datetime]:
+    """Most recent of several DB timestamps"""
+    stamps = [stamp for stamp in map(parse_timestamp, values) if stamp]
+    return max(stamps) if stamps else None
+
+
+def http_date(value: Any) -> Optional[str]:
+    stamp = parse_timestamp(value)
+    return format_datetime(stamp.astimezone(timezone.utc), usegmt=True) if stamp else None
+
+
+def is_not_modified(headers: Mapping[str, str], etag: str, last_modified: Any = None) -> bool:
+    """Evaluate If-None-Match, or If-Modified-Since when no ETag was sent (RFC 9110 13.2.2)"""
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+
+    if_modified_since = headers.get("if-modified-since")
+    modified = parse_timestamp(last_modified)
+    if not if_modified_since or modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # HTTP dates have one second resolution
+    return modified.replace(microsecond=0) <= since
+
+
+def validators(etag: str, last_modified: Any = None, cache_control: str = "private, no-cache") -> Dict[str, str]:
+    """ETag / Last-Modified / Cache-Control headers for a response"""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    modified = http_date(last_modified)
+    if modified:
+        headers["Last-Modified"] = modified
+    return headers
+
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    return Response(status_code=304, headers=headers)
@@ -0,0 +1,132 @@
+# core/logs.py
+import sys
+import json
+import queue
+import random
+import logging
+import secrets
+import contextvars
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+# Whether this request's DEBUG lines are kept; None outside a request
+_debug_sampled: contextvars.ContextVar[Optional[bool]] = contextvars.ContextVar("debug_sampled", default=None)
+
+# LogRecord attributes that aren't caller-supplied ``extra`` fields
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with ``extra`` fields kept as keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RequestContext(logging.Filter):
+    """Stamps the request id on records and samples DEBUG lines.
+
+    Runs where the record is logged, so the request's contextvars are
+    visible. DEBUG records are kept for a ``debug_sample_rate`` share of
+    requests, all or nothing per request so a kept request reads whole;
+    outside a request each DEBUG record is sampled on its own.
+    """
+
+    def __init__(self, debug_sample_rate: float = 1.0):
+        super().__init__()
+        self.debug_sample_rate = debug_sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        if record.levelno > logging.DEBUG or self.debug_sample_rate >= 1.0:
+            return True
+        sampled = _debug_sampled.get()
+        if sampled is None:
+            return random.random() < self.debug_sample_rate
+        return sampled
+
+
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging(level: str = "INFO", fmt: str = "json", debug_sample_rate: float = 1.0) -> None:
+    """
+    Route the root logger through a queue to a background writer thread.
+
+    Records are filtered and formatted where they're logged, which is cheap,
+    and the stdout write that can block happens on the listener's thread.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    handler = QueueHandler(queue.SimpleQueue())
+    handler.addFilter(RequestContext(debug_sample_rate))
+    handler.setFormatter(
+        JsonFormatter() if fmt == "json"
+        else logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+    )
+
+    root = logging.getLogger()
+    root.setLevel(level.upper())
+    root.addHandler(handler)
+
+    _listener = QueueListener(handler.queue, logging.StreamHandler(sys.stdout))
+    _listener.start()
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class RequestIdMiddleware:
+    """
+    Gives each HTTP request an id, taken from ``X-Request-ID`` when the
+    caller sends one, that every log line of the request carries. The id is
+    echoed back in the response headers.
+    """
+
+    def __init__(self, app: ASGIApp, debug_sample_rate: float = 1.0):
+        self.app = app
+        self.debug_sample_rate = debug_sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        rid = (Headers(scope=scope).get("x-request-id") or secrets.token_hex(8))[:64]
+        id_token = request_id.set(rid)
+        sampled_token = _debug_sampled.set(random.random() < self.debug_sample_rate)
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Request-ID", rid)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id.reset(id_token)
+            _debug_sampled.reset(sampled_token)
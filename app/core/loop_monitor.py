@@ -0,0 +1,158 @@
+# core/loop_monitor.py
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import deque
+from types import FrameType
+from typing import Optional, Dict, Any, Deque, Tuple
+
+from app.core.config import settings
+from app.core.metrics import Histogram, Exposition, labels
+
+stall_log = logging.getLogger("app.core.loop_stalls")
+
+# Lag is mostly sub-millisecond; the upper buckets are the stalls that matter
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+STACK_DEPTH = 20
+
+
+def blamed_function(frame: FrameType) -> Tuple[str, str]:
+    """(function, innermost line) to blame for a stack: the innermost frame in
+    app.services, else the innermost in app, else the innermost at all"""
+    innermost = f"{frame.f_code.co_filename}:{frame.f_lineno}"
+    fallback = None
+    app_frame = None
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        where = f"{module}:{frame.f_code.co_qualname}"
+        fallback = fallback or where
+        if module.startswith("app.services."):
+            return where, innermost
+        if module.startswith("app.") and app_frame is None:
+            app_frame = where
+        frame = frame.f_back
+    return app_frame or fallback or "unknown", innermost
+
+
+class LoopMonitor:
+    """Event loop lag and the stacks that cause it.
+
+    A heartbeat task sleeps for ``interval`` and measures how late it wakes
+    up; that lateness is the loop lag, kept as a histogram. A watchdog
+    thread checks the heartbeat, and once the loop has gone ``threshold``
+    past a beat it captures the loop thread's stack with
+    ``sys._current_frames``, so the code that is blocking is caught while
+    it still runs. Each stall is blamed on the innermost ``app.services``
+    function on that stack, logged to ``app.core.loop_stalls``, and counted
+    per function.
+    """
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.1, keep: int = 50):
+        self.interval = interval
+        self.threshold = threshold
+        self.lag = Histogram((), LAG_BUCKETS)
+        self.max_lag = 0.0
+        self.stalls: Dict[str, int] = {}
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=keep)
+        self._beat = 0.0
+        self._captured_beat = 0.0
+        self._pending: Optional[Dict[str, Any]] = None
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    async def _heartbeat(self) -> None:
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - started - self.interval)
+            self._beat = now
+            self.lag.observe((), lag)
+            self.max_lag = max(self.max_lag, lag)
+
+            stall = self._pending
+            if stall is not None:
+                # The loop is back; now we know how long it was blocked
+                self._pending = None
+                stall["blocked_ms"] = round(lag * 1000, 1)
+                stall_log.warning("loop_stall", extra=stall)
+
+    def _watch(self) -> None:
+        while not self._stopping.wait(self.threshold / 4):
+            beat = self._beat
+            if not beat or beat == self._captured_beat:
+                continue
+            if time.monotonic() - beat - self.interval < self.threshold:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            self._captured_beat = beat
+            self.capture(frame)
+
+    def capture(self, frame: FrameType) -> Dict[str, Any]:
+        function, line = blamed_function(frame)
+        stall = {
+            "function": function,
+            "line": line,
+            "stack": traceback.format_stack(frame)[-STACK_DEPTH:],
+            "at": time.time(),
+        }
+        self.stalls[function] = self.stalls.get(function, 0) + 1
+        self.recent.append(stall)
+        self._pending = stall
+        return stall
+
+    def start(self) -> None:
+        """Start monitoring the running loop; call from the loop's thread"""
+        if self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+            "stalls": dict(sorted(self.stalls.items(), key=lambda item: item[1], reverse=True)),
+            "recent": list(self.recent),
+        }
+
+    def expose(self, out: Exposition) -> None:
+        out.family(
+            "event_loop_lag_seconds", "histogram", "How late the loop heartbeat woke up.",
+            list(self.lag.samples()),
+        )
+        out.family(
+            "event_loop_stalls_total", "counter", "Loop stalls over the threshold, by blamed function.",
+            [("", labels(function=function), count) for function, count in sorted(self.stalls.items())],
+        )
+
+
+# Shared per-worker loop monitor
+loop_monitor = LoopMonitor(
+    interval=settings.LOOP_MONITOR_INTERVAL_MS / 1000,
+    threshold=settings.LOOP_STALL_THRESHOLD_MS / 1000,
+)
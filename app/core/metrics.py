@@ -0,0 +1,168 @@
+# core/metrics.py
+import time
+from bisect import bisect_left
+from typing import Dict, List, Tuple, Iterable
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.compression import CompressionStats, compression_stats, route_label
+
+# Upper bounds in seconds; +Inf is implied
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Starlette appends the charset
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def labels(**values: str) -> str:
+    """Prometheus label set, ``{a="1",b="2"}``, empty without labels"""
+    if not values:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in values.items()) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Exposition:
+    """Builds a Prometheus text-format response one metric family at a time"""
+
+    def __init__(self):
+        self.lines: List[str] = []
+
+    def family(self, name: str, kind: str, help_text: str, samples: Iterable[Tuple[str, str, float]]) -> None:
+        """samples are (suffix, label set, value), e.g. ("_bucket", '{le="0.1"}', 3)"""
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+        self.lines.extend(f"{name}{suffix}{label_set} {_number(value)}" for suffix, label_set, value in samples)
+
+    def render(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+class _Series:
+    __slots__ = ("buckets", "count", "total")
+
+    def __init__(self, bounds: int):
+        self.buckets = [0] * (bounds + 1)
+        self.count = 0
+        self.total = 0.0
+
+
+class Histogram:
+    """Observations bucketed per label tuple, in Prometheus histogram form"""
+
+    def __init__(self, label_names: Tuple[str, ...], buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.label_names = label_names
+        self.buckets = buckets
+        self.series: Dict[Tuple[str, ...], _Series] = {}
+
+    def observe(self, key: Tuple[str, ...], value: float) -> None:
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = _Series(len(self.buckets))
+        series.buckets[bisect_left(self.buckets, value)] += 1
+        series.count += 1
+        series.total += value
+
+    def samples(self) -> Iterable[Tuple[str, str, float]]:
+        for key, series in sorted(self.series.items()):
+            values = dict(zip(self.label_names, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series.buckets):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                yield "_bucket", labels(**values, le=le), cumulative
+            yield "_sum", labels(**values), series.total
+            yield "_count", labels(**values), series.count
+
+
+class RequestMetrics:
+    """Per-worker request counts and latency histograms by route template.
+
+    Labels are the matched route's template, never the raw path, so the number
+    of series is bounded by the number of routes. Each worker process keeps
+    its own counters; Prometheus sums them per instance.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.requests: Dict[Tuple[str, str, str], int] = {}
+        self.latency = Histogram(("method", "route"), buckets)
+        self.in_progress = 0
+
+    def record(self, method: str, route: str, status: int, seconds: float) -> None:
+        key = (method, route, str(status))
+        self.requests[key] = self.requests.get(key, 0) + 1
+        self.latency.observe((method, route), seconds)
+
+    def expose(self, out: Exposition) -> None:
+        out.family(
+            "http_requests_total", "counter", "Requests by method, route template and status code.",
+            (("", labels(method=m, route=r, status=s), n) for (m, r, s), n in sorted(self.requests.items())),
+        )
+        out.family(
+            "http_requests_in_progress", "gauge", "Requests being handled by this worker.",
+            [("", "", self.in_progress)],
+        )
+        out.family(
+            "http_request_duration_seconds", "histogram", "Time to the end of the response body.",
+            self.latency.samples(),
+        )
+
+
+request_metrics = RequestMetrics()
+
+
+def expose_compression(out: Exposition, stats: CompressionStats = compression_stats) -> None:
+    routes = sorted(stats.routes.items())
+    out.family(
+        "http_compressed_responses_total", "counter", "Compressed responses by route template and encoding.",
+        (("", labels(route=route, encoding=encoding), entry[encoding])
+         for route, entry in routes for encoding in ("br", "gzip") if encoding in entry),
+    )
+    for name, key, help_text in (
+        ("http_compression_bytes_in_total", "bytes_in", "Response bytes before compression."),
+        ("http_compression_bytes_out_total", "bytes_out", "Response bytes after compression."),
+        ("http_compression_cpu_seconds_total", "cpu_seconds", "Thread CPU time spent compressing."),
+    ):
+        out.family(name, "counter", help_text, (("", labels(route=route), entry[key]) for route, entry in routes))
+
+
+def expose_counters(out: Exposition, name: str, help_text: str, label: str, counters: Dict[str, int]) -> None:
+    """One counter family from a flat stats dict, keyed by a single label"""
+    out.family(name, "counter", help_text, (("", labels(**{label: key}), value) for key, value in sorted(counters.items())))
+
+
+class MetricsMiddleware:
+    """Times every HTTP request and records it under its route template"""
+
+    def __init__(self, app: ASGIApp, metrics: RequestMetrics = None):
+        self.app = app
+        self.metrics = metrics if metrics is not None else request_metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def timed_send(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.metrics.in_progress += 1
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            self.metrics.in_progress -= 1
+            # The router fills in scope["route"] on the way in
+            self.metrics.record(scope["method"], route_label(scope), status, time.perf_counter() - started)
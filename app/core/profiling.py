@@ -0,0 +1,222 @@
+# core/profiling.py
+import sys
+import random
+import secrets
+import marshal
+import cProfile
+import pstats
+import threading
+from collections import Counter
+from types import FrameType
+from typing import Optional, Dict, Any, Callable, Awaitable
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.compression import route_label
+
+MODES = ("sample", "cprofile")
+
+# Distinct stacks kept per route; the rest are counted under one line
+MAX_STACKS = 5000
+
+STACK_DEPTH = 64
+
+
+def collapse(frame: FrameType) -> str:
+    """A stack in collapsed form, outermost first: ``mod:fn;mod:fn;...``"""
+    names = []
+    while frame is not None and len(names) < STACK_DEPTH:
+        names.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_qualname}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class _Sampler:
+    """Samples one thread's stack every ``interval`` seconds from a background thread"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.counts[collapse(frame)] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.counts
+
+
+class RequestProfiler:
+    """Profiles chosen production requests, aggregated per route template.
+
+    A request is profiled when it's picked at ``sample_rate`` (switched on
+    and off at runtime from the admin endpoints), or when it carries
+    ``header`` set to the admin token. ``mode`` is either:
+
+    - ``sample``: a thread samples the event loop's stack every ``interval``
+      while the request is in flight. Results are wall-clock collapsed
+      stacks that flamegraph.pl and speedscope read directly.
+    - ``cprofile``: deterministic profiling with cProfile. Results are
+      pstats data for snakeviz or ``python -m pstats``.
+
+    Both see the whole loop thread, so anything interleaved with the request
+    is counted too. Only one request is profiled at a time, which keeps that
+    noise and the overhead bounded. Work in ``asyncio.to_thread`` workers
+    isn't seen, only the loop waiting on it. With sampling off, a request
+    costs an attribute check, plus a scan of its headers if a token is set.
+    """
+
+    def __init__(self, token: Optional[str] = None, header: str = "X-Profile", interval: float = 0.005):
+        self.token = token
+        self.header = header.lower().encode("latin-1")
+        self.interval = interval
+        self.sample_rate = 0.0
+        self.mode = "sample"
+        self.requests: Counter = Counter()
+        self.stacks: Dict[str, Counter] = {}
+        self.stats: Dict[str, pstats.Stats] = {}
+        self.skipped = 0
+        self._busy = False
+
+    @property
+    def armed(self) -> bool:
+        return self.sample_rate > 0 or self.token is not None
+
+    def start(self, sample_rate: float, mode: str = "sample") -> None:
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("sample_rate must be between 0 and 1")
+        self.mode = mode
+        self.sample_rate = sample_rate
+
+    def stop(self) -> None:
+        self.sample_rate = 0.0
+
+    def reset(self) -> None:
+        self.requests.clear()
+        self.stacks.clear()
+        self.stats.clear()
+        self.skipped = 0
+
+    def wanted(self, scope: Scope) -> bool:
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        if self.token is None:
+            return False
+        for name, value in scope["headers"]:
+            if name == self.header:
+                return secrets.compare_digest(value, self.token.encode("latin-1"))
+        return False
+
+    async def profile(self, scope: Scope, call: Callable[[], Awaitable[None]]) -> None:
+        if self._busy:
+            self.skipped += 1
+            await call()
+            return
+
+        self._busy = True
+        try:
+            if self.mode == "cprofile":
+                profile = cProfile.Profile()
+                profile.enable()
+                try:
+                    await call()
+                finally:
+                    profile.disable()
+                self._add_stats(self._route(scope), profile)
+            else:
+                sampler = _Sampler(threading.get_ident(), self.interval)
+                sampler.start()
+                try:
+                    await call()
+                finally:
+                    counts = sampler.stop()
+                self._add_stacks(self._route(scope), counts)
+        finally:
+            self._busy = False
+
+    @staticmethod
+    def _route(scope: Scope) -> str:
+        # The router fills in scope["route"] on the way in
+        return f"{scope['method']} {route_label(scope)}"
+
+    def _add_stacks(self, route: str, counts: Counter) -> None:
+        self.requests[route] += 1
+        stacks = self.stacks.setdefault(route, Counter())
+        for stack, count in counts.items():
+            if stack in stacks or len(stacks) < MAX_STACKS:
+                stacks[stack] += count
+            else:
+                stacks["[other stacks]"] += count
+
+    def _add_stats(self, route: str, profile: cProfile.Profile) -> None:
+        self.requests[route] += 1
+        if route in self.stats:
+            self.stats[route].add(profile)
+        else:
+            self.stats[route] = pstats.Stats(profile)
+
+    def collapsed(self, route: Optional[str] = None) -> str:
+        """Collapsed stacks, one ``stack count`` line each, rooted at the route"""
+        lines = []
+        for name, stacks in sorted(self.stacks.items()):
+            if route is not None and name != route:
+                continue
+            for stack, count in stacks.most_common():
+                lines.append(f"{name};{stack} {count}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def pstats_dump(self, route: str) -> Optional[bytes]:
+        """A route's cProfile data in the format ``pstats.Stats`` loads from a file"""
+        stats = self.stats.get(route)
+        return marshal.dumps(stats.stats) if stats is not None else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "sample_rate": self.sample_rate,
+            "header": self.header.decode("latin-1") if self.token else None,
+            "skipped": self.skipped,
+            "routes": {
+                route: {
+                    "requests": count,
+                    "samples": sum(self.stacks[route].values()) if route in self.stacks else None,
+                    "pstats": route in self.stats,
+                }
+                for route, count in self.requests.most_common()
+            },
+        }
+
+
+# Shared per-worker profiler
+profiler = RequestProfiler(
+    token=settings.ADMIN_TOKEN,
+    header=settings.PROFILE_HEADER,
+    interval=settings.PROFILE_SAMPLE_INTERVAL_MS / 1000,
+)
+
+
+class ProfilingMiddleware:
+    """Hands requests the profiler picks to it, keyed by route template"""
+
+    def __init__(self, app: ASGIApp, profiler: RequestProfiler = profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.profiler.armed or not self.profiler.wanted(scope):
+            await self.app(scope, receive, send)
+            return
+        await self.profiler.profile(scope, lambda: self.app(scope, receive, send))
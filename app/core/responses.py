@@ -0,0 +1,45 @@
+# core/responses.py
+from decimal import Decimal
+from typing import Any, Optional, Dict
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from pydantic_core import Url, MultiHostUrl
+
+
+def _default(obj: Any) -> Any:
+    """Types orjson doesn't know natively; anything else is an error, not a string"""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (Url, MultiHostUrl)):
+        return str(obj)
+    if isinstance(obj, Decimal):
+        # As jsonable_encoder does: whole numbers stay ints
+        return int(obj) if obj.as_tuple().exponent >= 0 else float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson. datetimes, dicts and lists of DB rows
+    are encoded natively without a jsonable_encoder pass.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def trusted(content: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> FastJSONResponse:
+    """
+    Return DB rows we already trust as-is. Returning a Response from a route
+    makes FastAPI skip response_model validation and jsonable_encoder, so use
+    this only for data that came from our own tables.
+    """
+    return FastJSONResponse(content=content, status_code=status_code, headers=headers)
@@ -1,21 +1,26 @@
 # core/security.py
-from fastapi import Depends, HTTPException
+import secrets
+from fastapi import Depends, Header, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from typing import Optional
-from app.db.session import get_supabase
+from app.db.session import get_supabase, run_query
+from app.db.columns import USER_COLUMNS
 from app.core.config import settings
+from app.core.tracing import traced
 from app.schemas.user.user import UserResponse
 
 # OAuth2 password bearer token
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login")
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+@traced("bcrypt.hash")
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+@traced("bcrypt.verify")
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -25,36 +30,60 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.ALGORITHM)
 
-def get_current_user(token: str = Depends(oauth2_scheme)) -> UserResponse:
-    credentials_exception = HTTPException(
-        status_code=401,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+credentials_exception = HTTPException(
+    status_code=401,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
 
+def get_token_subject(token: str = Depends(oauth2_scheme)) -> str:
+    """Validate the bearer token and return its subject (the user's email)"""
     try:
         payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")  # Using email as the subject
+    except JWTError:
+        raise credentials_exception
+
+    email: str = payload.get("sub")  # Using email as the subject
+    if email is None:
+        raise credentials_exception
+    return email
 
-        if email is None:
-            raise credentials_exception
+async def fetch_user_by_email(email: str) -> Optional[dict]:
+    supabase = get_supabase()
+    user_data = await run_query(supabase.table("users").select(USER_COLUMNS).eq("email", email))
+    return user_data.data[0] if user_data.data else None
 
-        supabase = get_supabase()
-        user_data = supabase.table("users").select("*").eq("email", email).execute()
+async def fetch_user_version_by_email(email: str) -> Optional[dict]:
+    """id and updated_at of a user and of their primary card, for conditional GETs"""
+    supabase = get_supabase()
+    user_data = await run_query(
+        supabase.table("users")
+        .select("id, updated_at, business_cards(id, updated_at)")
+        .eq("email", email)
+        .eq("business_cards.is_primary", True)
+    )
+    return user_data.data[0] if user_data.data else None
 
-        if not user_data.data:
-            raise credentials_exception
+def to_user_response(user: dict) -> UserResponse:
+    return UserResponse(
+        id=user["id"],
+        email=user["email"],
+        full_name=user["full_name"],
+        slug=user["slug"],
+        created_at=user["created_at"],
+        updated_at=user["updated_at"],
+        google_id=user.get("google_id")
+    )
 
-        user = user_data.data[0]
-        return UserResponse(
-            id=user["id"],
-            email=user["email"],
-            full_name=user["full_name"],
-            slug=user["slug"],
-            created_at=user["created_at"],
-            updated_at=user["updated_at"],
-            google_id=user.get("google_id")
-        )
+async def get_current_user(email: str = Depends(get_token_subject)) -> UserResponse:
+    user = await fetch_user_by_email(email)
+    if not user:
+        raise credentials_exception
+    return to_user_response(user)
 
-    except JWTError:
-        raise credentials_exception
\ No newline at end of file
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Admin endpoints take ADMIN_TOKEN in X-Admin-Token, and don't exist without one set"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
@@ -0,0 +1,275 @@
+# core/tracing.py
+import json
+import queue
+import logging
+import random
+import secrets
+import inspect
+import functools
+import threading
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, Tuple, Iterator
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.compression import route_label
+
+logger = logging.getLogger(__name__)
+
+try:
+    from opentelemetry import trace as otel_trace, propagate as otel_propagate
+except ImportError:  # OpenTelemetry is optional; spans go to a JSONL file without it
+    otel_trace = None
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """(trace id, parent span id, sampled) from a W3C traceparent header"""
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        sampled = bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None
+    return parts[1], parts[2], sampled
+
+
+class _NoopSpan:
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def update_name(self, name: str) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    """A finished-on-exit span with OpenTelemetry's field names"""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attributes", "start_ns", "end_ns", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def update_name(self, name: str) -> None:
+        self.name = name
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "status": {"code": "ERROR", "description": self.error} if self.error else {"code": "UNSET"},
+        }
+
+
+class FileExporter:
+    """Appends finished spans to a JSONL file from a background thread"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: "queue.SimpleQueue[Optional[Dict[str, Any]]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def export(self, span: Dict[str, Any]) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._write, name="span-exporter", daemon=True)
+                    self._thread.start()
+        self._queue.put(span)
+
+    def _write(self) -> None:
+        with open(self.path, "a") as out:
+            while True:
+                span = self._queue.get()
+                if span is None:
+                    return
+                out.write(json.dumps(span, default=str) + "\n")
+                if self._queue.empty():
+                    out.flush()
+
+    def shutdown(self) -> None:
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+# Marks a request that wasn't sampled, so its child spans are skipped too
+_UNSAMPLED = object()
+_current: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+def _otlp_tracer(endpoint: str):
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+    except ImportError:
+        logger.warning("OpenTelemetry SDK or OTLP exporter not installed, writing spans to a file instead")
+        return None
+    provider = TracerProvider(resource=Resource.create({"service.name": "kinvo-api"}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=endpoint, insecure=True)))
+    otel_trace.set_tracer_provider(provider)
+    return otel_trace.get_tracer("kinvo")
+
+
+class Tracer:
+    """Trace spans for requests and the work done inside them.
+
+    With ``exporter="otlp"`` and the OpenTelemetry SDK installed, spans go to
+    an OTLP collector through OpenTelemetry. Otherwise a small built-in
+    tracer writes them to ``path`` as JSON lines with OpenTelemetry field
+    names. Either way, ``traceparent`` headers are honoured and the sampling
+    decision is made once per trace.
+
+    Spans follow contextvars, so they nest across awaits and into
+    ``asyncio.to_thread`` workers. Disabled, ``span`` costs a function call.
+    """
+
+    def __init__(self, enabled: bool = False, exporter: str = "file", path: str = "traces.jsonl",
+                 sample_rate: float = 1.0, otlp_endpoint: str = "http://localhost:4317"):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self._otel = None
+        self._file: Optional[FileExporter] = None
+        if enabled and exporter == "otlp" and otel_trace is not None:
+            self._otel = _otlp_tracer(otlp_endpoint)
+        if enabled and self._otel is None:
+            self._file = FileExporter(path)
+
+    @contextmanager
+    def span(self, name: str, traceparent: Optional[str] = None, **attributes: Any) -> Iterator[Any]:
+        if not self.enabled:
+            yield _NOOP
+            return
+
+        if self._otel is not None:
+            context = otel_propagate.extract({"traceparent": traceparent}) if traceparent else None
+            with self._otel.start_as_current_span(name, context=context, attributes=attributes) as span:
+                yield span
+            return
+
+        parent = _current.get()
+        if parent is _UNSAMPLED:
+            yield _NOOP
+            return
+        if parent is not None:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        else:
+            remote = parse_traceparent(traceparent)
+            if remote:
+                trace_id, parent_id, sampled = remote
+            else:
+                trace_id, parent_id, sampled = secrets.token_hex(16), None, random.random() < self.sample_rate
+            if not sampled:
+                token = _current.set(_UNSAMPLED)
+                try:
+                    yield _NOOP
+                finally:
+                    _current.reset(token)
+                return
+
+        span = Span(name, trace_id, parent_id, attributes)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current.reset(token)
+            span.end_ns = time.time_ns()
+            self._file.export(span.to_dict())
+
+    def shutdown(self) -> None:
+        if self._file is not None:
+            self._file.shutdown()
+
+
+# Shared per-worker tracer
+tracer = Tracer(
+    enabled=settings.TRACING_ENABLED,
+    exporter=settings.TRACING_EXPORTER,
+    path=settings.TRACING_FILE,
+    sample_rate=settings.TRACING_SAMPLE_RATE,
+    otlp_endpoint=settings.TRACING_OTLP_ENDPOINT,
+)
+
+
+def traced(name: Optional[str] = None):
+    """Run a function, sync or async, inside a span named after it"""
+    def decorate(fn):
+        span_name = name or fn.__qualname__
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if not tracer.enabled:
+                    return await fn(*args, **kwargs)
+                with tracer.span(span_name, **{"code.function": span_name}):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return fn(*args, **kwargs)
+            with tracer.span(span_name, **{"code.function": span_name}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class TracingMiddleware:
+    """Root span per HTTP request, named after the route template once routing is done"""
+
+    def __init__(self, app: ASGIApp, tracer: Tracer = tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        traceparent = Headers(scope=scope).get("traceparent")
+        with self.tracer.span(f"{method}", traceparent, **{"http.method": method, "http.target": scope["path"]}) as span:
+            async def traced_send(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                await send(message)
+
+            try:
+                await self.app(scope, receive, traced_send)
+            finally:
+                route = route_label(scope)
+                span.update_name(f"{method} {route}")
+                span.set_attribute("http.route", route)
@@ -0,0 +1,289 @@
+# core/uploads.py
+import re
+import time
+from typing import Optional, Dict, Tuple
+
+from fastapi import HTTPException, UploadFile
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.security import get_token_subject
+from app.db.session import get_supabase, run_query
+
+# Image types we accept, keyed by MIME type, with the extension stored files get
+IMAGE_EXTENSIONS = {
+    "image/png": "png",
+    "image/jpeg": "jpg",
+    "image/gif": "gif",
+    "image/webp": "webp",
+    "image/avif": "avif",
+}
+
+SNIFF_BYTES = 32
+
+# Form fields other than the files; anything past this is file data
+FORM_OVERHEAD_BYTES = 64 * 1024
+FILES_PER_REQUEST = 2  # photo and company_logo
+
+GUARDED_ROUTES = (
+    ("POST", re.compile(r"^/api/v1/users/business-card/?$")),
+    ("PUT", re.compile(r"^/api/v1/users/business-card/\d+/?$")),
+)
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """MIME type of an image from its leading bytes, None if it isn't one we accept"""
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:12] in (b"ftypavif", b"ftypavis"):
+        return "image/avif"
+    return None
+
+
+async def sniff_upload(upload: UploadFile) -> Tuple[str, str]:
+    """(content type, extension) of an uploaded image from its contents, never its filename"""
+    await upload.seek(0)
+    content_type = sniff_image_type(await upload.read(SNIFF_BYTES))
+    await upload.seek(0)
+    if content_type is None:
+        raise HTTPException(status_code=415, detail="Unsupported image type")
+    return content_type, IMAGE_EXTENSIONS[content_type]
+
+
+def upload_limits(tier: str) -> Tuple[int, int]:
+    """(per file, per request) byte caps for a subscription tier"""
+    per_file_mb = settings.UPLOAD_MAX_FILE_MB_PREMIUM if tier == "premium" else settings.UPLOAD_MAX_FILE_MB_BASIC
+    per_file = per_file_mb * 1024 * 1024
+    return per_file, per_file * FILES_PER_REQUEST + FORM_OVERHEAD_BYTES
+
+
+class TierCache:
+    """Per-worker email -> subscription tier cache, so the guard rarely hits the DB"""
+
+    def __init__(self, ttl_seconds: float = 300.0, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: Dict[str, Tuple[str, float]] = {}
+
+    async def get(self, email: str) -> str:
+        cached = self._entries.get(email)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+
+        supabase = get_supabase()
+        result = await run_query(supabase.table("users").select("subscription_tier").eq("email", email).limit(1))
+        tier = ((result.data[0].get("subscription_tier") if result.data else None) or "basic").lower()
+
+        if len(self._entries) >= self.max_entries:
+            self._entries.clear()
+        self._entries[email] = (tier, time.monotonic() + self.ttl_seconds)
+        return tier
+
+
+tier_cache = TierCache()
+
+
+class UploadRejected(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class _MultipartInspector:
+    """Follows a multipart body as it arrives, tracking file sizes and sniffing each file's first bytes"""
+
+    def __init__(self, boundary: bytes):
+        self.largest_file = 0
+        self.rejected_type = False
+        self._header_field = b""
+        self._header_value = b""
+        self._is_file = False
+        self._file_bytes = 0
+        self._head = b""
+        self._parser = MultipartParser(boundary, callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def feed(self, chunk: bytes) -> None:
+        if chunk:
+            self._parser.write(chunk)
+
+    def _on_part_begin(self) -> None:
+        self._is_file = False
+        self._file_bytes = 0
+        self._head = b""
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        if self._header_field.lower() == b"content-disposition":
+            _, options = parse_options_header(self._header_value)
+            self._is_file = b"filename" in options
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if not self._is_file:
+            return
+        self._file_bytes += end - start
+        self.largest_file = max(self.largest_file, self._file_bytes)
+        if len(self._head) < SNIFF_BYTES:
+            self._head += data[start:min(end, start + SNIFF_BYTES - len(self._head))]
+            if len(self._head) >= SNIFF_BYTES:
+                self._check_head()
+
+    def _on_part_end(self) -> None:
+        # Files shorter than the sniff window, including empty optional fields
+        if self._is_file and len(self._head) < SNIFF_BYTES and self._file_bytes:
+            self._check_head()
+
+    def _check_head(self) -> None:
+        if sniff_image_type(self._head) is None:
+            self.rejected_type = True
+
+
+class UploadGuardMiddleware:
+    """
+    Rejects bad card uploads before the multipart body is parsed and spooled.
+
+    A declared Content-Length over the caller's per-request cap is refused
+    before any of the body is read. Otherwise the body is watched as it is
+    received, including chunked bodies without a length. The request is
+    refused as soon as it passes the cap, a file passes the per-file cap,
+    or a file's first bytes aren't a supported image type.
+
+    Caps depend on the caller's subscription tier. The tier is only looked up,
+    through a per-worker cache, once a request gets bigger than the basic caps.
+    """
+
+    def __init__(self, app: ASGIApp, tiers: Optional[TierCache] = None):
+        self.app = app
+        self.tiers = tiers if tiers is not None else tier_cache
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._guarded(scope):
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        guard = _RequestGuard(self, headers)
+        started = False
+        rejected = False
+
+        async def reject(e: UploadRejected) -> None:
+            nonlocal rejected
+            rejected = True
+            # Tell the client not to keep the connection for the rest of the body
+            response = JSONResponse({"detail": e.detail}, status_code=e.status_code, headers={"Connection": "close"})
+            await response(scope, receive, send)
+
+        async def guarded_receive() -> Message:
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request" and not started:
+                try:
+                    await guard.check(message.get("body", b""))
+                except UploadRejected as e:
+                    # FastAPI turns errors raised while reading the form into a
+                    # 400, so answer here and make the app see a disconnect
+                    await reject(e)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message: Message) -> None:
+            nonlocal started
+            if rejected:
+                return
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await guard.check_declared_length()
+        except UploadRejected as e:
+            await reject(e)
+            return
+        await self.app(scope, guarded_receive, guarded_send)
+
+    @staticmethod
+    def _guarded(scope: Scope) -> bool:
+        return any(scope["method"] == method and pattern.match(scope["path"]) for method, pattern in GUARDED_ROUTES)
+
+    async def limits_for(self, headers: Headers) -> Tuple[int, int]:
+        authorization = headers.get("authorization", "")
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return upload_limits("basic")
+        try:
+            email = get_token_subject(token)
+        except HTTPException:
+            return upload_limits("basic")
+        return upload_limits(await self.tiers.get(email))
+
+
+class _RequestGuard:
+    def __init__(self, middleware: UploadGuardMiddleware, headers: Headers):
+        self.middleware = middleware
+        self.headers = headers
+        self.received = 0
+        self.limits = upload_limits("basic")
+        self._tier_known = False
+        self.inspector = None
+
+        content_type, options = parse_options_header(headers.get("content-type", ""))
+        if content_type == b"multipart/form-data" and options.get(b"boundary"):
+            self.inspector = _MultipartInspector(options[b"boundary"])
+
+    async def _raise_limits(self) -> None:
+        # Basic caps are exceeded; only now is it worth finding out the tier
+        if not self._tier_known:
+            self.limits = await self.middleware.limits_for(self.headers)
+            self._tier_known = True
+
+    async def check_declared_length(self) -> None:
+        declared = self.headers.get("content-length")
+        if declared and declared.isdigit() and int(declared) > self.limits[1]:
+            await self._raise_limits()
+            if int(declared) > self.limits[1]:
+                raise UploadRejected(413, "Upload too large")
+
+    async def check(self, chunk: bytes) -> None:
+        self.received += len(chunk)
+        if self.inspector is not None:
+            try:
+                self.inspector.feed(chunk)
+            except Exception:
+                # Malformed bodies are left for the form parser to report
+                self.inspector = None
+            if self.inspector is not None and self.inspector.rejected_type:
+                raise UploadRejected(415, "Unsupported image type")
+
+        largest_file = self.inspector.largest_file if self.inspector is not None else 0
+        per_file, per_request = self.limits
+        if self.received > per_request or largest_file > per_file:
+            await self._raise_limits()
+            per_file, per_request = self.limits
+            if self.received > per_request:
+                raise UploadRejected(413, "Upload too large")
+            if largest_file > per_file:
+                raise UploadRejected(413, "File too large")
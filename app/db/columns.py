@@ -0,0 +1,54 @@
+from typing import Optional, Iterable, List
+from fastapi import HTTPException
+
+# Column projections per use case, as PostgREST select lists. Reads should
+# ask for one of these instead of "*" so unused columns (and secrets such as
+# hashed_password) never leave the database.
+
+CARD_FIELDS = (
+    "id", "user_id", "display_name", "slug", "photo_url", "company_logo_url",
+    "title", "bio", "email", "website", "contact", "qr_code_url", "is_primary",
+    "created_at", "updated_at",
+)
+
+# Everything the owner sees and the BusinessCard schema describes
+CARD_COLUMNS = ", ".join(CARD_FIELDS)
+
+# What the public profile pages render, plus the ids needed to verify a lookup
+PROFILE_FIELDS = (
+    "display_name", "slug", "title", "bio", "photo_url", "company_logo_url",
+    "website", "contact",
+)
+PROFILE_CARD_COLUMNS = ", ".join(("id", "user_id") + PROFILE_FIELDS + ("updated_at",))
+
+# A user as returned by the API; never includes hashed_password
+USER_COLUMNS = "id, email, full_name, slug, created_at, updated_at, google_id"
+
+# Only what password login needs
+USER_LOGIN_COLUMNS = "id, email, hashed_password"
+
+
+def field_list(fields: Optional[str]) -> Optional[List[str]]:
+    """Split a ``fields=a,b,c`` query parameter, None when absent"""
+    if not fields:
+        return None
+    return [f.strip() for f in fields.split(",") if f.strip()] or None
+
+
+def select_fields(fields: Optional[str], allowed: Iterable[str], default: str, always: Iterable[str] = ()) -> str:
+    """Turn a ``fields=a,b,c`` query parameter into a PostgREST column list.
+
+    Unknown fields are rejected with 400. Columns in ``always`` are added
+    because the caller needs them regardless of what the client asked for.
+    """
+    requested = field_list(fields)
+    if not requested:
+        return default
+
+    allowed = set(allowed)
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    columns = list(always) + [f for f in requested if f not in always]
+    return ", ".join(dict.fromkeys(columns))
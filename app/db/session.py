@@ -1,15 +1,274 @@
+import sys
+import time
+import asyncio
+import logging
+import threading
+from typing import Dict, Any, List, Tuple
+
 from supabase import create_client, Client
 from ..core.config import settings
+from ..core.metrics import Histogram, Exposition, labels
+from ..core.tracing import tracer
 
 _supabase: Client = create_client(
     settings.SUPABASE_URL,
     settings.SUPABASE_KEY
 )
 
-def get_supabase() -> Client:
+slow_query_log = logging.getLogger("app.db.slow_queries")
+
+# PostgREST builder methods that start a query; everything else refines one
+OPERATIONS = ("select", "insert", "update", "upsert", "delete")
+
+
+def call_site(skip: str = "app.db") -> str:
+    """``module:Class.method`` of the nearest caller outside the data-access layer"""
+    frame = sys._getframe(1)
+    fallback = None
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if not module.startswith(skip):
+            where = f"{module}:{frame.f_code.co_qualname}"
+            if module.startswith("app."):
+                return where
+            fallback = fallback or where
+        frame = frame.f_back
+    return fallback or "unknown"
+
+
+class QueryStats:
+    """Per-worker timings for database and storage calls.
+
+    The histogram is labelled by backend, table or bucket, and operation.
+    Totals are also kept per filter shape and call site, the finer grain
+    needed to tell which service method's queries dominate; both are
+    bounded by the code, not by the data. Calls over ``slow_ms`` are
+    logged to ``app.db.slow_queries`` with their details as ``extra`` fields.
+
+    Queries run in worker threads through ``run_query``, hence the lock.
+    """
+
+    def __init__(self, slow_ms: float = 250.0):
+        self.slow_ms = slow_ms
+        self.latency = Histogram(("backend", "target", "op"))
+        self.calls: Dict[Tuple[str, str, str, str, str], Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        backend: str,
+        target: str,
+        op: str,
+        shape: str,
+        caller: str,
+        seconds: float,
+        rows: int = 0,
+        nbytes: int = 0,
+        error: bool = False,
+    ) -> None:
+        with self._lock:
+            self.latency.observe((backend, target, op), seconds)
+            entry = self.calls.setdefault(
+                (backend, target, op, shape, caller),
+                {"count": 0, "seconds": 0.0, "rows": 0, "bytes": 0, "errors": 0},
+            )
+            entry["count"] += 1
+            entry["seconds"] += seconds
+            entry["rows"] += rows
+            entry["bytes"] += nbytes
+            entry["errors"] += int(error)
+
+        if seconds * 1000 >= self.slow_ms:
+            slow_query_log.warning("slow_query", extra={
+                "backend": backend,
+                "target": target,
+                "op": op,
+                "filters": shape,
+                "rows": rows,
+                "bytes": nbytes,
+                "ms": round(seconds * 1000, 1),
+                "error": error,
+                "caller": caller,
+            })
+
+    def snapshot(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """The call shapes that took the most total time"""
+        with self._lock:
+            items = list(self.calls.items())
+        items.sort(key=lambda item: item[1]["seconds"], reverse=True)
+        return [
+            {
+                "backend": backend, "target": target, "op": op, "filters": shape, "caller": caller,
+                **entry,
+                "ms_per_call": round(entry["seconds"] * 1000 / entry["count"], 2),
+            }
+            for (backend, target, op, shape, caller), entry in items[:limit]
+        ]
+
+    def expose(self, out: Exposition) -> None:
+        with self._lock:
+            totals: Dict[Tuple[str, str, str], List[int]] = {}
+            for (backend, target, op, _, _), entry in self.calls.items():
+                total = totals.setdefault((backend, target, op), [0, 0])
+                total[0] += entry["rows"]
+                total[1] += entry["bytes"]
+            out.family(
+                "db_call_duration_seconds", "histogram", "Database and storage call time by table or bucket.",
+                list(self.latency.samples()),
+            )
+        for name, index, help_text in (
+            ("db_call_rows_total", 0, "Rows returned or written."),
+            ("db_call_bytes_total", 1, "Storage bytes uploaded or downloaded; not counted for table queries."),
+        ):
+            out.family(name, "counter", help_text, (
+                ("", labels(backend=b, target=t, op=o), total[index]) for (b, t, o), total in sorted(totals.items())
+            ))
+
+
+query_stats = QueryStats(slow_ms=settings.SLOW_QUERY_MS)
+
+
+class _Call:
+    __slots__ = ("table", "caller", "op", "shape")
+
+    def __init__(self, table: str, caller: str):
+        self.table = table
+        self.caller = caller
+        self.op = "query"
+        self.shape: List[str] = []
+
+    def note(self, method: str, args: tuple) -> None:
+        if method in OPERATIONS:
+            self.op = method
+            return
+        name = method.rstrip("_")
+        # Filters are keyed by column; or_() and friends take an expression instead
+        column = args[0] if args and isinstance(args[0], str) and name not in ("or", "match", "text_search") else None
+        self.shape.append(f"{name}({column})" if column else name)
+
+
+class _Query:
+    """Wraps a PostgREST request builder, recording what the query does until it runs"""
+
+    __slots__ = ("_builder", "_call")
+
+    def __init__(self, builder: Any, call: _Call):
+        self._builder = builder
+        self._call = call
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._builder, name)
+        if name == "execute":
+            return self._execute
+        if callable(attr):
+            def step(*args, **kwargs):
+                self._call.note(name, args)
+                result = attr(*args, **kwargs)
+                return _Query(result, self._call) if hasattr(result, "execute") else result
+            return step
+        if hasattr(attr, "execute"):
+            # Builder properties such as .not_
+            self._call.note(name, ())
+            return _Query(attr, self._call)
+        return attr
+
+    def _execute(self) -> Any:
+        call = self._call
+        shape = ",".join(call.shape)
+        with tracer.span(f"{call.op} {call.table}", **{
+            "db.system": "postgresql", "db.operation": call.op, "db.sql.table": call.table,
+            "db.filters": shape, "code.function": call.caller,
+        }) as span:
+            started = time.perf_counter()
+            try:
+                result = self._builder.execute()
+            except Exception:
+                query_stats.record("postgrest", call.table, call.op, shape, call.caller,
+                                   time.perf_counter() - started, error=True)
+                raise
+            seconds = time.perf_counter() - started
+
+            data = result.data
+            rows = len(data) if isinstance(data, list) else int(bool(data))
+            span.set_attribute("db.rows", rows)
+        # No byte count: re-serializing every result just to measure it costs
+        # more than the query's own parsing
+        query_stats.record("postgrest", call.table, call.op, shape, call.caller, seconds, rows)
+        return result
+
+
+class _Bucket:
+    """Wraps a storage3 bucket, timing each call"""
+
+    def __init__(self, bucket: Any, name: str):
+        self._bucket = bucket
+        self._name = name
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._bucket, name)
+        if not callable(attr):
+            return attr
+
+        def timed(*args, **kwargs):
+            caller = call_site()
+            started = time.perf_counter()
+            error = False
+            try:
+                with tracer.span(f"storage {name}", **{"storage.bucket": self._name, "code.function": caller}):
+                    return attr(*args, **kwargs)
+            except Exception:
+                error = True
+                raise
+            finally:
+                query_stats.record("storage", self._name, name, "", caller, time.perf_counter() - started, error=error)
+        return timed
+
+
+class _Storage:
+    def __init__(self, storage: Any):
+        self._storage = storage
+
+    def from_(self, bucket: str) -> _Bucket:
+        return _Bucket(self._storage.from_(bucket), bucket)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._storage, name)
+
+
+class InstrumentedClient:
+    """
+    The Supabase client, with every table query and storage call timed into
+    ``query_stats``. Anything else is passed straight through.
+    """
+
+    def __init__(self, client: Client):
+        self._client = client
+
+    def table(self, name: str) -> _Query:
+        return _Query(self._client.table(name), _Call(name, call_site()))
+
+    from_ = table
+
+    @property
+    def storage(self) -> _Storage:
+        return _Storage(self._client.storage)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+
+_instrumented = InstrumentedClient(_supabase)
+
+def get_supabase() -> InstrumentedClient:
     """
     Get the Supabase client instance.
     """
-    return _supabase
+    return _instrumented
 
 
+async def run_query(query):
+    """
+    Execute a PostgREST query builder in a worker thread so the event loop
+    stays free and independent queries can be awaited concurrently.
+    """
+    return await asyncio.to_thread(query.execute)
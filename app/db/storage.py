@@ -0,0 +1,261 @@
+import os
+import time
+import asyncio
+import functools
+from typing import Optional, AsyncIterator, Dict, Any, List, Callable
+
+import httpx
+from fastapi import UploadFile
+
+from ..core.config import settings
+from .session import query_stats, call_site
+from ..core.tracing import tracer
+
+# 256 KiB keeps per-upload memory bounded while staying well above TCP window sizes
+UPLOAD_CHUNK_SIZE = 256 * 1024
+
+
+# Bucket holding card photos and company logos
+PHOTO_BUCKET = "user_profile_photos"
+
+_PUBLIC_BASE = f"{settings.SUPABASE_URL.rstrip('/')}/storage/v1/object/public"
+
+
+def public_url(path: Optional[str], bucket: str = PHOTO_BUCKET) -> Optional[str]:
+    """
+    Public URL for a stored object path. Pure string building, no client call.
+
+    Image columns hold the canonical bucket path; values that are already
+    URLs (rows written before paths were stored) are returned unchanged.
+    """
+    if not path or path.startswith(("http://", "https://", "/")):
+        return path
+    return f"{_PUBLIC_BASE}/{bucket}/{path}"
+
+
+def object_path(value: str, bucket: str = PHOTO_BUCKET) -> str:
+    """Canonical bucket path of a stored image value, which may be a public URL"""
+    marker = f"/object/public/{bucket}/"
+    if marker in value:
+        return value.split(marker, 1)[1].split("?", 1)[0]
+    return value.split("?", 1)[0]
+
+
+def expand_image_urls(card: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Turn a card row's stored image paths into public URLs, in place"""
+    if card:
+        for field in ("photo_url", "company_logo_url"):
+            if card.get(field):
+                card[field] = public_url(card[field])
+    return card
+
+
+def _timed(op: str, size: Optional[Callable[..., int]] = None):
+    """Record a StorageClient call in query_stats, by bucket (the first argument)"""
+    def decorate(method):
+        @functools.wraps(method)
+        async def timed(self, bucket: str, *args, **kwargs):
+            caller = call_site()
+            started = time.perf_counter()
+            result = None
+            error = False
+            try:
+                with tracer.span(f"storage {op}", **{"storage.bucket": bucket, "code.function": caller}):
+                    result = await method(self, bucket, *args, **kwargs)
+                return result
+            except Exception:
+                error = True
+                raise
+            finally:
+                nbytes = size(*args) if size else len(result) if isinstance(result, bytes) else 0
+                query_stats.record("storage", bucket, op, "", caller, time.perf_counter() - started, nbytes=nbytes or 0, error=error)
+        return timed
+    return decorate
+
+
+class StorageError(Exception):
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"Storage request failed ({status_code}): {message}")
+        self.status_code = status_code
+        self.message = message
+
+    @property
+    def duplicate(self) -> bool:
+        """The object already exists (Supabase reports this as 400 or 409)"""
+        return self.status_code == 409 or (self.status_code == 400 and "Duplicate" in self.message)
+
+
+async def iter_upload(upload: UploadFile, chunk_size: int = UPLOAD_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Yield an UploadFile's spooled contents chunk by chunk from the start"""
+    await upload.seek(0)
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def iter_path(file_path: str, chunk_size: int = UPLOAD_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Yield a local file chunk by chunk, reading off the event loop"""
+    with open(file_path, "rb") as f:
+        while True:
+            chunk = await asyncio.to_thread(f.read, chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+class StorageClient:
+    """
+    Async client for the Supabase Storage REST API.
+
+    The supabase-py storage client only accepts whole files as bytes, so
+    uploads go through here instead: the request body is streamed from the
+    UploadFile's temporary file, and a worker holds at most one chunk per
+    upload in memory. Pass ``transport`` to run against an in-process fake.
+    """
+
+    def __init__(self, url: str, key: str, transport: Optional[httpx.AsyncBaseTransport] = None, timeout: float = 60.0):
+        self.base_url = f"{url.rstrip('/')}/storage/v1"
+        self.key = key
+        self.transport = transport
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.key}", "apikey": self.key},
+                transport=self.transport,
+                timeout=self.timeout,
+            )
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def upload(
+        self,
+        bucket: str,
+        path: str,
+        upload: UploadFile,
+        content_type: Optional[str] = None,
+        cache_control: str = "3600",
+        upsert: bool = False,
+    ) -> Dict[str, str]:
+        """Stream an UploadFile to ``bucket/path``"""
+        return await self._post(
+            bucket, path, iter_upload(upload), upload.size,
+            content_type or upload.content_type, cache_control, upsert,
+        )
+
+    async def upload_path(
+        self,
+        bucket: str,
+        path: str,
+        file_path: str,
+        content_type: str,
+        cache_control: str = "3600",
+        upsert: bool = False,
+    ) -> Dict[str, str]:
+        """Stream a local file to ``bucket/path``"""
+        return await self._post(
+            bucket, path, iter_path(file_path), os.path.getsize(file_path),
+            content_type, cache_control, upsert,
+        )
+
+    @_timed("sign_upload")
+    async def create_signed_upload_url(self, bucket: str, path: str) -> str:
+        """Absolute URL a client can PUT one object to, without our credentials"""
+        response = await self.client.post(f"/object/upload/sign/{bucket}/{path}")
+        if response.status_code >= 400:
+            raise StorageError(response.status_code, response.text)
+        return f"{self.base_url}{response.json()['url']}"
+
+    @_timed("info")
+    async def info(self, bucket: str, path: str) -> Optional[Dict[str, Any]]:
+        """Size and content type of an object, None if it doesn't exist"""
+        response = await self.client.head(f"/object/{bucket}/{path}")
+        if response.status_code >= 500:
+            raise StorageError(response.status_code, response.text)
+        if response.status_code >= 300:
+            return None
+        size = response.headers.get("content-length")
+        return {
+            "size": int(size) if size is not None else None,
+            "content_type": response.headers.get("content-type"),
+        }
+
+    @_timed("read_head")
+    async def read_head(self, bucket: str, path: str, length: int) -> bytes:
+        """First bytes of an object, without downloading the rest"""
+        headers = {"Range": f"bytes=0-{length - 1}"}
+        async with self.client.stream("GET", f"/object/{bucket}/{path}", headers=headers) as response:
+            if response.status_code >= 400:
+                raise StorageError(response.status_code, (await response.aread()).decode(errors="replace"))
+            head = b""
+            # A server that ignores Range still only gets read this far
+            async for chunk in response.aiter_bytes():
+                head += chunk
+                if len(head) >= length:
+                    break
+            return head[:length]
+
+    @_timed("list")
+    async def list(self, bucket: str, prefix: str = "", limit: int = 1000, offset: int = 0) -> List[Dict[str, Any]]:
+        """One page of a folder's entries sorted by name; subfolders have no id"""
+        response = await self.client.post(f"/object/list/{bucket}", json={
+            "prefix": prefix,
+            "limit": limit,
+            "offset": offset,
+            "sortBy": {"column": "name", "order": "asc"},
+        })
+        if response.status_code >= 400:
+            raise StorageError(response.status_code, response.text)
+        return response.json()
+
+    @_timed("remove")
+    async def remove(self, bucket: str, paths: List[str]) -> None:
+        response = await self.client.request("DELETE", f"/object/{bucket}", json={"prefixes": paths})
+        if response.status_code >= 400:
+            raise StorageError(response.status_code, response.text)
+
+    @_timed("exists")
+    async def exists(self, bucket: str, path: str) -> bool:
+        response = await self.client.head(f"/object/{bucket}/{path}")
+        if response.status_code >= 500:
+            raise StorageError(response.status_code, response.text)
+        return response.status_code < 300
+
+    @_timed("upload", size=lambda path, content, size, *rest: size)
+    async def _post(
+        self,
+        bucket: str,
+        path: str,
+        content: AsyncIterator[bytes],
+        size: Optional[int],
+        content_type: Optional[str],
+        cache_control: str,
+        upsert: bool,
+    ) -> Dict[str, str]:
+        headers = {
+            "Content-Type": content_type or "application/octet-stream",
+            "Cache-Control": f"max-age={cache_control}",
+            "x-upsert": "true" if upsert else "false",
+        }
+        # A known size avoids chunked transfer encoding
+        if size is not None:
+            headers["Content-Length"] = str(size)
+
+        response = await self.client.post(f"/object/{bucket}/{path}", content=content, headers=headers)
+        if response.status_code >= 400:
+            raise StorageError(response.status_code, response.text)
+        return response.json()
+
+
+# Shared per-worker storage client
+storage = StorageClient(settings.SUPABASE_URL, settings.SUPABASE_KEY)
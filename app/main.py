@@ -1,17 +1,41 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from .api.v1 import auth, users
+from .api.v1 import auth, users, admin
 from .core.config import settings
+from .core.responses import FastJSONResponse, dumps
+from .core.compression import CompressionMiddleware
+from .core.tracing import TracingMiddleware, tracer
+from .core.metrics import MetricsMiddleware, Exposition, CONTENT_TYPE, request_metrics, expose_compression, expose_counters
+from .core.loop_monitor import loop_monitor
+from .core.profiling import ProfilingMiddleware
+from .core.logs import RequestIdMiddleware, setup_logging, stop_logging
+from .core.uploads import UploadGuardMiddleware
+from .core.http_cache import make_etag, latest, is_not_modified, validators, not_modified
+from .db.storage import storage
+from .db.session import query_stats
+from .db.columns import PROFILE_FIELDS, PROFILE_CARD_COLUMNS, select_fields, field_list
 from fastapi import Request
-from .services.user import UserService
 from .services.business_card import BusinessCardService  
+from .services.slug_routes import slug_routes
+from .services.slug_resolver import slug_resolver, public_profile
+from .services.profile_cache import profile_cache
+from .services.images import image_pipeline
+from .services.jobs import job_queue
 import re
+import logging
+from typing import Optional
 import qrcode
 import base64
 from io import BytesIO
 
-app = FastAPI(title=settings.PROJECT_NAME)
+logger = logging.getLogger(__name__)
+
+app = FastAPI(title=settings.PROJECT_NAME, default_response_class=FastJSONResponse)
+
+# Innermost, so CORS adds its headers to the 413/415 answers for refused
+# uploads; still outside the app, so the body is checked before anything reads it
+app.add_middleware(UploadGuardMiddleware)
 
 # Configure CORS
 app.add_middleware(
@@ -22,6 +46,75 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+)
+
+# Root span per request; refused uploads are traced too
+app.add_middleware(TracingMiddleware)
+
+# Outside tracing so the root span shows up in profiles, inside the request id
+app.add_middleware(ProfilingMiddleware)
+
+# Just inside metrics, so log lines from every other layer carry the request id
+app.add_middleware(RequestIdMiddleware, debug_sample_rate=settings.LOG_DEBUG_SAMPLE_RATE)
+
+# Outermost, so latency covers every other middleware. From the outside in:
+# metrics, request id, profiling, tracing, compression, CORS, upload guard
+app.add_middleware(MetricsMiddleware)
+
+# First in, last out, so the other hooks' log lines are written
+@app.on_event("startup")
+async def start_logging():
+    setup_logging(settings.LOG_LEVEL, settings.LOG_FORMAT, settings.LOG_DEBUG_SAMPLE_RATE)
+
+@app.on_event("startup")
+async def start_slug_routes():
+    if settings.SLUG_ROUTES_ENABLED:
+        slug_routes.start()
+
+@app.on_event("shutdown")
+async def stop_slug_routes():
+    await slug_routes.stop()
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    if settings.LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+
+@app.on_event("shutdown")
+async def stop_loop_monitor():
+    await loop_monitor.stop()
+
+@app.on_event("startup")
+async def start_jobs():
+    if settings.JOBS_ENABLED:
+        job_queue.start()
+
+# Registered before close_storage so queued storage jobs can still finish
+@app.on_event("shutdown")
+async def stop_jobs():
+    await job_queue.stop()
+
+@app.on_event("shutdown")
+async def close_storage():
+    await storage.close()
+
+@app.on_event("shutdown")
+async def stop_image_pipeline():
+    image_pipeline.shutdown()
+
+@app.on_event("shutdown")
+async def flush_traces():
+    tracer.shutdown()
+
+@app.on_event("shutdown")
+async def flush_logs():
+    stop_logging()
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to Kinvo Backend!"}
@@ -29,12 +122,51 @@ def read_root():
 # Include the routes for authentication
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["auth"])
 app.include_router(users.router, prefix="/api/v1/users", tags=["users"])
+app.include_router(admin.router, prefix="/api/v1/admin", include_in_schema=False)
+
+async def _public_profile_response(slug: str, fields: Optional[str], request: Request):
+    """Public profile for a slug; full profiles are served from the payload cache"""
+    if not fields:
+        cached = profile_cache.get(slug)
+        if cached is not None:
+            return cached.response(request)
+
+    columns = select_fields(fields, PROFILE_FIELDS, PROFILE_CARD_COLUMNS, always=("id", "user_id", "slug", "updated_at"))
+    resolved = await slug_resolver.resolve(slug, card_columns=columns)
+
+    if not resolved or not resolved["card"]:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    # Return only the public information
+    profile = public_profile(resolved, field_list(fields))
+    if not fields:
+        return profile_cache.put(slug, profile, resolved["card"], resolved["user"]).response(request)
+
+    # Projections aren't cached, but still revalidate against the body hash
+    body = dumps(profile)
+    etag = make_etag(body)
+    last_modified = latest(resolved["card"].get("updated_at"), resolved["user"].get("updated_at"))
+    headers = validators(etag, last_modified, "public, max-age=0, must-revalidate")
+    if is_not_modified(request.headers, etag, last_modified):
+        return not_modified(headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# Registered ahead of /{slug} so it isn't taken for a profile
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    out = Exposition()
+    request_metrics.expose(out)
+    expose_compression(out)
+    query_stats.expose(out)
+    loop_monitor.expose(out)
+    expose_counters(out, "background_jobs_total", "Background jobs by outcome.", "outcome", job_queue.stats)
+    return Response(content=out.render(), media_type=CONTENT_TYPE)
 
 # Add a public endpoint for slug access (Linktree-like functionality)
 @app.get("/{slug}", tags=["public"])
-async def get_public_profile_by_slug(slug: str):
+async def get_public_profile_by_slug(slug: str, request: Request, fields: Optional[str] = Query(None)):
     # Check if this is a reserved path
-    reserved_paths = ["api", "docs", "redoc", "openapi.json"]
+    reserved_paths = ["api", "docs", "redoc", "openapi.json", "metrics"]
     if slug in reserved_paths:
         # Skip this handler for reserved paths
         raise HTTPException(status_code=404, detail="Not found")
@@ -44,38 +176,11 @@ async def get_public_profile_by_slug(slug: str):
         raise HTTPException(status_code=404, detail="Not found")
         
     try:
-        # Get user by slug
-        user = await UserService.get_by_slug(slug)
-        
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        # Get business card data
-        card = await BusinessCardService.get_by_slug(slug)  # Updated service call
-        
-        if not card:
-            raise HTTPException(status_code=404, detail="Profile not found")
-            
-        # Return only the public information
-        return {
-            "full_name": user["full_name"],
-            "slug": user["slug"],
-            "profile": {
-                "display_name": card["display_name"],
-                "slug": card["slug"],
-                "title": card.get("title"),
-                "bio": card.get("bio"),
-                "photo_url": card.get("photo_url"),
-                "company_logo_url": card.get("company_logo_url"),
-                "website": card.get("website"),
-                "contact": card.get("contact")
-                # Only include non-sensitive fields
-            }
-        }
+        return await _public_profile_response(slug, fields, request)
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error fetching profile by slug: {str(e)}")
+        logger.error("Error fetching profile by slug: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
     
 # Add this to your main.py
@@ -86,50 +191,22 @@ async def get_profiles_dashboard():
 
 
 @app.get("/api/v1/profiles/{slug}", tags=["profiles"])
-async def get_profile_api(slug: str):
-    # Reuse your existing logic from the /{slug} endpoint
+async def get_profile_api(slug: str, request: Request, fields: Optional[str] = Query(None)):
     try:
-        # Get user by slug
-        user = await UserService.get_by_slug(slug)
-        
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        # Get business card data
-        card = await BusinessCardService.get_by_slug(slug)  # Updated service call
-        
-        if not card:
-            raise HTTPException(status_code=404, detail="Profile not found")
-        
-        # Return only the public information
-        return {
-            "full_name": user["full_name"],
-            "slug": user["slug"],
-            "profile": {
-                "display_name": card["display_name"],
-                "slug": card["slug"],
-                "title": card.get("title"),
-                "bio": card.get("bio"),
-                "photo_url": card.get("photo_url"),
-                "company_logo_url": card.get("company_logo_url"),
-                "website": card.get("website"),
-                "contact": card.get("contact")
-            }
-        }
+        return await _public_profile_response(slug, fields, request)
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error fetching profile by slug: {str(e)}")
+        logger.error("Error fetching profile by slug: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 # Add a public QR code endpoint
 @app.get("/api/v1/profiles/{slug}/qrcode", tags=["profiles"])
-async def get_public_qrcode(slug: str, base_url: str = "http://localhost:5173/"):
+async def get_public_qrcode(slug: str, base_url: Optional[str] = None):
     try:
-        # Get user by slug
-        user = await UserService.get_by_slug(slug)
+        resolved = await slug_resolver.resolve(slug)
         
-        if not user:
+        if not resolved:
             raise HTTPException(status_code=404, detail="User not found")
         
         # Generate QR code for the profile URL
@@ -145,7 +222,7 @@ async def get_public_qrcode(slug: str, base_url: str = "http://localhost:5173/")
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error generating QR code: {str(e)}")
+        logger.error("Error generating QR code: %s", e)
         raise HTTPException(status_code=500, detail="Error generating QR code")
 
 if __name__ == "__main__":
@@ -0,0 +1,25 @@
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, List
+
+class SlugBatchCheck(BaseModel):
+    slugs: List[str] = Field(..., min_length=1, max_length=50)
+    title: Optional[str] = None
+    suggestions: int = Field(5, ge=0, le=20)
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "slugs": ["jane", "jane-doe", "janedoe"],
+                "title": "Jane Doe Product Designer",
+                "suggestions": 5
+            }
+        }
+    }
+
+class SlugStatus(BaseModel):
+    available: bool
+    error: Optional[str] = None
+
+class SlugBatchCheckResponse(BaseModel):
+    results: Dict[str, SlugStatus]
+    suggestions: Dict[str, List[str]] = {}
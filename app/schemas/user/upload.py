@@ -0,0 +1,25 @@
+from enum import Enum
+from pydantic import BaseModel
+
+class UploadKind(str, Enum):
+    PHOTO = "photo"
+    COMPANY_LOGO = "company_logo"
+
+class SignedUploadRequest(BaseModel):
+    kind: UploadKind
+    content_type: str
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {"kind": "photo", "content_type": "image/webp"}
+        }
+    }
+
+class SignedUploadResponse(BaseModel):
+    upload_url: str
+    path: str
+    expires_in: int
+
+class FinalizeUpload(BaseModel):
+    kind: UploadKind
+    path: str
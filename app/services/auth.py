@@ -2,10 +2,15 @@
 import httpx
 from fastapi import HTTPException
 from app.core.security import create_access_token, get_password_hash, verify_password
-from app.db.session import get_supabase
+from app.db.session import get_supabase, run_query
+from app.services.jobs import job_queue
+from app.services.slug_routes import slug_routes
 from datetime import datetime
 import random
 import string
+import logging
+
+logger = logging.getLogger(__name__)
 
 def generate_random_password(length=12):
     return ''.join(random.choices(string.ascii_letters + string.digits + string.punctuation, k=length))
@@ -20,6 +25,11 @@ async def validate_google_oauth_token(id_token: str) -> dict:
     except Exception as e:
         raise ValueError(f"Token validation failed: {str(e)}")
 
+async def _delete_user(user_id: int) -> None:
+    await run_query(get_supabase().table("users").delete().eq("id", user_id))
+
+job_queue.register("delete_user", _delete_user)
+
 class AuthService:
     @staticmethod
     async def handle_google_auth(token_data: dict, is_login: bool = False, slug: str = None):
@@ -30,7 +40,7 @@ class AuthService:
             raise HTTPException(status_code=400, detail="Email not found in token")
 
         # Check if user exists
-        result = supabase.table("users").select("*").eq("email", email).execute()
+        result = supabase.table("users").select("email, full_name, slug").eq("email", email).execute()
         existing_user = result.data[0] if result.data else None
 
         if is_login:
@@ -123,21 +133,27 @@ class AuthService:
                 )
             except Exception as e:
                 # Log the error and propagate it with a meaningful message
-                import traceback
-                traceback_str = traceback.format_exc()
-                print(f"Error creating user profile: {str(e)}\n{traceback_str}")
+                logger.exception("Error creating user profile: %s", e)
                 
-                # Delete the user to maintain consistency
+                # Delete the user to maintain consistency, before answering, so a
+                # retried sign-up doesn't find a user without a profile
                 try:
-                    supabase.table("users").delete().eq("id", user["id"]).execute()
+                    await _delete_user(user["id"])
                 except Exception as delete_error:
-                    print(f"Failed to clean up user after profile creation error: {str(delete_error)}")
+                    logger.error("Failed to clean up user after profile creation error: %s", delete_error)
+                    # Retried in the background rather than left behind
+                    try:
+                        await job_queue.enqueue("delete_user", user_id=user["id"])
+                    except Exception as enqueue_error:
+                        logger.error("Error queueing user cleanup: %s", enqueue_error)
                     
                 raise HTTPException(
                     status_code=500, 
                     detail=f"Registration failed: Error creating user profile: {str(e)}"
                 )
             
+            slug_routes.set_user(user["slug"], user["id"])
+
             # Generate access token
             access_token = create_access_token(data={"sub": email})
 
@@ -1,14 +1,36 @@
 import json
+import uuid
 import base64
+import asyncio
+import logging
+from datetime import datetime, timezone
 import qrcode
 from io import BytesIO
 from typing import Optional, Dict, Any, List
 from fastapi import UploadFile, HTTPException
 from app.schemas.user.business_card import BusinessCard, BusinessCardCreate, BusinessCardUpdate
-from app.db.session import get_supabase
+from app.core.config import settings
+from app.core.tracing import traced
+from app.db.session import get_supabase, run_query
+from app.db.storage import storage, PHOTO_BUCKET, expand_image_urls
+from app.core.uploads import IMAGE_EXTENSIONS, SNIFF_BYTES, sniff_image_type
+from app.db.columns import CARD_COLUMNS
+from app.services.slug_index import slug_index
+from app.services.slug_routes import slug_routes
+from app.services.user_profile import BusinessCardsService
+
+logger = logging.getLogger(__name__)
+
+# Supabase Storage signs upload URLs for a fixed two hours
+SIGNED_UPLOAD_SECONDS = 2 * 60 * 60
+
+# Slugs per IN filter; PostgREST filters travel in the GET query string,
+# which proxies cap at a few KB
+SLUG_QUERY_CHUNK = 100
 
 class BusinessCardService:
     @staticmethod
+    @traced()
     async def get_by_email(email: str):
         """Get a user by their email address"""
         # Implement your database query here
@@ -18,21 +40,21 @@ class BusinessCardService:
             user = await db.fetch_one(query, email)
             return dict(user) if user else None
         except Exception as e:
-            print(f"Database error in get_by_email: {str(e)}")
+            logger.error("Database error in get_by_email: %s", e)
             raise
         
     @staticmethod
-    async def get_primary_by_user_id(user_id: str) -> Optional[Dict[str, Any]]:
+    @traced()
+    async def get_primary_by_user_id(user_id: str, columns: str = CARD_COLUMNS) -> Optional[Dict[str, Any]]:
         """Get the primary business card for a user"""
         try:
             supabase = get_supabase()
-            response = (
+            response = await run_query(
                 supabase.table("business_cards")
-                .select("*")
+                .select(columns)
                 .eq("user_id", user_id)
                 .eq("is_primary", True)
                 .single()
-                .execute()
             )
             
             if not response.data:
@@ -42,12 +64,46 @@ class BusinessCardService:
             if response.data.get('contact') and isinstance(response.data['contact'], str):
                 response.data['contact'] = json.loads(response.data['contact'])
                 
-            return response.data
+            return expand_image_urls(response.data)
         except Exception as e:
-            print(f"Error getting primary business card: {str(e)}")
+            logger.error("Error getting primary business card: %s", e)
+            return None
+
+    @staticmethod
+    @traced()
+    async def get_primary_by_user_email(email: str, columns: str = CARD_COLUMNS) -> Optional[Dict[str, Any]]:
+        """Get the primary business card for the user with this email.
+
+        Joins on the owner's email so it can run concurrently with the user
+        lookup instead of waiting for the user id.
+        """
+        try:
+            supabase = get_supabase()
+            response = await run_query(
+                supabase.table("business_cards")
+                .select(f"{columns}, owner:users!inner(email)")
+                .eq("owner.email", email)
+                .eq("is_primary", True)
+                .limit(1)
+            )
+
+            if not response.data:
+                return None
+
+            card = response.data[0]
+            card.pop("owner", None)
+
+            # Process contact field from JSON string if needed
+            if card.get('contact') and isinstance(card['contact'], str):
+                card['contact'] = json.loads(card['contact'])
+
+            return expand_image_urls(card)
+        except Exception as e:
+            logger.error("Error getting primary business card by email: %s", e)
             return None
     
     @staticmethod
+    @traced()
     async def create_business_card(user_id: str, card_data: BusinessCardCreate, photo: Optional[UploadFile] = None, company_logo: Optional[UploadFile] = None) -> Dict[str, Any]:
         """Create a new business card for a user"""
         try:
@@ -75,42 +131,39 @@ class BusinessCardService:
                 "is_primary": is_first_card  # First card is automatically primary
             }
             
-            # Handle photo upload if provided
+            # Uploads are streamed to storage under their content hash, with resized derivatives
             if photo:
-                # Implement file upload logic here
-                # For example, save to cloud storage and store URL
-                photo_url = f"/uploads/photos/{user_id}_{photo.filename}"
-                new_card_data["photo_url"] = photo_url
-                
-            # Handle company logo upload if provided
+                new_card_data["photo_url"] = await BusinessCardsService._handle_photo_upload(user_id, photo)
             if company_logo:
-                # Implement file upload logic here
-                logo_url = f"/uploads/logos/{user_id}_{company_logo.filename}"
-                new_card_data["company_logo_url"] = logo_url
+                new_card_data["company_logo_url"] = await BusinessCardsService._handle_logo_upload(user_id, company_logo)
             
             # Insert the new card
             result = supabase.table("business_cards").insert(new_card_data).execute()
             
             if not result.data:
                 raise HTTPException(status_code=500, detail="Failed to create business card")
-                
+
+            slug_index.add(result.data[0]["slug"])
+            slug_routes.set_card(result.data[0]["slug"], result.data[0]["id"], user_id)
+
             # Process contact field from JSON string if needed
             if result.data[0].get('contact') and isinstance(result.data[0]['contact'], str):
                 result.data[0]['contact'] = json.loads(result.data[0]['contact'])
-                
-            return result.data[0]
+
+            return expand_image_urls(result.data[0])
         except HTTPException:
             raise
         except Exception as e:
-            print(f"Error creating business card: {str(e)}")
+            logger.error("Error creating business card: %s", e)
             raise HTTPException(status_code=500, detail=f"Error creating business card: {str(e)}")
     
     @staticmethod
-    async def get_by_id(card_id: int) -> Optional[Dict[str, Any]]:
+    @traced()
+    async def get_by_id(card_id: int, columns: str = CARD_COLUMNS) -> Optional[Dict[str, Any]]:
         """Get a business card by ID"""
         try:
             supabase = get_supabase()
-            result = supabase.table("business_cards").select("*").eq("id", card_id).single().execute()
+            result = supabase.table("business_cards").select(columns).eq("id", card_id).single().execute()
             
             if not result.data:
                 return None
@@ -119,17 +172,18 @@ class BusinessCardService:
             if result.data.get('contact') and isinstance(result.data['contact'], str):
                 result.data['contact'] = json.loads(result.data['contact'])
                 
-            return result.data
+            return expand_image_urls(result.data)
         except Exception as e:
-            print(f"Error getting business card by ID: {str(e)}")
+            logger.error("Error getting business card by ID: %s", e)
             return None
     
     @staticmethod
-    async def get_by_user_id(user_id: str) -> List[Dict[str, Any]]:
+    @traced()
+    async def get_by_user_id(user_id: str, columns: str = CARD_COLUMNS) -> List[Dict[str, Any]]:
         """Get all business cards for a user"""
         try:
             supabase = get_supabase()
-            result = supabase.table("business_cards").select("*").eq("user_id", user_id).execute()
+            result = supabase.table("business_cards").select(columns).eq("user_id", user_id).execute()
             
             cards = result.data if result.data else []
             
@@ -137,31 +191,61 @@ class BusinessCardService:
             for card in cards:
                 if card.get('contact') and isinstance(card['contact'], str):
                     card['contact'] = json.loads(card['contact'])
+                expand_image_urls(card)
                     
             return cards
         except Exception as e:
-            print(f"Error getting business cards by user ID: {str(e)}")
+            logger.error("Error getting business cards by user ID: %s", e)
             return []
     
     @staticmethod
-    async def update_business_card(card_id: int, card_data: BusinessCardUpdate, photo: Optional[UploadFile] = None, company_logo: Optional[UploadFile] = None, current_user=None, base_url: Optional[str] = None) -> Dict[str, Any]:
-        """Update a business card"""
+    @traced()
+    async def get_versions_by_user_id(user_id: str) -> List[Dict[str, Any]]:
+        """id and updated_at of every card a user has; a cheap probe for conditional GETs"""
+        supabase = get_supabase()
+        result = await run_query(supabase.table("business_cards").select("id, updated_at").eq("user_id", user_id))
+        return result.data or []
+
+    @staticmethod
+    @traced()
+    async def update_business_card(card_id: int, card_data: BusinessCardUpdate, photo: Optional[UploadFile] = None, company_logo: Optional[UploadFile] = None, current_user=None, base_url: Optional[str] = None, expected_updated_at: Optional[str] = None) -> Dict[str, Any]:
+        """Update a business card in a single conditional UPDATE.
+
+        Ownership and, when expected_updated_at is given, the version the client
+        last saw are part of the WHERE clause instead of being checked with a
+        read beforehand. A concurrent edit from another device therefore makes
+        the update match no rows, which is reported as 409. Only a rename or a
+        new image reads the slug or image it replaces, so it can be released.
+        """
         try:
             supabase = get_supabase()
-            
-            # Get the current card
-            current_card = await BusinessCardService.get_by_id(card_id)
-            if not current_card:
-                raise HTTPException(status_code=404, detail="Business card not found")
-            
-            # Check if user owns this card
-            if current_user and current_card["user_id"] != current_user.id:
-                raise HTTPException(status_code=403, detail="Not authorized to update this business card")
-            
-            # Check if slug is being changed and is available
-            if card_data.slug and card_data.slug != current_card["slug"]:
-                slug_check = await BusinessCardService.check_slug_availability(card_data.slug, current_card["user_id"])
-                if not slug_check["available"]:
+            user_id = current_user.id if current_user else None
+            
+            # A slug change needs the old slug, to release it from the index and
+            # routing table. The edit form sends the slug on every save, so a slug
+            # the routing table already gives to this card is taken as unchanged
+            # and costs no read.
+            route = slug_routes.card(card_data.slug) if card_data.slug else None
+            renaming = bool(card_data.slug) and not (isinstance(route, tuple) and route[0] == card_id)
+            # A new image needs the one it replaces, to release it afterwards
+            image_fields = [field for field, upload in (("photo_url", photo), ("company_logo_url", company_logo)) if upload]
+
+            current_card = {}
+            if renaming or image_fields:
+                columns = ", ".join(["slug", *image_fields])
+                current_query = supabase.table("business_cards").select(columns).eq("id", card_id)
+                if user_id is not None:
+                    current_query = current_query.eq("user_id", user_id)
+                current = await run_query(current_query)
+                if not current.data:
+                    raise HTTPException(status_code=404, detail="Business card not found")
+                current_card = current.data[0]
+
+            old_slug = current_card["slug"] if renaming else None
+            if renaming:
+                # Check the new slug isn't used by anyone else
+                slug_available = await BusinessCardService.is_slug_available_for_card(card_data.slug, card_id, user_id)
+                if not slug_available:
                     raise HTTPException(status_code=400, detail="Slug already in use")
             
             # Prepare update data
@@ -172,36 +256,156 @@ class BusinessCardService:
                 else:
                     update_data[field] = value
             
-            # Handle photo upload if provided
+            # Uploads are streamed to storage under their content hash, with resized derivatives
             if photo:
-                # Implement file upload logic here
-                photo_url = f"/uploads/photos/{current_card['user_id']}_{photo.filename}"
-                update_data["photo_url"] = photo_url
-                
-            # Handle company logo upload if provided
+                update_data["photo_url"] = await BusinessCardsService._handle_photo_upload(user_id, photo)
             if company_logo:
-                # Implement file upload logic here
-                logo_url = f"/uploads/logos/{current_card['user_id']}_{company_logo.filename}"
-                update_data["company_logo_url"] = logo_url
-            
-            # Update the card
-            result = supabase.table("business_cards").update(update_data).eq("id", card_id).execute()
+                update_data["company_logo_url"] = await BusinessCardsService._handle_logo_upload(user_id, company_logo)
+
+            # Every write bumps the version clients use as a precondition
+            update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+            
+            # UPDATE ... WHERE id = ? AND user_id = ? AND updated_at = ? RETURNING *
+            query = supabase.table("business_cards").update(update_data).eq("id", card_id)
+            if user_id is not None:
+                query = query.eq("user_id", user_id)
+            if expected_updated_at:
+                query = query.eq("updated_at", expected_updated_at)
+            if old_slug is not None:
+                # A rename that raced ours is reported as a conflict too
+                query = query.eq("slug", old_slug)
+            for field in image_fields:
+                # So is an image replaced since it was read, which keeps the
+                # image released below the one this update replaced
+                previous = current_card.get(field)
+                query = query.eq(field, previous) if previous else query.is_(field, "null")
+            result = await run_query(query)
             
             if not result.data:
-                raise HTTPException(status_code=500, detail="Failed to update business card")
-                
+                # Only a failed update pays for a read, to tell 404 from 409
+                probe = supabase.table("business_cards").select("id, updated_at").eq("id", card_id)
+                if user_id is not None:
+                    probe = probe.eq("user_id", user_id)
+                existing = await run_query(probe)
+                if not existing.data:
+                    raise HTTPException(status_code=404, detail="Business card not found")
+                raise HTTPException(
+                    status_code=409,
+                    detail={
+                        "message": "Business card was modified by another request",
+                        "updated_at": existing.data[0]["updated_at"]
+                    }
+                )
+
+            updated_card = result.data[0]
+            if old_slug is not None and old_slug != updated_card["slug"]:
+                slug_index.discard(old_slug)
+                slug_index.add(updated_card["slug"])
+            # Also tells the public profile cache this card changed
+            slug_routes.set_card(updated_card["slug"], card_id, updated_card["user_id"], old_slug=old_slug)
+
+            # Replaced images are removed in the background
+            for field in image_fields:
+                if current_card.get(field):
+                    await BusinessCardsService._release_later(current_card[field], card_id, updated_card[field])
+
             # Process contact field from JSON string if needed
-            if result.data[0].get('contact') and isinstance(result.data[0]['contact'], str):
-                result.data[0]['contact'] = json.loads(result.data[0]['contact'])
+            if updated_card.get('contact') and isinstance(updated_card['contact'], str):
+                updated_card['contact'] = json.loads(updated_card['contact'])
                 
-            return result.data[0]
+            return expand_image_urls(updated_card)
         except HTTPException:
             raise
         except Exception as e:
-            print(f"Error updating business card: {str(e)}")
+            logger.error("Error updating business card: %s", e)
             raise HTTPException(status_code=500, detail=f"Error updating business card: {str(e)}")
+
+    @staticmethod
+    @traced()
+    async def sign_upload(user_id: int, content_type: str) -> Dict[str, Any]:
+        """Issue a signed URL the client uploads an image to directly, inside its own folder"""
+        extension = IMAGE_EXTENSIONS.get(content_type)
+        if not extension:
+            raise HTTPException(status_code=415, detail="Unsupported image type")
+
+        path = f"{user_id}/uploads/{uuid.uuid4().hex}.{extension}"
+        upload_url = await storage.create_signed_upload_url(PHOTO_BUCKET, path)
+        return {"upload_url": upload_url, "path": path, "expires_in": SIGNED_UPLOAD_SECONDS}
+
+    @staticmethod
+    @traced()
+    async def attach_upload(card_id: int, user_id: int, kind: str, path: str, max_bytes: int) -> Dict[str, Any]:
+        """
+        Attach a directly uploaded image to a card. Only the object's metadata
+        and first bytes are read, so image data never passes through the API.
+        Objects that are too large or aren't the image type they claim are deleted.
+        """
+        folder = f"{user_id}/uploads/"
+        if not path.startswith(folder) or ".." in path or "/" in path[len(folder):]:
+            raise HTTPException(status_code=403, detail="Upload path is outside your folder")
+
+        info = await storage.info(PHOTO_BUCKET, path)
+        if not info:
+            raise HTTPException(status_code=404, detail="Upload not found")
+
+        if info["size"] is not None and info["size"] > max_bytes:
+            await storage.remove(PHOTO_BUCKET, [path])
+            raise HTTPException(status_code=413, detail="File too large")
+
+        supabase = get_supabase()
+        field = "photo_url" if kind == "photo" else "company_logo_url"
+
+        # The image being replaced is read alongside the sniff, to release it afterwards
+        head, current = await asyncio.gather(
+            storage.read_head(PHOTO_BUCKET, path, SNIFF_BYTES),
+            run_query(supabase.table("business_cards").select(field).eq("id", card_id).eq("user_id", user_id)),
+        )
+
+        # The extension was fixed when the URL was signed; the bytes must agree with it
+        sniffed = sniff_image_type(head)
+        if sniffed is None or IMAGE_EXTENSIONS[sniffed] != path.rsplit(".", 1)[-1]:
+            await storage.remove(PHOTO_BUCKET, [path])
+            raise HTTPException(status_code=415, detail="Unsupported image type")
+        if not current.data:
+            raise HTTPException(status_code=404, detail="Business card not found")
+        previous = current.data[0][field]
+
+        # The canonical path is stored; URLs are built when cards are read. The
+        # update is conditional on the image read above, so it's the one released
+        query = (
+            supabase.table("business_cards")
+            .update({field: path, "updated_at": datetime.now(timezone.utc).isoformat()})
+            .eq("id", card_id)
+            .eq("user_id", user_id)
+        )
+        query = query.eq(field, previous) if previous is not None else query.is_(field, "null")
+        result = await run_query(query)
+        if not result.data:
+            raise HTTPException(status_code=409, detail="Business card was modified by another request")
+
+        card = result.data[0]
+        slug_routes.set_card(card["slug"], card_id, user_id)
+        if previous:
+            await BusinessCardsService._release_later(previous, card_id, path)
+        if card.get('contact') and isinstance(card['contact'], str):
+            card['contact'] = json.loads(card['contact'])
+        return expand_image_urls(card)
+
+    @staticmethod
+    @traced()
+    async def is_slug_available_for_card(slug: str, card_id: int, user_id: Optional[str] = None) -> bool:
+        """Check a slug isn't used by another card, or by a user other than the card's owner"""
+        supabase = get_supabase()
+        users_query = supabase.table("users").select("id").eq("slug", slug)
+        if user_id is not None:
+            users_query = users_query.neq("id", user_id)
+        cards_query = supabase.table("business_cards").select("id").eq("slug", slug).neq("id", card_id)
+
+        users_result, cards_result = await asyncio.gather(run_query(users_query), run_query(cards_query))
+        return not users_result.data and not cards_result.data
     
     @staticmethod
+    @traced()
     async def delete_business_card(card_id: int) -> bool:
         """Delete a business card"""
         try:
@@ -218,54 +422,63 @@ class BusinessCardService:
             
             # Delete the card
             result = supabase.table("business_cards").delete().eq("id", card_id).execute()
+            slug_index.discard(current_card["slug"])
+            slug_routes.remove_card(current_card["slug"], card_id, user_id)
             
             # If this was the primary card, set another card as primary if available
             if is_primary:
                 remaining_cards = supabase.table("business_cards").select("id").eq("user_id", user_id).limit(1).execute()
                 if remaining_cards.data and len(remaining_cards.data) > 0:
-                    supabase.table("business_cards").update({"is_primary": True}).eq("id", remaining_cards.data[0]["id"]).execute()
+                    supabase.table("business_cards").update({"is_primary": True, "updated_at": datetime.now(timezone.utc).isoformat()}).eq("id", remaining_cards.data[0]["id"]).execute()
             
             return True
         except Exception as e:
-            print(f"Error deleting business card: {str(e)}")
+            logger.error("Error deleting business card: %s", e)
             return False
     
     @staticmethod
+    @traced()
     async def set_as_primary(card_id: int, user_id: str) -> Dict[str, Any]:
         """Set a business card as primary"""
         try:
             supabase = get_supabase()
             
             # Find the card to set as primary
-            card = supabase.table("business_cards").select("*").eq("id", card_id).eq("user_id", user_id).single().execute()
+            card = supabase.table("business_cards").select("id").eq("id", card_id).eq("user_id", user_id).single().execute()
             
             if not card.data:
                 raise HTTPException(status_code=404, detail="Business card not found")
             
+            # updated_at is the version conditional GETs compare, so flips bump it too
+            now = datetime.now(timezone.utc).isoformat()
+
             # Set all cards for this user as not primary
-            supabase.table("business_cards").update({"is_primary": False}).eq("user_id", user_id).execute()
+            supabase.table("business_cards").update({"is_primary": False, "updated_at": now}).eq("user_id", user_id).eq("is_primary", True).execute()
             
             # Set the requested card as primary
-            result = supabase.table("business_cards").update({"is_primary": True}).eq("id", card_id).execute()
+            result = supabase.table("business_cards").update({"is_primary": True, "updated_at": now}).eq("id", card_id).execute()
             
             if not result.data:
                 raise HTTPException(status_code=500, detail="Failed to set card as primary")
+
+            slug_routes.set_card(result.data[0]["slug"], card_id, result.data[0]["user_id"])
                 
             # Process contact field from JSON string if needed
             if result.data[0].get('contact') and isinstance(result.data[0]['contact'], str):
                 result.data[0]['contact'] = json.loads(result.data[0]['contact'])
                 
-            return result.data[0]
+            return expand_image_urls(result.data[0])
         except Exception as e:
-            print(f"Error setting card as primary: {str(e)}")
+            logger.error("Error setting card as primary: %s", e)
             raise HTTPException(status_code=500, detail=f"Error setting card as primary: {str(e)}")
     
     @staticmethod
-    async def get_by_slug(slug: str) -> Optional[Dict[str, Any]]:
+    @traced()
+    async def get_by_slug(slug: str, columns: str = CARD_COLUMNS) -> Optional[Dict[str, Any]]:
         """Get a business card by slug"""
         try:
             supabase = get_supabase()
-            result = supabase.table("business_cards").select("*").eq("slug", slug).single().execute()
+            result = supabase.table("business_cards").select(columns).eq("slug", slug).single().execute()
             
             if not result.data:
                 return None
@@ -274,12 +487,13 @@ class BusinessCardService:
             if result.data.get('contact') and isinstance(result.data['contact'], str):
                 result.data['contact'] = json.loads(result.data['contact'])
                 
-            return result.data
+            return expand_image_urls(result.data)
         except Exception as e:
-            print(f"Error getting business card by slug: {str(e)}")
+            logger.error("Error getting business card by slug: %s", e)
             return None
     
     @staticmethod
+    @traced()
     async def check_slug_availability(slug: str, current_user_id: Optional[str] = None) -> Dict[str, bool]:
         """Check if a slug is available"""
         try:
@@ -302,17 +516,37 @@ class BusinessCardService:
             
             return {"available": len(cards_result.data) == 0}
         except Exception as e:
-            print(f"Error checking slug availability: {str(e)}")
+            logger.error("Error checking slug availability: %s", e)
             return {"available": False}
-    
+
+    @staticmethod
+    @traced()
+    async def check_slugs_availability(slugs: List[str]) -> Dict[str, bool]:
+        """Check many slugs at once, one query per table and chunk of slugs, run concurrently"""
+        if not slugs:
+            return {}
+        try:
+            supabase = get_supabase()
+            chunks = [slugs[i:i + SLUG_QUERY_CHUNK] for i in range(0, len(slugs), SLUG_QUERY_CHUNK)]
+            results = await asyncio.gather(*(
+                run_query(supabase.table(table).select("slug").in_("slug", chunk))
+                for table in ("users", "business_cards")
+                for chunk in chunks
+            ))
+
+            taken = {row["slug"] for result in results for row in (result.data or [])}
+            return {slug: slug not in taken for slug in slugs}
+        except Exception as e:
+            logger.error("Error checking slugs availability: %s", e)
+            return {slug: False for slug in slugs}
+
     @staticmethod
     def generate_qr_code_url(slug: str, base_url: Optional[str] = None) -> str:
         """Generate a URL for the QR code"""
-        if base_url:
-            return f"{base_url.rstrip('/')}/{slug}"
-        return f"https://yourapp.com/{slug}"  # Default URL
+        return f"{(base_url or settings.PUBLIC_BASE_URL).rstrip('/')}/{slug}"
     
     @staticmethod
+    @traced()
     def generate_qr_code_image(data: str) -> str:
         """Generate a QR code image"""
         qr = qrcode.QRCode(
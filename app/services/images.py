@@ -0,0 +1,178 @@
+import os
+import asyncio
+import hashlib
+import tempfile
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Dict, List, Any, Tuple
+
+from fastapi import UploadFile, HTTPException
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+from app.core.config import settings
+from app.core.tracing import traced
+
+# Longest edge in pixels for each stored derivative. Public cards show the
+# photo at 96px; 320/640 cover the card page at 1x and 2x.
+VARIANTS = {"thumb": 96, "card": 320, "retina": 640}
+
+# The variant whose URL is stored on the card
+STORED_VARIANT = "card"
+
+# Images are stored once per distinct source and shared by every card using them
+CAS_PREFIX = "cas"
+
+# Refuse decompression bombs before they are decoded (~40 megapixels)
+Image.MAX_IMAGE_PIXELS = 40_000_000
+
+
+def _init_worker() -> None:
+    """Pool initializer. Pillow only raises above twice MAX_IMAGE_PIXELS and
+    merely warns between 1x and 2x, so the warning is made an error too."""
+    warnings.simplefilter("error", Image.DecompressionBombWarning)
+
+
+def render_variants(source_path: str, out_dir: str, stem: str, quality: int, avif: bool) -> List[Dict[str, Any]]:
+    """
+    Decode one image and write every derivative into out_dir. Runs in a worker
+    process. Images are never upscaled, EXIF orientation is applied to the
+    pixels, and no metadata is copied to the outputs.
+    """
+    with Image.open(source_path) as image:
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+        formats = [("webp", "image/webp")]
+        if avif and features.check("avif"):
+            formats.append(("avif", "image/avif"))
+
+        rendered = []
+        for variant, edge in VARIANTS.items():
+            resized = image.copy()
+            resized.thumbnail((edge, edge), Image.LANCZOS)
+            for extension, content_type in formats:
+                filename = f"{stem}_{variant}.{extension}"
+                path = os.path.join(out_dir, filename)
+                resized.save(path, quality=quality)
+                rendered.append({
+                    "variant": variant,
+                    "filename": filename,
+                    "path": path,
+                    "content_type": content_type,
+                    "width": resized.width,
+                    "height": resized.height,
+                    "bytes": os.path.getsize(path),
+                })
+        return rendered
+
+
+def _spool_to_path(upload: UploadFile, path: str) -> str:
+    """Copy an upload to path, returning the SHA-256 of its bytes"""
+    digest = hashlib.sha256()
+    upload.file.seek(0)
+    with open(path, "wb") as out:
+        while True:
+            chunk = upload.file.read(256 * 1024)
+            if not chunk:
+                break
+            digest.update(chunk)
+            out.write(chunk)
+    upload.file.seek(0)
+    return digest.hexdigest()
+
+
+class ImagePipeline:
+    """
+    Upload-time image derivatives, rendered in a process pool so decoding and
+    encoding never hold the event loop or the GIL of a request worker.
+    Works on temp file paths only; no image bytes cross the process boundary.
+    """
+
+    def __init__(self, workers: int = 2, quality: int = 80, avif: bool = False):
+        self.workers = workers
+        self.quality = quality
+        self.avif = avif
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.stats = {"rendered": 0, "deduplicated": 0}
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        return self._pool
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def spool(self, upload: UploadFile, workdir: str) -> Tuple[str, str]:
+        """Copy an upload into workdir, returning its path and content hash"""
+        source = os.path.join(workdir, "source")
+        digest = await asyncio.to_thread(_spool_to_path, upload, source)
+        return source, digest
+
+    @traced("ImagePipeline.render")
+    async def render(self, source: str, stem: str, workdir: str) -> List[Dict[str, Any]]:
+        """Write the derivatives of a spooled source into workdir; the caller removes it"""
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self.pool, render_variants, source, workdir, stem, self.quality, self.avif)
+        except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+            raise HTTPException(status_code=413, detail="Image dimensions too large")
+        except UnidentifiedImageError:
+            raise HTTPException(status_code=415, detail="Unsupported image type")
+
+    @staticmethod
+    def workdir() -> str:
+        return tempfile.mkdtemp(prefix="kinvo-img-")
+
+
+def cas_folder(digest: str) -> str:
+    """Content-addressed folder for images whose source bytes hash to digest"""
+    return f"{CAS_PREFIX}/{digest[:2]}"
+
+
+def cas_path(url: Optional[str]) -> Optional[str]:
+    """Bucket path of a content-addressed image URL, None for per-user paths"""
+    if not url:
+        return None
+    marker = f"/{CAS_PREFIX}/"
+    base = url.split("?")[0]
+    if base.startswith(f"{CAS_PREFIX}/"):
+        return base
+    if marker not in base:
+        return None
+    return base[base.rindex(marker) + 1:]
+
+
+def cas_digest(path: str) -> str:
+    """Content hash a content-addressed path was stored under"""
+    return path.rsplit("/", 1)[-1].split("_", 1)[0]
+
+
+def derivative_paths(stored_path: str) -> List[str]:
+    """Every file written for an image, given its stored variant's path"""
+    stem = stored_path[:-len(f"_{STORED_VARIANT}.webp")]
+    return [f"{stem}_{variant}.{extension}" for variant in VARIANTS for extension in ("webp", "avif")]
+
+
+def variant_urls(url: Optional[str]) -> Optional[Dict[str, str]]:
+    """URLs of every WebP derivative, given the stored one; None for legacy originals"""
+    if not url:
+        return None
+    base, query_sep, query = url.partition("?")
+    suffix = f"_{STORED_VARIANT}.webp"
+    if not base.endswith(suffix):
+        return None
+    stem = base[:-len(suffix)]
+    return {variant: f"{stem}_{variant}.webp{query_sep}{query}" for variant in VARIANTS}
+
+
+# Shared per-worker pipeline
+image_pipeline = ImagePipeline(
+    workers=settings.IMAGE_WORKERS,
+    quality=settings.IMAGE_QUALITY,
+    avif=settings.IMAGE_AVIF_ENABLED,
+)
@@ -0,0 +1,235 @@
+# services/jobs.py
+import random
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any, List, Callable, Awaitable
+
+from app.core.config import settings
+from app.db.session import get_supabase, run_query
+
+logger = logging.getLogger(__name__)
+
+# Outbox table the queue persists jobs in:
+#
+#   create table jobs (
+#       id bigint generated always as identity primary key,
+#       kind text not null,
+#       payload jsonb not null default '{}',
+#       attempts int not null default 0,
+#       status text not null default 'pending',  -- pending | failed
+#       run_at timestamptz not null default now(),
+#       last_error text,
+#       created_at timestamptz not null default now()
+#   );
+#   create index jobs_due on jobs (run_at) where status = 'pending';
+
+JobHandler = Callable[..., Awaitable[None]]
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobQueue:
+    """In-process background jobs for side effects a response doesn't wait on.
+
+    ``enqueue`` writes the job to the outbox table and hands it to this
+    worker's pool straight away, so the request only pays for one insert.
+    A row is deleted once its handler succeeds. A failed attempt is
+    rescheduled with exponential backoff, and the job is marked ``failed``
+    after ``max_attempts``.
+
+    Every worker polls the outbox for due jobs, so retries and jobs left
+    behind by a worker that stopped mid-run are picked up by whichever
+    worker claims them first. A claim bumps ``attempts`` and moves
+    ``run_at`` a lease ahead, conditional on ``attempts`` being unchanged,
+    so two workers never start the same attempt. Handlers must still be
+    idempotent: a job whose lease runs out before it finishes runs again.
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        poll_seconds: float = 5.0,
+        max_attempts: int = 8,
+        base_delay: float = 2.0,
+        max_delay: float = 600.0,
+        lease_seconds: float = 120.0,
+        batch_size: int = 50,
+        table: str = "jobs",
+    ):
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease_seconds = lease_seconds
+        self.batch_size = batch_size
+        self.table = table
+        self.stats = {"enqueued": 0, "succeeded": 0, "retried": 0, "failed": 0}
+        self._handlers: Dict[str, JobHandler] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        return self._queue
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        """Run ``handler(**payload)`` for jobs of this kind"""
+        self._handlers[kind] = handler
+
+    def backoff(self, attempts: int) -> float:
+        """Seconds to wait after a failed attempt, jittered so retries don't bunch up"""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _lease(self) -> str:
+        return (_now() + timedelta(seconds=self.lease_seconds)).isoformat()
+
+    async def enqueue(self, kind: str, delay: float = 0.0, **payload: Any) -> None:
+        """
+        Persist a job and queue it on this worker; payload must be JSON-serializable.
+        A job with a ``delay`` is left in the outbox for whichever worker polls it once due.
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        if delay > 0:
+            run_at = (_now() + timedelta(seconds=delay)).isoformat()
+            job = {"kind": kind, "payload": payload, "attempts": 0, "status": "pending", "run_at": run_at}
+        else:
+            # Written already claimed by this worker, which starts it right away
+            job = {"kind": kind, "payload": payload, "attempts": 1, "status": "pending", "run_at": self._lease()}
+        try:
+            result = await run_query(get_supabase().table(self.table).insert(job))
+            if result.data:
+                job = result.data[0]
+            stored = True
+        except Exception as e:
+            # Still run it here, it just won't survive a restart
+            logger.error("Error writing job to outbox: %s", e)
+            stored = False
+
+        self.stats["enqueued"] += 1
+        if delay <= 0:
+            self.queue.put_nowait(job)
+        elif not stored:
+            job["attempts"] = 1
+            asyncio.get_running_loop().call_later(delay, self.queue.put_nowait, job)
+
+    async def run(self, job: Dict[str, Any]) -> bool:
+        """Run one claimed job and record the outcome, True if it succeeded"""
+        handler = self._handlers.get(job["kind"])
+        try:
+            if handler is None:
+                raise LookupError(f"No handler registered for {job['kind']}")
+            await handler(**(job.get("payload") or {}))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Job %s failed (attempt %s): %s", job["kind"], job["attempts"], e)
+            await self._record_failure(job, e)
+            return False
+
+        self.stats["succeeded"] += 1
+        if job.get("id") is not None:
+            await self._write(get_supabase().table(self.table).delete().eq("id", job["id"]))
+        return True
+
+    async def _record_failure(self, job: Dict[str, Any], error: Exception) -> None:
+        attempts = job["attempts"]
+        if attempts >= self.max_attempts:
+            self.stats["failed"] += 1
+            update = {"status": "failed", "last_error": str(error)}
+        else:
+            self.stats["retried"] += 1
+            run_at = _now() + timedelta(seconds=self.backoff(attempts))
+            update = {"run_at": run_at.isoformat(), "last_error": str(error)}
+
+        if job.get("id") is not None:
+            # Skipped if another worker has claimed the job since
+            await self._write(
+                get_supabase().table(self.table).update(update).eq("id", job["id"]).eq("attempts", attempts)
+            )
+
+    async def _write(self, query) -> None:
+        try:
+            await run_query(query)
+        except Exception as e:
+            logger.error("Error updating job outbox: %s", e)
+
+    async def claim_due(self, limit: int) -> List[Dict[str, Any]]:
+        """Claim up to ``limit`` due jobs from the outbox for this worker"""
+        supabase = get_supabase()
+        due = await run_query(
+            supabase.table(self.table)
+            .select("id, kind, payload, attempts")
+            .eq("status", "pending")
+            .lte("run_at", _now().isoformat())
+            .order("run_at")
+            .limit(limit)
+        )
+
+        claimed = []
+        for job in due.data or []:
+            result = await run_query(
+                supabase.table(self.table)
+                .update({"attempts": job["attempts"] + 1, "run_at": self._lease()})
+                .eq("id", job["id"])
+                .eq("attempts", job["attempts"])
+            )
+            if result.data:
+                claimed.append(result.data[0])
+        return claimed
+
+    async def _work(self) -> None:
+        while True:
+            job = await self.queue.get()
+            try:
+                await self.run(job)
+            finally:
+                self.queue.task_done()
+
+    async def _poll(self) -> None:
+        while True:
+            try:
+                # Only claim what the pool can start before the leases run out
+                room = self.batch_size - self.queue.qsize()
+                if room > 0:
+                    for job in await self.claim_due(room):
+                        self.queue.put_nowait(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Error polling job outbox: %s", e)
+            await asyncio.sleep(self.poll_seconds)
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+            self._tasks.append(asyncio.create_task(self._poll()))
+
+    async def stop(self, drain_seconds: float = 5.0) -> None:
+        """Give queued jobs a moment to finish; the outbox keeps any that don't"""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=drain_seconds)
+        except asyncio.TimeoutError:
+            pass
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+# Shared per-worker job queue
+job_queue = JobQueue(
+    workers=settings.JOB_WORKERS,
+    poll_seconds=settings.JOB_POLL_SECONDS,
+    max_attempts=settings.JOB_MAX_ATTEMPTS,
+)
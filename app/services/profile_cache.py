@@ -0,0 +1,137 @@
+import gzip
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Dict, Any, Set
+
+import brotli
+from fastapi import Request, Response
+
+from app.core.config import settings
+from app.core.http_cache import make_etag, choose_encoding, is_not_modified, latest, validators
+from app.core.responses import dumps
+from app.services.slug_routes import slug_routes
+
+
+class CachedPayload:
+    """Serialized public profile plus its compressed variants and validators"""
+
+    __slots__ = ("slug", "card_id", "user_id", "body", "encoded", "etag", "last_modified", "created_at")
+
+    def __init__(self, slug: str, card_id: int, user_id: int, body: bytes, updated_at: Optional[datetime] = None):
+        self.slug = slug
+        self.card_id = card_id
+        self.user_id = user_id
+        self.body = body
+        self.etag = make_etag(body)
+        # Built on a cache miss, on the request path, so at the same levels as the compression middleware
+        self.encoded: Dict[str, bytes] = {
+            "gzip": gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0),
+            "br": brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY),
+        }
+        self.last_modified = updated_at
+        self.created_at = time.monotonic()
+
+    def response(self, request: Request) -> Response:
+        encoding = choose_encoding(request.headers.get("accept-encoding"), self.encoded.keys())
+        # Encoded bodies aren't byte-identical to the identity one, so like the
+        # compression middleware they only get a weak ETag
+        etag = f"W/{self.etag}" if encoding else self.etag
+        headers = validators(etag, self.last_modified, "public, max-age=0, must-revalidate")
+        headers["Vary"] = "Accept-Encoding"
+
+        if is_not_modified(request.headers, self.etag, self.last_modified):
+            return Response(status_code=304, headers=headers)
+
+        if encoding:
+            headers["Content-Encoding"] = encoding
+            return Response(content=self.encoded[encoding], media_type="application/json", headers=headers)
+        return Response(content=self.body, media_type="application/json", headers=headers)
+
+
+class PublicProfileCache:
+    """LRU cache of pre-serialized, pre-compressed public profile payloads.
+
+    Profiles are read far more often than written, so the JSON bytes and their
+    gzip/brotli variants are built once and served as-is until the card or its
+    owner changes. Invalidation comes from the slug routing table, which
+    reports both this worker's writes and rows other workers changed. The TTL
+    is a backstop for changes the change feed cannot see.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, CachedPayload]" = OrderedDict()
+        self._by_card: Dict[int, str] = {}
+        self._by_user: Dict[int, Set[str]] = {}
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, slug: str) -> Optional[CachedPayload]:
+        payload = self._entries.get(slug)
+        if payload is not None and time.monotonic() - payload.created_at > self.ttl_seconds:
+            self.invalidate(slug)
+            payload = None
+        if payload is None:
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(slug)
+        self.stats["hits"] += 1
+        return payload
+
+    def put(self, slug: str, profile: Dict[str, Any], card: Dict[str, Any], user: Optional[Dict[str, Any]] = None) -> CachedPayload:
+        # The profile shows both the card and its owner's name, so either can move Last-Modified
+        updated_at = latest(card.get("updated_at"), (user or {}).get("updated_at"))
+        payload = CachedPayload(slug, card["id"], card["user_id"], dumps(profile), updated_at)
+        self.invalidate(slug, count=False)
+        self._entries[slug] = payload
+        self._by_card[payload.card_id] = slug
+        self._by_user.setdefault(payload.user_id, set()).add(slug)
+        while len(self._entries) > self.max_entries:
+            oldest, evicted = self._entries.popitem(last=False)
+            self._unlink(oldest, evicted)
+        return payload
+
+    def _unlink(self, slug: str, payload: CachedPayload) -> None:
+        if self._by_card.get(payload.card_id) == slug:
+            del self._by_card[payload.card_id]
+        slugs = self._by_user.get(payload.user_id)
+        if slugs:
+            slugs.discard(slug)
+            if not slugs:
+                del self._by_user[payload.user_id]
+
+    def invalidate(self, slug: str, count: bool = True) -> None:
+        payload = self._entries.pop(slug, None)
+        if payload is None:
+            return
+        if count:
+            self.stats["invalidations"] += 1
+        self._unlink(slug, payload)
+
+    def invalidate_card(self, card_id: int) -> None:
+        slug = self._by_card.get(card_id)
+        if slug:
+            self.invalidate(slug)
+
+    def invalidate_user(self, user_id: int) -> None:
+        for slug in list(self._by_user.get(user_id, ())):
+            self.invalidate(slug)
+
+    def on_change(self, table: str, row: Dict[str, Any]) -> None:
+        """Routing table listener: drop payloads built from a changed row"""
+        if row.get("slug"):
+            self.invalidate(row["slug"])
+        if table == "business_cards":
+            if row.get("id") is not None:
+                self.invalidate_card(row["id"])
+            # A card becoming primary changes what its owner's user slug shows
+            if row.get("user_id") is not None:
+                self.invalidate_user(row["user_id"])
+        elif table == "users" and row.get("id") is not None:
+            self.invalidate_user(row["id"])
+
+
+# Shared per-worker cache
+profile_cache = PublicProfileCache()
+slug_routes.add_listener(profile_cache.on_change)
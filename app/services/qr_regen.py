@@ -0,0 +1,168 @@
+# services/qr_regen.py
+"""
+Points every card's qr_code_url at the public base URL, after a domain change.
+
+    python -m app.services.qr_regen --dry-run
+    python -m app.services.qr_regen --base-url https://kinvo.app
+"""
+import os
+import sys
+import json
+import time
+import logging
+import asyncio
+import argparse
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List
+
+from app.core.config import settings
+from app.db.session import get_supabase, run_query
+from app.services.business_card import BusinessCardService
+
+logger = logging.getLogger(__name__)
+
+
+class QRRegeneration:
+    """Resumable rewrite of ``business_cards.qr_code_url``.
+
+    Cards are read in id order with keyset pagination. Rows whose URL is
+    already right are skipped, the rest of each page is updated
+    concurrently, and the last id done is written to a state file after
+    every page. A rerun for the same base URL carries on from there, so an
+    interrupted run loses at most one page of work.
+
+    Each update is conditional on the slug it was computed from; a card
+    renamed mid-run already got a fresh URL from the rename. ``updated_at``
+    is bumped so caches and slug routing tables pick up the change.
+    QR images are rendered from ``qr_code_url`` on request, so nothing
+    else needs regenerating.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        state_path: str = ".qr_regen_state.json",
+        page_size: int = 500,
+        concurrency: int = 16,
+        dry_run: bool = False,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.state_path = state_path
+        self.page_size = page_size
+        self.concurrency = concurrency
+        self.dry_run = dry_run
+        self.stats = {"scanned": 0, "current": 0, "updated": 0, "renamed": 0, "errors": 0}
+
+    def target(self, card: Dict[str, Any]) -> str:
+        return BusinessCardService.generate_qr_code_url(card["slug"], self.base_url)
+
+    def load_state(self) -> int:
+        """Id to resume after; 0 when there is no run in progress for this base URL"""
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if state.get("base_url") != self.base_url:
+            return 0
+        return int(state.get("last_id", 0))
+
+    def save_state(self, last_id: int, complete: bool = False) -> None:
+        state = {"base_url": self.base_url, "last_id": last_id, "complete": complete, "stats": self.stats}
+        partial = f"{self.state_path}.tmp"
+        with open(partial, "w") as f:
+            json.dump(state, f)
+        os.replace(partial, self.state_path)
+
+    async def run(self, restart: bool = False) -> Dict[str, Any]:
+        supabase = get_supabase()
+        last_id = 0 if restart else self.load_state()
+        started = time.monotonic()
+
+        while True:
+            result = await run_query(
+                supabase.table("business_cards")
+                .select("id, slug, qr_code_url")
+                .gt("id", last_id)
+                .order("id")
+                .limit(self.page_size)
+            )
+            page = result.data or []
+            stale = [card for card in page if card.get("slug") and card.get("qr_code_url") != self.target(card)]
+            self.stats["scanned"] += len(page)
+            self.stats["current"] += len(page) - len(stale)
+            if stale and not self.dry_run:
+                await self._update(stale)
+            elif stale:
+                self.stats["updated"] += len(stale)
+
+            if page:
+                last_id = page[-1]["id"]
+            done = len(page) < self.page_size
+            if not self.dry_run:
+                self.save_state(last_id, complete=done)
+            self._progress(started, last_id)
+            if done:
+                break
+
+        elapsed = time.monotonic() - started
+        return {
+            **self.stats,
+            "base_url": self.base_url,
+            "dry_run": self.dry_run,
+            "last_id": last_id,
+            "seconds": round(elapsed, 2),
+            "cards_per_second": round(self.stats["scanned"] / elapsed, 1) if elapsed else None,
+        }
+
+    async def _update(self, cards: List[Dict[str, Any]]) -> None:
+        supabase = get_supabase()
+        limit = asyncio.Semaphore(self.concurrency)
+        updated_at = datetime.now(timezone.utc).isoformat()
+
+        async def update(card: Dict[str, Any]) -> None:
+            async with limit:
+                try:
+                    result = await run_query(
+                        supabase.table("business_cards")
+                        .update({"qr_code_url": self.target(card), "updated_at": updated_at})
+                        .eq("id", card["id"])
+                        .eq("slug", card["slug"])
+                    )
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    logger.error("Error updating QR code URL for card %s: %s", card["id"], e)
+                    return
+                self.stats["updated" if result.data else "renamed"] += 1
+
+        await asyncio.gather(*(update(card) for card in cards))
+
+    def _progress(self, started: float, last_id: int) -> None:
+        elapsed = time.monotonic() - started
+        rate = self.stats["scanned"] / elapsed if elapsed else 0.0
+        print(
+            f"{self.stats['scanned']} cards scanned, {self.stats['updated']} updated, "
+            f"{rate:.0f} cards/s, last id {last_id}"
+        )
+
+
+async def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--base-url", default=settings.PUBLIC_BASE_URL)
+    parser.add_argument("--state", default=".qr_regen_state.json", help="progress file used to resume")
+    parser.add_argument("--restart", action="store_true", help="ignore saved progress")
+    parser.add_argument("--dry-run", action="store_true", help="count stale cards without updating them")
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args(argv)
+
+    job = QRRegeneration(args.base_url, args.state, args.page_size, args.concurrency, args.dry_run)
+    report = await job.run(restart=args.restart)
+    for name, value in report.items():
+        print(f"{name:20s} {value}")
+    return report
+
+
+if __name__ == "__main__":
+    report = asyncio.run(main())
+    sys.exit(1 if report["errors"] else 0)
@@ -0,0 +1,172 @@
+import re
+import time
+import asyncio
+from bisect import bisect_left, insort
+from typing import Optional, List, Iterable
+
+from app.db.session import get_supabase
+
+SLUG_MAX_LENGTH = 20
+SLUG_PATTERN = re.compile(r'^[a-z0-9-]+$')
+
+# Words that carry no meaning in a slug when derived from a title
+_STOP_WORDS = {"a", "an", "and", "at", "of", "the", "for", "in", "on", "to"}
+
+
+def normalize_slug(slug: str) -> str:
+    """Normalize a slug the same way the routes do before checking it"""
+    return slug.strip().lower()
+
+
+def validate_slug(slug: str) -> Optional[str]:
+    """Return an error message if the slug is invalid, otherwise None"""
+    if not slug:
+        return "Slug is required"
+    if len(slug) > SLUG_MAX_LENGTH:
+        return f"Slug must be {SLUG_MAX_LENGTH} characters or less"
+    if ' ' in slug:
+        return "Slug cannot contain spaces"
+    if not SLUG_PATTERN.match(slug):
+        return "Slug can only contain letters, numbers, and hyphens"
+    return None
+
+
+def slugify(text: str) -> str:
+    """Turn free text (a title or display name) into a slug"""
+    words = re.findall(r'[a-z0-9]+', text.lower())
+    return "-".join(words)[:SLUG_MAX_LENGTH].strip("-")
+
+
+class SlugIndex:
+    """Sorted in-memory index of every slug in use, for prefix lookups.
+
+    Slugs from both the ``users`` and ``business_cards`` tables are kept in one
+    sorted list, so all slugs sharing a prefix sit next to each other and can be
+    found with two binary searches. The index is only a hint: callers still
+    confirm availability against the database before handing a slug out.
+    """
+
+    def __init__(self, ttl_seconds: float = 300.0):
+        self.ttl_seconds = ttl_seconds
+        self._slugs: List[str] = []
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._slugs)
+
+    def __contains__(self, slug: str) -> bool:
+        i = bisect_left(self._slugs, slug)
+        return i < len(self._slugs) and self._slugs[i] == slug
+
+    @property
+    def is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl_seconds
+
+    def load(self, slugs: Iterable[str]) -> None:
+        """Replace the index contents"""
+        self._slugs = sorted({s for s in slugs if s})
+        self._loaded_at = time.monotonic()
+
+    def add(self, slug: str) -> None:
+        if slug and slug not in self:
+            insort(self._slugs, slug)
+
+    def discard(self, slug: str) -> None:
+        i = bisect_left(self._slugs, slug)
+        if i < len(self._slugs) and self._slugs[i] == slug:
+            del self._slugs[i]
+
+    def with_prefix(self, prefix: str) -> List[str]:
+        """All indexed slugs that start with prefix"""
+        start = bisect_left(self._slugs, prefix)
+        # '\x7f' sorts after every character allowed in a slug
+        end = bisect_left(self._slugs, prefix + '\x7f', lo=start)
+        return self._slugs[start:end]
+
+    def candidates(self, slug: str, title: Optional[str] = None) -> List[str]:
+        """Ranked suggestion candidates for a taken slug, best first.
+
+        Title-derived forms come first because they read naturally, then the
+        hyphenated variants, then numeric suffixes. Every candidate is a valid
+        slug; ones already in the index are left out.
+        """
+        base = slug.strip("-")[:SLUG_MAX_LENGTH]
+        ranked: List[str] = []
+
+        def push(candidate: str) -> None:
+            candidate = candidate.strip("-")
+            if (
+                candidate
+                and candidate != slug
+                and candidate not in ranked
+                and validate_slug(candidate) is None
+            ):
+                ranked.append(candidate)
+
+        # Title-derived: "<slug>-<word>", the bare title and its initials
+        if title:
+            words = [w for w in slugify(title).split("-") if w and w not in _STOP_WORDS]
+            for word in words:
+                push(f"{base[:SLUG_MAX_LENGTH - len(word) - 1]}-{word}")
+            if words:
+                push(slugify(" ".join(words)))
+                initials = "".join(w[0] for w in words)
+                push(f"{base[:SLUG_MAX_LENGTH - len(initials) - 1]}-{initials}")
+
+        # Hyphenation: drop or move existing hyphens
+        if "-" in base:
+            push(base.replace("-", ""))
+            parts = base.split("-")
+            push("-".join(reversed(parts)))
+
+        # Numeric suffixes, skipping every number the prefix index says is taken
+        taken = set(self.with_prefix(base[:SLUG_MAX_LENGTH - 1]))
+        numeric = 0
+        for n in range(1, 1000):
+            for sep in ("", "-"):
+                suffix = f"{sep}{n}"
+                candidate = f"{base[:SLUG_MAX_LENGTH - len(suffix)]}{suffix}"
+                if candidate not in taken:
+                    push(candidate)
+                    numeric += 1
+            if numeric >= 10:
+                break
+
+        return [c for c in ranked if c not in self]
+
+    async def ensure_loaded(self) -> None:
+        """(Re)load the index from the database if it is empty or expired"""
+        if not self.is_stale:
+            return
+        async with self._lock:
+            if not self.is_stale:
+                return
+            slugs = await asyncio.to_thread(_fetch_all_slugs)
+            self.load(slugs)
+
+
+def _fetch_all_slugs(page_size: int = 1000) -> List[str]:
+    """Page through every slug in users and business_cards"""
+    supabase = get_supabase()
+    slugs: List[str] = []
+    for table in ("users", "business_cards"):
+        start = 0
+        while True:
+            result = (
+                supabase.table(table)
+                .select("slug")
+                .order("id")
+                .range(start, start + page_size - 1)
+                .execute()
+            )
+            rows = result.data or []
+            slugs.extend(row["slug"] for row in rows if row.get("slug"))
+            if len(rows) < page_size:
+                break
+            start += page_size
+    return slugs
+
+
+# Shared per-worker index
+slug_index = SlugIndex()
@@ -0,0 +1,163 @@
+import json
+import asyncio
+from typing import Optional, Dict, Any, Iterable, Tuple
+
+from app.core.tracing import traced
+from app.db.session import get_supabase
+from app.db.storage import expand_image_urls
+from app.db.columns import CARD_COLUMNS, PROFILE_FIELDS, USER_COLUMNS
+from app.services.slug_routes import slug_routes, MISSING
+from app.services.images import variant_urls
+
+
+def _parse_contact(card: Dict[str, Any]) -> Dict[str, Any]:
+    if card.get('contact') and isinstance(card['contact'], str):
+        card['contact'] = json.loads(card['contact'])
+    return card
+
+
+class SlugResolver:
+    """Single place where a public slug is turned into a user and a card.
+
+    Lookup order:
+      1. a business card whose own slug matches, together with its owner
+      2. a user whose slug matches, together with their primary card
+
+    Each step is one PostgREST query that embeds the other side of the
+    relationship. A routing table hit turns the card step into a primary key
+    lookup; a slug the table doesn't know is still looked up in the database.
+    Concurrent lookups of the same slug and projection share one in-flight
+    query.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self.stats = {"lookups": 0, "coalesced": 0, "card_hits": 0, "user_hits": 0, "misses": 0}
+
+    @traced("SlugResolver.resolve")
+    async def resolve(self, slug: str, card_columns: str = CARD_COLUMNS) -> Optional[Dict[str, Any]]:
+        """Return {"user": ..., "card": ...} for a slug, or None.
+
+        card_columns is the projection for the card; it must include id and slug.
+        """
+        self.stats["lookups"] += 1
+        key = (slug, card_columns)
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            # The lookup runs as its own task so a caller that goes away, the
+            # first one included, cancels only its own wait
+            task = asyncio.ensure_future(self._resolve(slug, card_columns))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Tuple[str, str], task: asyncio.Future) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Mark retrieved so an exception every caller gave up on isn't logged
+        if not task.cancelled():
+            task.exception()
+
+    async def _resolve(self, slug: str, card_columns: str) -> Optional[Dict[str, Any]]:
+        # The routing table only knows what this worker has seen so far; a slug
+        # it is missing may have been created on another worker since the last
+        # poll, so MISSING falls back to looking the slug up like an unknown one
+        card_route = slug_routes.card(slug)
+        if card_route is MISSING:
+            card_route = None
+        card_task = asyncio.create_task(asyncio.to_thread(self._by_card_slug, slug, card_route, card_columns))
+
+        # When the routing table can't say whether the card step will hit, the
+        # user step is started speculatively alongside it and cancelled if the
+        # card step wins, so a miss costs one round trip instead of two
+        user_task = None
+        if card_route is None:
+            user_task = asyncio.create_task(asyncio.to_thread(self._by_user_slug, slug, card_columns))
+
+        try:
+            resolved = await card_task
+            if resolved:
+                self.stats["card_hits"] += 1
+                return resolved
+
+            if user_task is None:
+                user_task = asyncio.create_task(asyncio.to_thread(self._by_user_slug, slug, card_columns))
+            resolved = await user_task
+            if resolved:
+                self.stats["user_hits"] += 1
+                return resolved
+
+            self.stats["misses"] += 1
+            return None
+        finally:
+            for task in (card_task, user_task):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    @staticmethod
+    def _by_card_slug(slug: str, route: Optional[tuple] = None, card_columns: str = CARD_COLUMNS) -> Optional[Dict[str, Any]]:
+        supabase = get_supabase()
+        columns = f"{card_columns}, owner:users({USER_COLUMNS})"
+        query = supabase.table("business_cards").select(columns)
+        # The routing table gives us the primary key; verify the slug still matches
+        query = query.eq("id", route[0]) if route else query.eq("slug", slug)
+        result = query.limit(1).execute()
+
+        card = result.data[0] if result.data else None
+        if card and card.get("slug") != slug:
+            slug_routes.remove_card(slug)
+            result = supabase.table("business_cards").select(columns).eq("slug", slug).limit(1).execute()
+            card = result.data[0] if result.data else None
+        if not card:
+            return None
+
+        user = card.pop("owner", None)
+        if not user:
+            return None
+        return {"user": user, "card": expand_image_urls(_parse_contact(card))}
+
+    @staticmethod
+    def _by_user_slug(slug: str, card_columns: str = CARD_COLUMNS) -> Optional[Dict[str, Any]]:
+        supabase = get_supabase()
+        result = (
+            supabase.table("users")
+            .select(f"{USER_COLUMNS}, business_cards({card_columns})")
+            .eq("slug", slug)
+            .eq("business_cards.is_primary", True)
+            .limit(1)
+            .execute()
+        )
+        if not result.data:
+            return None
+
+        user = result.data[0]
+        cards = user.pop("business_cards", None) or []
+        card = expand_image_urls(_parse_contact(cards[0])) if cards else None
+        return {"user": user, "card": card}
+
+
+def public_profile(resolved: Dict[str, Any], fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """Public, non-sensitive view of a resolved slug, optionally limited to fields"""
+    user, card = resolved["user"], resolved["card"]
+    profile = {field: card.get(field) for field in (fields or PROFILE_FIELDS)}
+
+    # Cards show images at thumbnail size; point at the smallest derivative
+    # and list the rest for srcset. Images uploaded before derivatives existed
+    # have none and keep their original URL.
+    for field in ("photo_url", "company_logo_url"):
+        variants = variant_urls(profile.get(field))
+        if variants:
+            profile[field] = variants["thumb"]
+            profile[field.replace("_url", "_variants")] = variants
+
+    return {
+        "full_name": user["full_name"],
+        "slug": user["slug"],
+        "profile": profile
+    }
+
+
+# Shared per-worker resolver
+slug_resolver = SlugResolver()
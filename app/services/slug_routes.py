@@ -0,0 +1,366 @@
+import sys
+import asyncio
+import logging
+from array import array
+from bisect import bisect_left
+from typing import Optional, Dict, Tuple, Iterable, List, Any, Callable, Set
+
+from app.core.config import settings
+from app.db.session import get_supabase
+
+logger = logging.getLogger(__name__)
+
+# Returned by lookups when the table is loaded and the slug is not in it. It
+# is only a hint: a slug created on another worker stays missing here until
+# the next poll, so callers still check the database before answering 404
+MISSING = object()
+
+
+class _SlugKeys:
+    """Sequence view over the packed slug blob, used for bisect"""
+
+    def __init__(self, blob: bytes, offsets: array):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> bytes:
+        return self._blob[self._offsets[i]:self._offsets[i + 1]]
+
+
+class CompactSlugMap:
+    """Memory-efficient map from slug to a fixed number of integer columns.
+
+    The bulk of the entries live in one sorted, packed segment: every slug is
+    concatenated into a single ``bytes`` blob with an ``array`` of offsets, and
+    each integer column is an ``array('q')``. That costs roughly
+    ``len(slug) + 4 + 8 * width`` bytes per entry, against well over 100 bytes
+    for a dict of str to tuple. Lookups are a binary search over the blob.
+
+    Changes since the last build go into a small overlay dict (``None`` marks a
+    deletion) which is folded back into the packed segment by ``compact``.
+    """
+
+    def __init__(self, width: int, overlay_limit: int = 4096):
+        self.width = width
+        self.overlay_limit = overlay_limit
+        self._blob = b""
+        self._offsets = array('I', [0])
+        self._columns = [array('q') for _ in range(width)]
+        self._overlay: Dict[str, Optional[Tuple[int, ...]]] = {}
+
+    def build(self, rows: Iterable[Tuple[str, Tuple[int, ...]]]) -> None:
+        """Replace the contents with rows of (slug, values)"""
+        latest = {slug: values for slug, values in rows if slug}
+        blob = bytearray()
+        offsets = array('I', [0])
+        columns = [array('q') for _ in range(self.width)]
+        for slug in sorted(latest):
+            blob += slug.encode()
+            offsets.append(len(blob))
+            for column, value in zip(columns, latest[slug]):
+                column.append(value)
+        self._blob = bytes(blob)
+        self._offsets = offsets
+        self._columns = columns
+        self._overlay = {}
+
+    def _packed_index(self, key: bytes) -> Optional[int]:
+        keys = _SlugKeys(self._blob, self._offsets)
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            return i
+        return None
+
+    def get(self, slug: str) -> Optional[Tuple[int, ...]]:
+        if slug in self._overlay:
+            return self._overlay[slug]
+        i = self._packed_index(slug.encode())
+        if i is None:
+            return None
+        return tuple(column[i] for column in self._columns)
+
+    def set(self, slug: str, values: Tuple[int, ...]) -> None:
+        self._overlay[slug] = tuple(values)
+        if len(self._overlay) > self.overlay_limit:
+            self.compact()
+
+    def delete(self, slug: str) -> None:
+        self._overlay[slug] = None
+        if len(self._overlay) > self.overlay_limit:
+            self.compact()
+
+    def items(self) -> Iterable[Tuple[str, Tuple[int, ...]]]:
+        keys = _SlugKeys(self._blob, self._offsets)
+        for i in range(len(keys)):
+            slug = keys[i].decode()
+            if slug not in self._overlay:
+                yield slug, tuple(column[i] for column in self._columns)
+        for slug, values in self._overlay.items():
+            if values is not None:
+                yield slug, values
+
+    def compact(self) -> None:
+        """Fold the overlay back into the packed segment"""
+        self.build(list(self.items()))
+
+    def snapshot(self) -> "CompactSlugMap":
+        """A copy that can be read from another thread while this map changes.
+
+        The packed segment is never modified in place, only replaced, so the
+        copy shares it and only the overlay is copied.
+        """
+        copy = CompactSlugMap(self.width, self.overlay_limit)
+        copy._blob, copy._offsets, copy._columns = self._blob, self._offsets, self._columns
+        copy._overlay = dict(self._overlay)
+        return copy
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.items()) if self._overlay else len(self._offsets) - 1
+
+    def nbytes(self) -> int:
+        """Approximate memory held by this map"""
+        size = sys.getsizeof(self._blob) + sys.getsizeof(self._offsets)
+        size += sum(sys.getsizeof(column) for column in self._columns)
+        size += sys.getsizeof(self._overlay)
+        for slug, values in self._overlay.items():
+            size += sys.getsizeof(slug) + (sys.getsizeof(values) if values else 0)
+        return size
+
+
+class SlugRoutingTable:
+    """Per-worker slug routing table for public lookups.
+
+    Maps business card slugs to ``(card_id, user_id)`` and user slugs to
+    ``user_id``, so public routes can tell which card or user owns a slug
+    without asking the database. The table is loaded in full at startup and
+    then kept current by polling both tables for rows whose ``updated_at`` moved
+    past the last seen watermark. Writes made by this worker are applied
+    immediately through ``set_card`` / ``remove_card`` / ``set_user``.
+
+    Delta polling cannot see deleted rows or a slug that moved away from a row,
+    so callers must treat a hit as a hint and verify the row they fetch by id.
+    A periodic full reload drops any such stale entries.
+
+    Rows are read and packed into new maps in a worker thread; the maps are
+    swapped in and changes applied on the event loop, so lookups never see a
+    map halfway through a rebuild.
+
+    Listeners registered with ``add_listener`` are called on the event loop
+    with ``(table, row)`` for every changed row, local, polled or found by a
+    full reload, including slugs a reload no longer finds, so per-worker
+    caches built from those rows can drop their entries.
+    """
+
+    def __init__(self, poll_seconds: float = 10.0, full_reload_every: int = 360, page_size: int = 1000):
+        self.poll_seconds = poll_seconds
+        self.full_reload_every = full_reload_every
+        self.page_size = page_size
+        self.cards = CompactSlugMap(width=2)
+        self.users = CompactSlugMap(width=1)
+        self.ready = False
+        self._watermarks: Dict[str, Optional[str]] = {"business_cards": None, "users": None}
+        # Ids of rows already applied whose updated_at equals the watermark;
+        # polls ask for updated_at >= watermark and skip these
+        self._seen: Dict[str, Set[int]] = {"business_cards": set(), "users": set()}
+        self._task: Optional[asyncio.Task] = None
+        self._listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+
+    def add_listener(self, listener: Callable[[str, Dict[str, Any]], None]) -> None:
+        self._listeners.append(listener)
+
+    def _notify(self, table: str, row: Dict[str, Any]) -> None:
+        for listener in self._listeners:
+            try:
+                listener(table, row)
+            except Exception as e:
+                logger.error("Error in slug routing listener: %s", e)
+
+    # Lookups
+
+    def card(self, slug: str) -> Any:
+        """(card_id, user_id) for a card slug, MISSING if unknown, None if not ready"""
+        if not self.ready:
+            return None
+        values = self.cards.get(slug)
+        return values if values is not None else MISSING
+
+    def user(self, slug: str) -> Any:
+        """user_id for a user slug, MISSING if unknown, None if not ready"""
+        if not self.ready:
+            return None
+        values = self.users.get(slug)
+        return values[0] if values is not None else MISSING
+
+    # Local write-through
+
+    def set_card(self, slug: str, card_id: int, user_id: int, old_slug: Optional[str] = None) -> None:
+        if old_slug and old_slug != slug:
+            self.cards.delete(old_slug)
+            self._notify("business_cards", {"slug": old_slug})
+        self.cards.set(slug, (int(card_id), int(user_id)))
+        self._notify("business_cards", {"id": card_id, "user_id": user_id, "slug": slug})
+
+    def remove_card(self, slug: str, card_id: Optional[int] = None, user_id: Optional[int] = None) -> None:
+        self.cards.delete(slug)
+        self._notify("business_cards", {"id": card_id, "user_id": user_id, "slug": slug})
+
+    def set_user(self, slug: str, user_id: int, old_slug: Optional[str] = None) -> None:
+        if old_slug and old_slug != slug:
+            self.users.delete(old_slug)
+            self._notify("users", {"slug": old_slug})
+        self.users.set(slug, (int(user_id),))
+        self._notify("users", {"id": user_id, "slug": slug})
+
+    # Loading
+
+    def _fetch(self, table: str, columns: str, since: Optional[str]) -> List[Dict[str, Any]]:
+        """Keyset-paginate a table, optionally only rows updated since a watermark"""
+        supabase = get_supabase()
+        rows: List[Dict[str, Any]] = []
+        last_id = 0
+        while True:
+            query = supabase.table(table).select(columns).gt("id", last_id)
+            if since:
+                query = query.gte("updated_at", since)
+            page = query.order("id").limit(self.page_size).execute().data or []
+            rows.extend(page)
+            if len(page) < self.page_size:
+                return rows
+            last_id = page[-1]["id"]
+
+    def _advance_watermark(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        stamps = [row["updated_at"] for row in rows if row.get("updated_at")]
+        if not stamps:
+            return
+        current = self._watermarks[table]
+        newest = max(stamps)
+        if current is not None and current > newest:
+            return
+        seen = self._seen[table] if newest == current else set()
+        seen.update(row["id"] for row in rows if row.get("updated_at") == newest)
+        self._watermarks[table] = newest
+        self._seen[table] = seen
+
+    def _unseen(self, table: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Rows changed after the watermark, leaving out those already applied"""
+        watermark, seen = self._watermarks[table], self._seen[table]
+        if watermark is None:
+            return rows
+        return [
+            row for row in rows
+            if row.get("updated_at") and (row["updated_at"] > watermark or (row["updated_at"] == watermark and row["id"] not in seen))
+        ]
+
+    def _read_all(self, cards_before: CompactSlugMap, users_before: CompactSlugMap) -> Dict[str, Any]:
+        """Worker thread: read both tables in full and pack them into new maps.
+
+        Also lists the entries of the previous maps that the new ones no longer
+        have, from snapshots taken on the loop.
+        """
+        card_rows = self._fetch("business_cards", "id, user_id, slug, updated_at", None)
+        user_rows = self._fetch("users", "id, slug, updated_at", None)
+        cards = CompactSlugMap(width=2)
+        cards.build((row["slug"], (row["id"], row["user_id"])) for row in card_rows)
+        users = CompactSlugMap(width=1)
+        users.build((row["slug"], (row["id"],)) for row in user_rows)
+        return {
+            "cards": cards,
+            "users": users,
+            "card_rows": card_rows,
+            "user_rows": user_rows,
+            "cards_gone": [(slug, values) for slug, values in cards_before.items() if cards.get(slug) != values],
+            "users_gone": [(slug, values) for slug, values in users_before.items() if users.get(slug) != values],
+        }
+
+    async def load(self) -> None:
+        """Full load of both tables"""
+        loaded = await asyncio.to_thread(self._read_all, self.cards.snapshot(), self.users.snapshot())
+        changed_cards = self._unseen("business_cards", loaded["card_rows"]) if self.ready else []
+        changed_users = self._unseen("users", loaded["user_rows"]) if self.ready else []
+
+        self.cards = loaded["cards"]
+        self.users = loaded["users"]
+        self._watermarks = {"business_cards": None, "users": None}
+        self._seen = {"business_cards": set(), "users": set()}
+        self._advance_watermark("business_cards", loaded["card_rows"])
+        self._advance_watermark("users", loaded["user_rows"])
+        self.ready = True
+
+        for slug, (card_id, user_id) in loaded["cards_gone"]:
+            self._notify("business_cards", {"id": card_id, "user_id": user_id, "slug": slug})
+        for slug, (user_id,) in loaded["users_gone"]:
+            self._notify("users", {"id": user_id, "slug": slug})
+        for row in changed_cards:
+            self._notify("business_cards", row)
+        for row in changed_users:
+            self._notify("users", row)
+
+    async def poll(self) -> int:
+        """Apply rows changed since the last watermark, returns how many"""
+        card_rows, user_rows = await asyncio.to_thread(
+            lambda: (
+                self._fetch("business_cards", "id, user_id, slug, updated_at", self._watermarks["business_cards"]),
+                self._fetch("users", "id, slug, updated_at", self._watermarks["users"]),
+            )
+        )
+        cards = self._unseen("business_cards", card_rows)
+        users = self._unseen("users", user_rows)
+        for row in cards:
+            if row.get("slug"):
+                self.cards.set(row["slug"], (row["id"], row["user_id"]))
+            self._notify("business_cards", row)
+        for row in users:
+            if row.get("slug"):
+                self.users.set(row["slug"], (row["id"],))
+            self._notify("users", row)
+        self._advance_watermark("business_cards", cards)
+        self._advance_watermark("users", users)
+        return len(cards) + len(users)
+
+    async def _run(self) -> None:
+        polls = 0
+        while True:
+            try:
+                if not self.ready or polls >= self.full_reload_every:
+                    await self.load()
+                    polls = 0
+                else:
+                    await self.poll()
+                    polls += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Error refreshing slug routing table: %s", e)
+            await asyncio.sleep(self.poll_seconds)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def footprint(self) -> Dict[str, float]:
+        """Memory footprint report, extrapolated per million slugs"""
+        entries = len(self.cards) + len(self.users)
+        nbytes = self.cards.nbytes() + self.users.nbytes()
+        per_slug = nbytes / entries if entries else 0.0
+        return {
+            "entries": entries,
+            "bytes": nbytes,
+            "bytes_per_slug": round(per_slug, 1),
+            "mb_per_million_slugs": round(per_slug * 1_000_000 / (1024 * 1024), 1),
+        }
+
+
+# Shared per-worker routing table
+slug_routes = SlugRoutingTable(poll_seconds=settings.SLUG_ROUTES_POLL_SECONDS)
@@ -0,0 +1,205 @@
+# services/storage_gc.py
+"""
+Removes objects in the card image bucket that no business card refers to.
+
+    python -m app.services.storage_gc --dry-run
+    python -m app.services.storage_gc
+"""
+import sys
+import time
+import asyncio
+import logging
+import argparse
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any, List, Set, Tuple
+
+from app.core.config import settings
+from app.core.http_cache import parse_timestamp
+from app.db.session import get_supabase, run_query
+from app.db.storage import StorageClient, PHOTO_BUCKET, storage, object_path
+from app.services.images import CAS_PREFIX, cas_path, cas_digest
+
+logger = logging.getLogger(__name__)
+
+
+def reference_key(path: str) -> str:
+    """What a stored object is referenced by: its content hash for shared
+    images, so every derivative of one is kept, otherwise its own path"""
+    shared = cas_path(path)
+    return cas_digest(shared) if shared else path
+
+
+class StorageGC:
+    """Streaming mark-and-sweep over the image bucket, one shard at a time.
+
+    A shard is a user's folder (``{user_id}/...``, including its
+    ``company_logos/`` and ``uploads/`` subfolders) or one content-addressed
+    folder (``cas/ab``). For each shard the references are loaded from
+    ``business_cards``, then the shard's listing is paged through and
+    compared against them, so memory holds one shard's references and one
+    listing page, never the whole bucket or table.
+
+    Orphans are deleted a page at a time, after the references are read
+    again: an image can be attached to a card while the sweep runs. Objects
+    younger than the grace period are kept, since uploads are written before
+    the card row that refers to them. Dotfiles (folder placeholders) and
+    folders that aren't in one of the layouts above are left alone.
+    """
+
+    def __init__(
+        self,
+        client: Optional[StorageClient] = None,
+        bucket: str = PHOTO_BUCKET,
+        grace: timedelta = timedelta(hours=24),
+        page_size: int = 1000,
+        dry_run: bool = False,
+    ):
+        self.client = client if client is not None else storage
+        self.bucket = bucket
+        self.grace = grace
+        self.page_size = page_size
+        self.dry_run = dry_run
+        self.cutoff = datetime.now(timezone.utc) - grace
+        self.stats = {
+            "shards": 0, "objects": 0, "bytes": 0, "referenced": 0, "recent": 0, "kept": 0,
+            "orphans": 0, "orphan_bytes": 0, "deleted": 0, "errors": 0,
+        }
+
+    async def run(self) -> Dict[str, Any]:
+        """Sweep the whole bucket, returning the stats"""
+        started = time.monotonic()
+        self.cutoff = datetime.now(timezone.utc) - self.grace
+        for shard in await self.shards():
+            try:
+                await self.sweep(shard)
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error("Error collecting storage shard %s: %s", shard, e)
+            self.stats["shards"] += 1
+
+        elapsed = time.monotonic() - started
+        return {
+            **self.stats,
+            "dry_run": self.dry_run,
+            "seconds": round(elapsed, 2),
+            "objects_per_second": round(self.stats["objects"] / elapsed, 1) if elapsed else None,
+        }
+
+    async def _folders(self, prefix: str) -> List[str]:
+        """Names of the subfolders directly under prefix"""
+        folders = []
+        offset = 0
+        while True:
+            page = await self.client.list(self.bucket, prefix, self.page_size, offset)
+            folders.extend(entry["name"] for entry in page if entry.get("id") is None)
+            if len(page) < self.page_size:
+                return folders
+            offset += len(page)
+
+    async def shards(self) -> List[str]:
+        shards = []
+        for name in await self._folders(""):
+            if name == CAS_PREFIX:
+                shards.extend(f"{CAS_PREFIX}/{sub}" for sub in await self._folders(CAS_PREFIX))
+            elif name.isdigit():
+                shards.append(name)
+        return shards
+
+    async def references(self, shard: str) -> Set[str]:
+        """Reference keys of every card image stored in a shard"""
+        supabase = get_supabase()
+        keys: Set[str] = set()
+        last_id = 0
+        while True:
+            query = supabase.table("business_cards").select("id, photo_url, company_logo_url")
+            if shard.startswith(f"{CAS_PREFIX}/"):
+                # Matches canonical paths and full URLs stored before paths were
+                pattern = f"*{shard}/*"
+                query = query.or_(f"photo_url.like.{pattern},company_logo_url.like.{pattern}")
+            else:
+                query = query.eq("user_id", int(shard))
+            result = await run_query(query.gt("id", last_id).order("id").limit(self.page_size))
+            page = result.data or []
+            for card in page:
+                for field in ("photo_url", "company_logo_url"):
+                    if card.get(field):
+                        keys.add(reference_key(object_path(card[field], self.bucket)))
+            if len(page) < self.page_size:
+                return keys
+            last_id = page[-1]["id"]
+
+    async def sweep(self, shard: str) -> None:
+        referenced = await self.references(shard)
+        pending = [shard]
+        while pending:
+            folder = pending.pop()
+            pending.extend(await self._sweep_folder(shard, folder, referenced))
+
+    async def _sweep_folder(self, shard: str, folder: str, referenced: Set[str]) -> List[str]:
+        """Sweep the objects directly in a folder, returning its subfolders"""
+        subfolders = []
+        offset = 0
+        while True:
+            page = await self.client.list(self.bucket, folder, self.page_size, offset)
+            orphans: List[Tuple[str, int]] = []
+            for entry in page:
+                path = f"{folder}/{entry['name']}"
+                if entry.get("id") is None:
+                    subfolders.append(path)
+                    continue
+                size = (entry.get("metadata") or {}).get("size") or 0
+                self.stats["objects"] += 1
+                self.stats["bytes"] += size
+                if entry["name"].startswith("."):
+                    self.stats["kept"] += 1
+                elif reference_key(path) in referenced:
+                    self.stats["referenced"] += 1
+                elif self._recent(entry):
+                    self.stats["recent"] += 1
+                else:
+                    orphans.append((path, size))
+
+            removed = await self._collect(shard, orphans) if orphans else 0
+            if len(page) < self.page_size:
+                return subfolders
+            # Deleted entries no longer take up offsets in the listing
+            offset += len(page) - removed
+
+    def _recent(self, entry: Dict[str, Any]) -> bool:
+        created = parse_timestamp(entry.get("created_at") or entry.get("updated_at"))
+        return created is None or created > self.cutoff
+
+    async def _collect(self, shard: str, orphans: List[Tuple[str, int]]) -> int:
+        """Delete orphans that are still unreferenced, returning how many were removed"""
+        referenced = await self.references(shard)
+        confirmed = [(path, size) for path, size in orphans if reference_key(path) not in referenced]
+        self.stats["referenced"] += len(orphans) - len(confirmed)
+        self.stats["orphans"] += len(confirmed)
+        self.stats["orphan_bytes"] += sum(size for _, size in confirmed)
+        if self.dry_run or not confirmed:
+            return 0
+        await self.client.remove(self.bucket, [path for path, _ in confirmed])
+        self.stats["deleted"] += len(confirmed)
+        return len(confirmed)
+
+
+async def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="report orphans without deleting them")
+    parser.add_argument("--grace-hours", type=float, default=settings.STORAGE_GC_GRACE_HOURS)
+    parser.add_argument("--page-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    gc = StorageGC(grace=timedelta(hours=args.grace_hours), page_size=args.page_size, dry_run=args.dry_run)
+    try:
+        report = await gc.run()
+    finally:
+        await gc.client.close()
+    for name, value in report.items():
+        print(f"{name:20s} {value}")
+    return report
+
+
+if __name__ == "__main__":
+    report = asyncio.run(main())
+    sys.exit(1 if report["errors"] else 0)
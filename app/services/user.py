@@ -92,12 +92,19 @@
 # new below
 
 import re
+import logging
 from typing import Optional, Dict, Any, List
 from fastapi import HTTPException
 from pydantic import BaseModel
 
-from app.db.session import get_supabase
-from app.services.business_card import BusinessCardService 
+from app.db.session import get_supabase, run_query
+from app.db.columns import USER_COLUMNS
+from app.services.business_card import BusinessCardService
+from app.services.slug_index import slug_index
+from app.services.slug_routes import slug_routes
+
+logger = logging.getLogger(__name__)
+
 class SubscriptionTier:
     FREE = "free"
     PRO = "pro"
@@ -105,15 +112,14 @@ class SubscriptionTier:
 
 class UserService:
     @staticmethod
-    async def get_by_email(email: str):
+    async def get_by_email(email: str, columns: str = USER_COLUMNS):
         try:
             supabase = get_supabase()
-            response = (
+            response = await run_query(
                 supabase.table("users")
-                .select("*")
+                .select(columns)
                 .eq("email", email)
                 .single()
-                .execute()
             )
             
             if not response.data:
@@ -121,14 +127,14 @@ class UserService:
                 
             return response.data
         except Exception as e:
-            print(f"Error in get_by_email: {str(e)}")
+            logger.error("Error in get_by_email: %s", e)
             raise HTTPException(status_code=500, detail=str(e))
     
     @staticmethod
     async def get_by_slug(slug: str) -> Optional[Dict[str, Any]]:
         """Get a user by slug"""
         supabase = get_supabase()
-        result = supabase.table("users").select("*").eq("slug", slug).execute()
+        result = supabase.table("users").select(USER_COLUMNS).eq("slug", slug).execute()
         return result.data[0] if result.data else None
 
     @staticmethod
@@ -154,21 +160,24 @@ class UserService:
             .update({"slug": slug, "updated_at": "now()"})\
             .eq("id", user_id)\
             .execute()
-        
+
+        if result.data:
+            slug_index.add(slug)
+            slug_routes.set_user(slug, user_id)
         return result.data[0] if result.data else None
     
     @staticmethod
     def get_user_by_id(user_id: str):
         """Get a user by ID"""
         supabase = get_supabase()
-        result = supabase.table("users").select("*").eq("id", user_id).execute()
+        result = supabase.table("users").select(USER_COLUMNS).eq("id", user_id).execute()
         return result.data[0] if result.data else None
     
     @staticmethod
     async def get_current_user_by_token(token: str) -> Dict[str, Any]:
         """Get the current user by token"""
         supabase = get_supabase()
-        result = supabase.table("users").select("*").eq("email", token).single().execute()
+        result = supabase.table("users").select(USER_COLUMNS).eq("email", token).single().execute()
         
         if not result.data:
             raise HTTPException(status_code=401, detail="User not found")
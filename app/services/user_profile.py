@@ -472,16 +472,25 @@
         
 # new below    
 
-from app.db.session import get_supabase
+from app.core.config import settings
+from app.core.tracing import traced
+from app.db.session import get_supabase, run_query
+from app.db.storage import storage, StorageError, PHOTO_BUCKET, expand_image_urls, object_path
+from app.core.uploads import sniff_upload
+from app.services.jobs import job_queue
+from app.services.images import image_pipeline, STORED_VARIANT, cas_folder, cas_path, cas_digest, derivative_paths
 from app.schemas.user.business_card import BusinessCardCreate, BusinessCardUpdate
 from typing import Optional, Dict, Any, List
 from fastapi import UploadFile, HTTPException
-import uuid
 import re
+import shutil
+import asyncio
 import qrcode
 from io import BytesIO
 import base64
-import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 class BusinessCardsService:
     @staticmethod
@@ -492,6 +501,7 @@ class BusinessCardsService:
         return url
     
     @staticmethod
+    @traced()
     async def get_card_limit(user_id: int) -> int:
         """Get the maximum number of cards a user can have based on their subscription"""
         supabase = get_supabase()
@@ -509,6 +519,7 @@ class BusinessCardsService:
             return 1
     
     @staticmethod
+    @traced()
     async def get_cards_count(user_id: int) -> int:
         """Get the current number of cards a user has"""
         supabase = get_supabase()
@@ -517,6 +528,7 @@ class BusinessCardsService:
         return len(response.data) if response.data else 0
     
     @staticmethod
+    @traced()
     async def can_create_card(user_id: int) -> bool:
         """Check if a user can create another business card"""
         card_limit = await BusinessCardsService.get_card_limit(user_id)
@@ -525,6 +537,7 @@ class BusinessCardsService:
         return current_count < card_limit
     
     @staticmethod
+    @traced()
     async def get_by_user_id(user_id: int) -> List[Dict[str, Any]]:
         """Get all business cards for a user"""
         supabase = get_supabase()
@@ -538,29 +551,14 @@ class BusinessCardsService:
             # Make a copy of the data to avoid modifying the original response
             processed_card = dict(card_data)
             
-            # Handle photo URL if it exists
-            if processed_card.get('photo_url'):
-                user_folder = str(user_id)
-                filename = processed_card['photo_url'].split('/')[-1].split('?')[0]
-                file_path = f"{user_folder}/{filename}"
-                
-                public_url = supabase.storage.from_("user_profile_photos").get_public_url(file_path)
-                processed_card['photo_url'] = public_url
-            
-            # Handle company logo URL if it exists
-            if processed_card.get('company_logo_url'):
-                user_folder = f"{user_id}/company_logos"
-                filename = processed_card['company_logo_url'].split('/')[-1].split('?')[0]
-                file_path = f"{user_folder}/{filename}"
-                
-                public_url = supabase.storage.from_("user_profile_photos").get_public_url(file_path)
-                processed_card['company_logo_url'] = public_url
-                
+            # Stored image paths become public URLs by string building, no client call
+            expand_image_urls(processed_card)
             cards.append(processed_card)
         
         return cards
     
     @staticmethod
+    @traced()
     async def get_primary_card(user_id: int) -> Optional[Dict[str, Any]]:
         """Get the primary business card for a user"""
         supabase = get_supabase()
@@ -576,27 +574,13 @@ class BusinessCardsService:
         # Make a copy of the data to avoid modifying the original response
         card_data = dict(response.data)
         
-        # Handle photo URL if it exists
-        if card_data.get('photo_url'):
-            user_folder = str(user_id)
-            filename = card_data['photo_url'].split('/')[-1].split('?')[0]
-            file_path = f"{user_folder}/{filename}"
-            
-            public_url = supabase.storage.from_("user_profile_photos").get_public_url(file_path)
-            card_data['photo_url'] = public_url
-        
-        # Handle company logo URL if it exists
-        if card_data.get('company_logo_url'):
-            user_folder = f"{user_id}/company_logos"
-            filename = card_data['company_logo_url'].split('/')[-1].split('?')[0]
-            file_path = f"{user_folder}/{filename}"
-            
-            public_url = supabase.storage.from_("user_profile_photos").get_public_url(file_path)
-            card_data['company_logo_url'] = public_url
+        # Stored image paths become public URLs by string building, no client call
+        expand_image_urls(card_data)
         
         return card_data
     
     @staticmethod
+    @traced()
     async def get_card_by_id(card_id: int) -> Optional[Dict[str, Any]]:
         """Get a specific business card by ID"""
         supabase = get_supabase()
@@ -608,27 +592,13 @@ class BusinessCardsService:
         # Make a copy of the data to avoid modifying the original response
         card_data = dict(response.data)
         
-        # Handle photo URL if it exists
-        if card_data.get('photo_url'):
-            user_folder = str(card_data['user_id'])
-            filename = card_data['photo_url'].split('/')[-1].split('?')[0]
-            file_path = f"{user_folder}/{filename}"
-            
-            public_url = supabase.storage.from_("user_profile_photos").get_public_url(file_path)
-            card_data['photo_url'] = public_url
-        
-        # Handle company logo URL if it exists
-        if card_data.get('company_logo_url'):
-            user_folder = f"{card_data['user_id']}/company_logos"
-            filename = card_data['company_logo_url'].split('/')[-1].split('?')[0]
-            file_path = f"{user_folder}/{filename}"
-            
-            public_url = supabase.storage.from_("user_profile_photos").get_public_url(file_path)
-            card_data['company_logo_url'] = public_url
+        # Stored image paths become public URLs by string building, no client call
+        expand_image_urls(card_data)
         
         return card_data
     
     @staticmethod
+    @traced()
     async def get_by_slug(slug: str) -> Optional[Dict[str, Any]]:
         """Get a business card by slug"""
         supabase = get_supabase()
@@ -639,60 +609,117 @@ class BusinessCardsService:
         
         card_data = dict(response.data)
         
-        # Handle photo URL if it exists
-        if card_data.get('photo_url'):
-            user_folder = str(card_data['user_id'])
-            filename = card_data['photo_url'].split('/')[-1].split('?')[0]
-            file_path = f"{user_folder}/{filename}"
-            
-            public_url = supabase.storage.from_("user_profile_photos").get_public_url(file_path)
-            card_data['photo_url'] = public_url
-        
-        # Handle company logo URL if it exists
-        if card_data.get('company_logo_url'):
-            user_folder = f"{card_data['user_id']}/company_logos"
-            filename = card_data['company_logo_url'].split('/')[-1].split('?')[0]
-            file_path = f"{user_folder}/{filename}"
-            
-            public_url = supabase.storage.from_("user_profile_photos").get_public_url(file_path)
-            card_data['company_logo_url'] = public_url
+        # Stored image paths become public URLs by string building, no client call
+        expand_image_urls(card_data)
         
         return card_data
 
     @staticmethod
-    async def _handle_photo_upload(user_id: int, photo: UploadFile) -> str:
+    @traced()
+    async def _upload_derivative(path: str, item: Dict[str, Any]) -> None:
         try:
-            contents = await photo.read()
-            file_extension = photo.filename.split('.')[-1].lower()
-            
-            user_folder = str(user_id)
-            unique_filename = f"{uuid.uuid4().hex}.{file_extension}"
-            full_path = f"{user_folder}/{unique_filename}"
-            
-            supabase = get_supabase()
-            
-            upload_response = supabase.storage.from_('user_profile_photos').upload(
-                path=full_path,  
-                file=contents,
-                file_options={
-                    "content-type": photo.content_type,
-                    "cache-control": "3600"
-                }
+            # Content-addressed names never change content, so they can be cached for good
+            await storage.upload_path(
+                'user_profile_photos', path, item['path'],
+                content_type=item['content_type'], cache_control="31536000"
             )
+        except StorageError as e:
+            # Someone uploaded the same bytes at the same time
+            if not e.duplicate:
+                raise
+
+    @staticmethod
+    @traced()
+    async def _store_derivatives(image: UploadFile) -> str:
+        """
+        Store resized WebP derivatives of an upload under its content hash and
+        return the stored variant's path. Bytes that were uploaded before, by
+        anyone, are neither rendered nor written again.
+        """
+        # Rejects anything that isn't an image by its bytes, whatever its name or declared type
+        await sniff_upload(image)
+
+        workdir = image_pipeline.workdir()
+        try:
+            source, digest = await image_pipeline.spool(image, workdir)
+            folder = cas_folder(digest)
+            stored_path = f"{folder}/{digest}_{STORED_VARIANT}.webp"
+
+            if await storage.exists('user_profile_photos', stored_path):
+                image_pipeline.stats["deduplicated"] += 1
+                return stored_path
+
+            rendered = await image_pipeline.render(source, digest, workdir)
+            image_pipeline.stats["rendered"] += 1
+            await asyncio.gather(*(
+                BusinessCardsService._upload_derivative(f"{folder}/{item['filename']}", item)
+                for item in rendered
+            ))
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        return stored_path
+
+    @staticmethod
+    @traced()
+    async def _release_image(stored: str, card_id: int) -> None:
+        """Remove a card's image from storage unless another card still uses it"""
+        supabase = get_supabase()
+        path = object_path(stored)
+        shared = cas_path(path)
+        if not shared:
+            await storage.remove(PHOTO_BUCKET, [path])
+            return
+
+        # The reference count is the number of other cards pointing at the same content
+        digest = cas_digest(shared)
+        references = await run_query(
+            supabase.table("business_cards")
+            .select("id")
+            .or_(f"photo_url.like.*{digest}*,company_logo_url.like.*{digest}*")
+            .neq("id", card_id)
+            .limit(1)
+        )
+        if not references.data:
+            await storage.remove(PHOTO_BUCKET, derivative_paths(shared))
+
+    @staticmethod
+    @traced()
+    async def _release_later(stored: str, card_id: int, replacement: Optional[str] = None) -> None:
+        """
+        Queue an image for removal; a replacement with the same content keeps it.
+
+        Shared content is only released after the storage GC's grace period,
+        so a concurrent upload that deduplicated against it has time to write
+        the card row the reference check looks for.
+        """
+        path = object_path(stored)
+        if path == replacement:
+            return
+        delay = settings.STORAGE_GC_GRACE_HOURS * 3600 if cas_path(path) else 0.0
+        try:
+            await job_queue.enqueue("release_image", delay=delay, stored=path, card_id=card_id)
+        except Exception as e:
+            logger.error("Error queueing image removal: %s", e)
+
+    @staticmethod
+    @traced()
+    async def _handle_photo_upload(user_id: int, photo: UploadFile) -> str:
+        """Store a card photo and return its canonical storage path"""
+        try:
+            full_path = await BusinessCardsService._store_derivatives(photo)
             
-            if hasattr(upload_response, 'error') and upload_response.error:
-                raise Exception(f"Upload failed: {upload_response.error}")
-            
-            public_url = supabase.storage.from_('user_profile_photos').get_public_url(full_path)
-            
-            print(f"Successfully uploaded photo: {public_url}")
-            return public_url
+            logger.debug("Successfully uploaded photo: %s", full_path)
+            return full_path
             
+        except HTTPException:
+            raise
         except Exception as e:
-            print(f"Photo upload error: {str(e)}")
+            logger.error("Photo upload error: %s", e)
             raise HTTPException(status_code=500, detail=f"Photo upload failed: {str(e)}")
 
     @staticmethod
+    @traced()
     async def update_card(card_id: int, user_id: int, card_data: BusinessCardUpdate, photo: UploadFile = None, company_logo: UploadFile = None, base_url: str = None) -> Dict[str, Any]:
         supabase = get_supabase()
         
@@ -761,10 +788,6 @@ class BusinessCardsService:
                     
                     # Always update QR code data when slug changes
                     if clean_slug != existing_card.get('slug'):
-                        # Default base URL if not provided
-                        if not base_url:
-                            base_url = "https://yourdomain.com/profile"
-                        
                         update_data['qr_code_url'] = BusinessCardsService.generate_qr_code_url(clean_slug, base_url)
             
             # Handle title field
@@ -826,19 +849,13 @@ class BusinessCardsService:
             
             updated_card = result.data[0]
             
-            if updated_card.get('photo_url'):
-                user_folder = str(user_id)
-                filename = updated_card['photo_url'].split('/')[-1].split('?')[0]
-                file_path = f"{user_folder}/{filename}"
-                
-                updated_card['photo_url'] = supabase.storage.from_('user_profile_photos').get_public_url(file_path)
-                
-            if updated_card.get('company_logo_url'):
-                user_folder = f"{user_id}/company_logos"
-                filename = updated_card['company_logo_url'].split('/')[-1].split('?')[0]
-                file_path = f"{user_folder}/{filename}"
-                
-                updated_card['company_logo_url'] = supabase.storage.from_('user_profile_photos').get_public_url(file_path)
+            # Replaced images are removed in the background
+            if photo_url and existing_card.get('photo_url'):
+                await BusinessCardsService._release_later(existing_card['photo_url'], card_id, photo_url)
+            if company_logo_url and existing_card.get('company_logo_url'):
+                await BusinessCardsService._release_later(existing_card['company_logo_url'], card_id, company_logo_url)
+            
+            expand_image_urls(updated_card)
             
             return updated_card
             
@@ -847,10 +864,11 @@ class BusinessCardsService:
         except HTTPException:
             raise
         except Exception as e:
-            print(f"Unexpected error: {str(e)}")
+            logger.error("Unexpected error: %s", e)
             raise HTTPException(status_code=500, detail=f"Update failed: {str(e)}")
 
     @staticmethod
+    @traced()
     async def create_card(
         user_id: int, 
         card_data: BusinessCardCreate, 
@@ -941,7 +959,7 @@ class BusinessCardsService:
         }
         
         # Debug info - print data being inserted
-        print(f"Attempting to insert business card with data: {json.dumps(insert_data, default=str)}")
+        logger.debug("Attempting to insert business card with data: %s", insert_data)
         
         try:
             # If marking this card as primary, unset primary status for all other cards
@@ -963,26 +981,13 @@ class BusinessCardsService:
                     
                 card_data = fetch_result.data[0]
             
-            # Format photo URL if it exists
-            if card_data.get('photo_url') and not photo_url:
-                user_folder = str(user_id)
-                filename = card_data['photo_url'].split('/')[-1].split('?')[0]
-                file_path = f"{user_folder}/{filename}"
-                card_data['photo_url'] = supabase.storage.from_('user_profile_photos').get_public_url(file_path)
-            
-            # Format company logo URL if it exists
-            if card_data.get('company_logo_url') and not company_logo_url:
-                user_folder = f"{user_id}/company_logos"
-                filename = card_data['company_logo_url'].split('/')[-1].split('?')[0]
-                file_path = f"{user_folder}/{filename}"
-                card_data['company_logo_url'] = supabase.storage.from_('user_profile_photos').get_public_url(file_path)
+            # Stored image paths become public URLs by string building, no client call
+            expand_image_urls(card_data)
             
             return card_data
         
         except Exception as e:
-            print(f"Error creating business card: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error creating business card: %s", e)
             
             # Check if the card was created despite the error
             try:
@@ -990,15 +995,16 @@ class BusinessCardsService:
                 
                 if existing_card.data:
                     # If we found a card, it means the creation succeeded but the response was empty
-                    print("Business card was created but response was empty, returning existing card")
+                    logger.warning("Business card was created but response was empty, returning existing card")
                     return existing_card.data[0]
                 
             except Exception as cleanup_error:
-                print(f"Failed to check business card: {str(cleanup_error)}")
+                logger.error("Failed to check business card: %s", cleanup_error)
                     
             raise HTTPException(status_code=500, detail=f"Business card creation failed: {str(e)}")
 
     @staticmethod
+    @traced()
     async def delete_card(card_id: int, user_id: int) -> bool:
         """Delete a business card"""
         supabase = get_supabase()
@@ -1012,29 +1018,17 @@ class BusinessCardsService:
         if existing_card['user_id'] != user_id:
             raise HTTPException(status_code=403, detail="You don't have permission to delete this card")
             
-        # Delete related files
-        try:
-            if existing_card.get('photo_url'):
-                user_folder = str(user_id)
-                filename = existing_card['photo_url'].split('/')[-1].split('?')[0]
-                file_path = f"{user_folder}/{filename}"
-                supabase.storage.from_('user_profile_photos').remove(file_path)
-                
-            if existing_card.get('company_logo_url'):
-                user_folder = f"{user_id}/company_logos"
-                filename = existing_card['company_logo_url'].split('/')[-1].split('?')[0]
-                file_path = f"{user_folder}/{filename}"
-                supabase.storage.from_('user_profile_photos').remove(file_path)
-        except Exception as e:
-            # Just log the error but continue with deletion
-            print(f"Error deleting card files: {str(e)}")
-        
         # Check if this is the primary card
         was_primary = existing_card.get('is_primary', False)
         
         # Delete the card
         result = supabase.table("business_cards").delete().eq("id", card_id).execute()
         
+        # Delete related files in the background, once nothing points at them
+        for field in ('photo_url', 'company_logo_url'):
+            if existing_card.get(field):
+                await BusinessCardsService._release_later(existing_card[field], card_id)
+        
         # If this was the primary card, set another card as primary
         if was_primary:
             # Get remaining cards
@@ -1046,64 +1040,57 @@ class BusinessCardsService:
         return True
         
     @staticmethod
+    @traced()
     async def _handle_logo_upload(user_id: int, logo: UploadFile) -> str:
+        """Store a company logo and return its canonical storage path"""
         try:
-            contents = await logo.read()
-            file_extension = logo.filename.split('.')[-1].lower()
+            # The logo is stored without it, so the folder can be created later
+            await job_queue.enqueue("ensure_logo_folder", user_id=user_id)
             
-            # Create a subfolder for company logos
-            user_folder = f"{user_id}/company_logos"
-            unique_filename = f"{uuid.uuid4().hex}.{file_extension}"
-            full_path = f"{user_folder}/{unique_filename}"
+            full_path = await BusinessCardsService._store_derivatives(logo)
             
-            supabase = get_supabase()
-            
-            # Ensure the folder exists
-            try:
-                supabase.storage.from_('user_profile_photos').list(user_folder)
-            except Exception:
-                # If folder doesn't exist, create it by uploading a placeholder
-                placeholder_path = f"{user_folder}/.placeholder"
-                supabase.storage.from_('user_profile_photos').upload(
-                    path=placeholder_path,
-                    file=b"",
-                    file_options={"content-type": "application/octet-stream"}
-                )
-            
-            upload_response = supabase.storage.from_('user_profile_photos').upload(
-                path=full_path,  
-                file=contents,
-                file_options={
-                    "content-type": logo.content_type,
-                    "cache-control": "3600"
-                }
-            )
-            
-            if hasattr(upload_response, 'error') and upload_response.error:
-                raise Exception(f"Upload failed: {upload_response.error}")
-            
-            public_url = supabase.storage.from_('user_profile_photos').get_public_url(full_path)
-            
-            print(f"Successfully uploaded company logo: {public_url}")
-            return public_url
+            logger.debug("Successfully uploaded company logo: %s", full_path)
+            return full_path
             
+        except HTTPException:
+            raise
         except Exception as e:
-            print(f"Company logo upload error: {str(e)}")
+            logger.error("Company logo upload error: %s", e)
             raise HTTPException(status_code=500, detail=f"Company logo upload failed: {str(e)}")
         
+    @staticmethod
+    @traced()
+    async def _ensure_logo_folder(user_id: int) -> None:
+        """Create the user's company logo folder if it doesn't exist"""
+        user_folder = f"{user_id}/company_logos"
+        
+        supabase = get_supabase()
+        
+        try:
+            supabase.storage.from_(PHOTO_BUCKET).list(user_folder)
+        except Exception:
+            # If folder doesn't exist, create it by uploading a placeholder
+            placeholder_path = f"{user_folder}/.placeholder"
+            supabase.storage.from_(PHOTO_BUCKET).upload(
+                path=placeholder_path,
+                file=b"",
+                file_options={"content-type": "application/octet-stream"}
+            )
+        
     @staticmethod
     def generate_qr_code_url(card_slug: str, base_url: Optional[str] = None) -> str:
         """Generate QR code URL for a business card"""
         # Default base URL if not provided
         if not base_url:
-            base_url = "https://yourdomain.com/profile"
+            base_url = settings.PUBLIC_BASE_URL
         
         # Create the URL for the card's profile
-        profile_url = f"{base_url}/{card_slug}"
+        profile_url = f"{base_url.rstrip('/')}/{card_slug}"
         
         return profile_url
         
     @staticmethod
+    @traced()
     def generate_qr_code_image(data: str) -> str:
         """Generate QR code image and return as base64 string"""
         try:
@@ -1131,5 +1118,9 @@ class BusinessCardsService:
             
             return f"data:image/png;base64,{img_str}"
         except Exception as e:
-            print(f"QR code generation error: {str(e)}")
-            return None
\ No newline at end of file
+            logger.error("QR code generation error: %s", e)
+            return None
+
+
+job_queue.register("release_image", BusinessCardsService._release_image)
+job_queue.register("ensure_logo_folder", BusinessCardsService._ensure_logo_folder)
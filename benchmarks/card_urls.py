@@ -0,0 +1,73 @@
+"""
+Time to turn a 10-card listing's stored images into public URLs, per request.
+
+"client" is the old read path: recover the bucket path from the stored URL
+and ask the supabase-py storage client for a public URL, per image per row.
+"local" is expand_image_urls on rows that hold canonical bucket paths.
+Neither makes a network call, so this is pure per-request overhead.
+Run from the repository root:
+
+    python -m benchmarks.card_urls
+"""
+import timeit
+
+from app.db.session import get_supabase
+from app.db.storage import PHOTO_BUCKET, public_url, expand_image_urls
+
+CARDS = 10
+RUNS = 2000
+
+PHOTO = "cas/9f/9f0c1e2d3b4a59687766554433221100aabbccddeeff00112233445566778899_card.webp"
+LOGO = "cas/00/00112233445566778899aabbccddeeff9f0c1e2d3b4a59687766554433221100_card.webp"
+
+
+def stored_rows():
+    return [{"id": i, "user_id": 977, "photo_url": PHOTO, "company_logo_url": LOGO} for i in range(CARDS)]
+
+
+def legacy_rows():
+    return [{"id": i, "user_id": 977, "photo_url": public_url(PHOTO) + "?", "company_logo_url": public_url(LOGO) + "?"}
+            for i in range(CARDS)]
+
+
+def client_path(url):
+    # What BusinessCardsService._storage_path used to do
+    marker = "/cas/"
+    base = url.split("?")[0]
+    if marker in base:
+        return base[base.rindex(marker) + 1:]
+    return f"977/{url.split('/')[-1].split('?')[0]}"
+
+
+def via_client(rows):
+    supabase = get_supabase()
+    for card in rows:
+        for field in ("photo_url", "company_logo_url"):
+            if card.get(field):
+                card[field] = supabase.storage.from_(PHOTO_BUCKET).get_public_url(client_path(card[field]))
+    return rows
+
+
+def via_local(rows):
+    for card in rows:
+        expand_image_urls(card)
+    return rows
+
+
+def measure(fn, make_rows):
+    times = timeit.repeat(lambda: fn(make_rows()), number=RUNS, repeat=5)
+    return min(times) / RUNS * 1e6
+
+
+def main():
+    get_supabase()  # client construction isn't part of a request
+    base = measure(lambda rows: rows, stored_rows)
+    client_us = measure(via_client, legacy_rows) - base
+    local_us = measure(via_local, stored_rows) - base
+    print(f"{CARDS} cards, 2 images each")
+    print(f"  storage client  {client_us:7.1f} us/request")
+    print(f"  local builder   {local_us:7.1f} us/request  ({client_us / local_us:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Latency of sequential vs concurrent lookups inside endpoints.
+
+Each simulated PostgREST round trip blocks its worker thread for RTT_MS, the
+way the sync Supabase client does. Run from the repository root:
+
+    python -m benchmarks.fanout_latency
+"""
+import time
+import asyncio
+import statistics
+
+from app.db.session import run_query
+from app.services.slug_resolver import SlugResolver
+
+RTT_MS = 25
+ROUNDS = 20
+
+
+class FakeQuery:
+    def __init__(self, result=None):
+        self.result = result
+
+    def execute(self):
+        time.sleep(RTT_MS / 1000)
+        return self.result
+
+
+async def sequential_me():
+    await run_query(FakeQuery())  # user by email
+    await run_query(FakeQuery())  # primary card by user id
+
+
+async def concurrent_me():
+    await asyncio.gather(run_query(FakeQuery()), run_query(FakeQuery()))
+
+
+def slow(result):
+    def lookup(*args):
+        time.sleep(RTT_MS / 1000)
+        return result
+    return staticmethod(lookup)
+
+
+async def sequential_fallback():
+    # Card by slug misses, then user by slug, then the user's primary card
+    for _ in range(3):
+        await run_query(FakeQuery())
+
+
+async def speculative_fallback():
+    SlugResolver._by_card_slug = slow(None)
+    SlugResolver._by_user_slug = slow({"user": {}, "card": {}})
+    await SlugResolver().resolve("jane")
+
+
+async def measure(fn):
+    samples = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+async def main():
+    print(f"simulated round trip: {RTT_MS} ms, median of {ROUNDS} runs")
+    for name, before, after in (
+        ("/users/me", sequential_me, concurrent_me),
+        ("/users/by-email", sequential_me, concurrent_me),
+        ("/users/{slug}/qrcode (user slug)", sequential_fallback, speculative_fallback),
+    ):
+        print(f"{name:36s} before {await measure(before):6.1f} ms   after {await measure(after):6.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
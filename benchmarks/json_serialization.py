@@ -0,0 +1,55 @@
+"""
+Serialization cost of a business card list response, before and after.
+
+"before" is what FastAPI does for a route with response_model=List[BusinessCard]
+and the default JSONResponse: validate every row into the model, run
+jsonable_encoder, then stdlib json.dumps. "after" is trusted() rows rendered
+by FastJSONResponse. Run from the repository root:
+
+    python -m benchmarks.json_serialization
+"""
+import json
+import timeit
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.core.responses import FastJSONResponse
+from app.schemas.user.business_card import BusinessCard
+
+CARD = {
+    "id": 1841, "user_id": 977, "display_name": "Jane Doe", "slug": "jane-doe",
+    "photo_url": "https://abc.supabase.co/storage/v1/object/public/user_profile_photos/977/9f0c1e2d.jpg",
+    "company_logo_url": "https://abc.supabase.co/storage/v1/object/public/user_profile_photos/977/company_logos/0011.png",
+    "title": "Principal Product Designer", "bio": "Designing calm software for busy people.",
+    "email": "jane@example.com", "website": "https://jane.example.com/",
+    "contact": {"phone": "+1 555 0100", "linkedin": "in/janedoe"},
+    "qr_code_url": "https://kinvo.app/jane-doe", "is_primary": False,
+    "created_at": "2024-03-01T10:00:00.123456+00:00", "updated_at": "2024-05-01T10:00:00.123456+00:00",
+}
+
+adapter = TypeAdapter(List[BusinessCard])
+
+
+def before(cards):
+    validated = adapter.validate_python(cards)
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+
+def after(cards):
+    return FastJSONResponse(content=cards).body
+
+
+def main():
+    for n in (1, 10, 100):
+        cards = [dict(CARD, id=i) for i in range(n)]
+        assert len(json.loads(before(cards))) == len(json.loads(after(cards)))
+        runs = 2000 if n < 100 else 200
+        b = timeit.timeit(lambda: before(cards), number=runs) / runs * 1e6
+        a = timeit.timeit(lambda: after(cards), number=runs) / runs * 1e6
+        print(f"{n:4d} cards   before {b:8.1f} us   after {a:7.1f} us   ({b / a:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Payload size and decode time per endpoint, select("*") vs column projections.
+
+Uses representative rows rather than a live database; the PostgREST payload
+is what the client library has to receive and json-decode on every read.
+Run from the repository root:
+
+    python -m benchmarks.projection_payload
+"""
+import json
+import timeit
+
+from app.db.columns import CARD_COLUMNS, PROFILE_CARD_COLUMNS, USER_COLUMNS
+
+CARD_ROW = {
+    "id": 1841, "user_id": 977, "display_name": "Jane Doe", "slug": "jane-doe",
+    "photo_url": "https://abc.supabase.co/storage/v1/object/public/user_profile_photos/977/9f0c1e2d3b4a59687766554433221100.jpg",
+    "company_logo_url": "https://abc.supabase.co/storage/v1/object/public/user_profile_photos/977/company_logos/00112233445566778899aabbccddeeff.png",
+    "title": "Principal Product Designer", "bio": "Designing calm software for busy people. " * 4,
+    "email": "jane@example.com", "website": "https://jane.example.com",
+    "contact": json.dumps({"phone": "+1 555 0100", "linkedin": "in/janedoe", "twitter": "@janedoe"}),
+    "qr_code_url": "https://kinvo.app/jane-doe", "is_primary": True,
+    "created_at": "2024-03-01T10:00:00.123456+00:00", "updated_at": "2024-05-01T10:00:00.123456+00:00",
+    # Columns added over time that no endpoint renders
+    "theme": "dark", "layout": {"sections": ["bio", "contact", "links"], "accent": "#3355ff"},
+    "analytics_opt_in": True, "deleted_at": None,
+}
+USER_ROW = {
+    "id": 977, "email": "jane@example.com", "full_name": "Jane Doe", "slug": "jane-doe",
+    "hashed_password": "$2b$12$KIXQJ8yq1l4Jw3h8Yxg3qOeZ9cW5n0p7i6v2r1t3u4s5w6x7y8z9a",
+    "created_at": "2024-03-01T10:00:00.123456+00:00", "updated_at": "2024-05-01T10:00:00.123456+00:00",
+    "google_id": None, "subscription_tier": "basic",
+}
+
+
+def project(row, columns):
+    return {c: row.get(c) for c in (c.strip() for c in columns.split(","))}
+
+
+def measure(payload):
+    body = json.dumps(payload)
+    seconds = timeit.timeit(lambda: json.loads(body), number=5000) / 5000
+    return len(body), seconds * 1e6
+
+
+ENDPOINTS = {
+    "GET /users/me (get_current_user)": ([USER_ROW], [project(USER_ROW, USER_COLUMNS)]),
+    "GET /{slug}": ([dict(CARD_ROW, owner=USER_ROW)], [dict(project(CARD_ROW, PROFILE_CARD_COLUMNS), owner=project(USER_ROW, USER_COLUMNS))]),
+    "GET /{slug}?fields=display_name,photo_url": ([dict(CARD_ROW, owner=USER_ROW)], [dict(project(CARD_ROW, "id, user_id, slug, display_name, photo_url"), owner=project(USER_ROW, USER_COLUMNS))]),
+    "GET /users/{id}/business-cards (10 cards)": ([CARD_ROW] * 10, [project(CARD_ROW, CARD_COLUMNS)] * 10),
+    "GET /users/{id}/business-cards?fields=id,slug": ([CARD_ROW] * 10, [project(CARD_ROW, "id, slug")] * 10),
+}
+
+
+def main():
+    print(f"{'endpoint':48s} {'select(*)':>16s} {'projected':>16s}")
+    for name, (full, projected) in ENDPOINTS.items():
+        full_bytes, full_us = measure(full)
+        proj_bytes, proj_us = measure(projected)
+        print(f"{name:48s} {full_bytes:6d} B {full_us:5.1f} us  {proj_bytes:6d} B {proj_us:5.1f} us")
+
+
+if __name__ == "__main__":
+    main()
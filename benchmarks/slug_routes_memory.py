@@ -0,0 +1,50 @@
+"""
+Memory footprint of the slug routing table per million slugs.
+
+Builds the compact table from synthetic slugs and compares it with a plain
+dict of slug -> (card_id, user_id). Run from the repository root:
+
+    python -m benchmarks.slug_routes_memory [n_slugs]
+"""
+import sys
+import random
+import string
+import tracemalloc
+
+from app.services.slug_routes import SlugRoutingTable
+
+
+def synthetic_slugs(n: int):
+    rng = random.Random(42)
+    alphabet = string.ascii_lowercase + string.digits + "-"
+    for i in range(n):
+        length = rng.randint(4, 20)
+        yield "".join(rng.choice(alphabet) for _ in range(length - len(str(i)))) + str(i)
+
+
+def main(n: int = 1_000_000) -> None:
+    slugs = list(synthetic_slugs(n))
+
+    tracemalloc.start()
+    table = SlugRoutingTable()
+    table.cards.build((slug, (i, i // 2)) for i, slug in enumerate(slugs))
+    table.ready = True
+    compact_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    plain = {slug: (i, i // 2) for i, slug in enumerate(slugs)}
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    per_million = 1_000_000 / n / (1024 * 1024)
+    print(f"slugs:                {n:,}")
+    print(f"compact table:        {compact_bytes * per_million:8.1f} MB per million slugs")
+    print(f"dict[str, tuple]:     {dict_bytes * per_million:8.1f} MB per million slugs")
+    print(f"footprint():          {table.footprint()}")
+    assert table.card(slugs[n // 2]) == (n // 2, n // 4)
+    del plain
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
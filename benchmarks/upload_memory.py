@@ -0,0 +1,85 @@
+"""
+Peak RSS for concurrent photo uploads, buffered vs streamed.
+
+Each upload is a 10 MB file spooled to disk the way Starlette spools
+multipart parts. "buffered" reads the whole file and sends the bytes, as the
+supabase-py storage client requires; "streamed" goes through StorageClient.
+The storage server is an in-process transport that drains request bodies
+chunk by chunk. Each mode runs in its own process because peak RSS only
+ever grows. Run from the repository root:
+
+    python -m benchmarks.upload_memory
+"""
+import os
+import sys
+import asyncio
+import resource
+import subprocess
+import tempfile
+
+import httpx
+from fastapi import UploadFile
+
+from app.db.storage import StorageClient
+
+UPLOADS = 50
+SIZE_MB = 10
+SPOOL_MAX = 1024 * 1024  # starlette's multipart spool threshold
+
+
+class DrainTransport(httpx.AsyncBaseTransport):
+    """Accepts uploads without holding the body, like a remote server would"""
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        received = 0
+        async for chunk in request.stream:
+            received += len(chunk)
+        return httpx.Response(200, json={"Key": request.url.path, "size": received})
+
+
+def make_uploads():
+    block = os.urandom(1024 * 1024)
+    uploads = []
+    for i in range(UPLOADS):
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX)
+        for _ in range(SIZE_MB):
+            spool.write(block)
+        uploads.append(UploadFile(spool, size=SIZE_MB * 1024 * 1024, filename=f"{i}.png"))
+    return uploads
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def run(mode: str) -> None:
+    uploads = make_uploads()
+    client = StorageClient("https://x.supabase.co", "key", transport=DrainTransport())
+    baseline = peak_rss_mb()
+
+    async def buffered(upload: UploadFile):
+        await upload.seek(0)
+        contents = await upload.read()
+        await client.client.post(f"/object/bench/{upload.filename}", content=contents)
+
+    async def streamed(upload: UploadFile):
+        await client.upload("bench", upload.filename, upload)
+
+    send = buffered if mode == "buffered" else streamed
+    await asyncio.gather(*(send(upload) for upload in uploads))
+    await client.close()
+    print(f"{mode:9s} peak RSS {peak_rss_mb():7.1f} MB  (+{peak_rss_mb() - baseline:6.1f} MB over baseline)")
+
+
+def main():
+    if len(sys.argv) > 1:
+        asyncio.run(run(sys.argv[1]))
+        return
+    print(f"{UPLOADS} concurrent uploads of {SIZE_MB} MB")
+    for mode in ("buffered", "streamed"):
+        subprocess.run([sys.executable, "-m", "benchmarks.upload_memory", mode], check=True)
+
+
+if __name__ == "__main__":
+    main()
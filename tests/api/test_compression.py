@@ -0,0 +1,59 @@
+import gzip
+
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.compression import CompressionMiddleware, CompressionStats
+
+BODY = b'{"cards": "' + b"x" * 2000 + b'"}'
+
+def make_client(stats):
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=500, stats=stats)
+
+    @app.get("/cards/{card_id}")
+    async def card(card_id: int):
+        return Response(BODY, media_type="application/json", headers={"ETag": '"v1"'})
+
+    @app.get("/small")
+    async def small():
+        return Response(b"{}", media_type="application/json")
+
+    @app.get("/qr.png")
+    async def png():
+        return Response(b"\x89PNG" + b"\x00" * 2000, media_type="image/png")
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for _ in range(3):
+                yield b"line of text\n" * 50
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    return TestClient(app)
+
+def test_compresses_large_json_and_records_route_template():
+    stats = CompressionStats()
+    client = make_client(stats)
+    response = client.get("/cards/7", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == 'W/"v1"'
+    assert response.content == BODY
+    report = stats.snapshot()["/cards/{card_id}"]
+    assert report["bytes_in"] == len(BODY)
+    assert report["ratio"] < 0.1
+
+def test_skips_small_bodies_png_and_identity():
+    client = make_client(CompressionStats())
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/qr.png", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/cards/1", headers={"Accept-Encoding": "identity"}).headers
+
+def test_streams_are_compressed_incrementally():
+    client = make_client(CompressionStats())
+    with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        raw = b"".join(response.iter_raw())
+    assert gzip.decompress(raw) == b"line of text\n" * 150
@@ -0,0 +1,56 @@
+import json
+import logging
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.logs import JsonFormatter, RequestContext, RequestIdMiddleware, request_id
+
+class Collect(logging.Handler):
+    def __init__(self, sample_rate=1.0):
+        super().__init__()
+        self.addFilter(RequestContext(sample_rate))
+        self.setFormatter(JsonFormatter())
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(json.loads(self.format(record)))
+
+def make_client(handler, sample_rate=1.0):
+    log = logging.getLogger("test.logs")
+    log.setLevel(logging.DEBUG)
+    log.addHandler(handler)
+    app = FastAPI()
+    app.add_middleware(RequestIdMiddleware, debug_sample_rate=sample_rate)
+
+    @app.get("/")
+    async def root():
+        log.debug("debug line")
+        log.error("failed: %s", "boom", extra={"card_id": 7})
+        return {"request_id": request_id.get()}
+
+    return TestClient(app)
+
+def test_lines_carry_the_request_id():
+    handler = Collect()
+    client = make_client(handler)
+    response = client.get("/", headers={"X-Request-ID": "abc123"})
+
+    assert response.headers["x-request-id"] == "abc123"
+    assert response.json() == {"request_id": "abc123"}
+    error = handler.lines[-1]
+    assert error["level"] == "ERROR"
+    assert error["message"] == "failed: boom"
+    assert error["request_id"] == "abc123"
+    assert error["card_id"] == 7
+
+    generated = client.get("/").headers["x-request-id"]
+    assert handler.lines[-1]["request_id"] == generated != "abc123"
+
+def test_debug_lines_are_sampled_per_request():
+    handler = Collect(sample_rate=0.0)
+    client = make_client(handler, sample_rate=0.0)
+    for _ in range(5):
+        client.get("/")
+
+    assert [line["level"] for line in handler.lines] == ["ERROR"] * 5
@@ -0,0 +1,57 @@
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.core.compression import CompressionStats
+from app.core.metrics import MetricsMiddleware, RequestMetrics, Exposition, expose_compression
+
+def make_client(metrics):
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, metrics=metrics)
+
+    @app.get("/users/business-card/{card_id}")
+    async def card(card_id: int):
+        if card_id == 0:
+            raise HTTPException(status_code=404, detail="Business card not found")
+        return {"id": card_id}
+
+    return TestClient(app)
+
+def test_requests_are_labelled_by_route_template():
+    metrics = RequestMetrics()
+    client = make_client(metrics)
+    for card_id in (1, 2, 3, 0):
+        client.get(f"/users/business-card/{card_id}")
+    client.get("/nowhere/at/all")
+
+    assert metrics.requests == {
+        ("GET", "/users/business-card/{card_id}", "200"): 3,
+        ("GET", "/users/business-card/{card_id}", "404"): 1,
+        ("GET", "unmatched", "404"): 1,
+    }
+    assert metrics.in_progress == 0
+
+def test_exposition_format():
+    metrics = RequestMetrics(buckets=(0.1, 1.0))
+    metrics.record("GET", "/{slug}", 200, 0.05)
+    metrics.record("GET", "/{slug}", 200, 0.5)
+    metrics.record("GET", "/{slug}", 500, 3.0)
+    out = Exposition()
+    metrics.expose(out)
+    text = out.render()
+
+    assert '# TYPE http_request_duration_seconds histogram' in text
+    assert 'http_requests_total{method="GET",route="/{slug}",status="200"} 2' in text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/{slug}",le="0.1"} 1' in text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/{slug}",le="1.0"} 2' in text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/{slug}",le="+Inf"} 3' in text
+    assert 'http_request_duration_seconds_count{method="GET",route="/{slug}"} 3' in text
+
+def test_compression_stats_are_exposed():
+    stats = CompressionStats()
+    stats.record("/{slug}", "br", 2000, 400, 0.001)
+    out = Exposition()
+    expose_compression(out, stats)
+    text = out.render()
+
+    assert 'http_compressed_responses_total{route="/{slug}",encoding="br"} 1' in text
+    assert 'http_compression_bytes_out_total{route="/{slug}"} 400' in text
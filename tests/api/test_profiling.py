@@ -0,0 +1,67 @@
+import time
+import marshal
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1 import admin
+from app.core.config import settings
+from app.core.profiling import ProfilingMiddleware, RequestProfiler
+
+def busy_work():
+    time.sleep(0.05)
+
+def make_client(profiler):
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware, profiler=profiler)
+
+    @app.get("/cards/{card_id}")
+    async def card(card_id: int):
+        busy_work()
+        return {"id": card_id}
+
+    return TestClient(app)
+
+def test_only_flagged_requests_are_profiled_while_sampling_is_off():
+    profiler = RequestProfiler(token="secret", interval=0.002)
+    client = make_client(profiler)
+    client.get("/cards/1")
+    client.get("/cards/2", headers={"X-Profile": "wrong"})
+    client.get("/cards/3", headers={"X-Profile": "secret"})
+
+    assert profiler.requests == {"GET /cards/{card_id}": 1}
+    collapsed = profiler.collapsed("GET /cards/{card_id}")
+    busy = [line for line in collapsed.splitlines() if "test_profiling:busy_work" in line]
+    assert busy and all(line.startswith("GET /cards/{card_id};") for line in busy)
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in busy) >= 5
+
+def test_cprofile_mode_aggregates_per_route():
+    profiler = RequestProfiler()
+    profiler.start(1.0, "cprofile")
+    client = make_client(profiler)
+    client.get("/cards/1")
+    client.get("/cards/2")
+
+    assert profiler.requests == {"GET /cards/{card_id}": 2}
+    stats = marshal.loads(profiler.pstats_dump("GET /cards/{card_id}"))
+    [calls] = [value[1] for (filename, _, name), value in stats.items() if name == "busy_work"]
+    assert calls == 2
+
+    profiler.stop()
+    client.get("/cards/3")
+    assert profiler.requests["GET /cards/{card_id}"] == 2
+
+def test_admin_endpoints_need_the_token(monkeypatch):
+    app = FastAPI()
+    app.include_router(admin.router, prefix="/api/v1/admin")
+    client = TestClient(app)
+
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", None)
+    assert client.get("/api/v1/admin/profiling").status_code == 404
+
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    assert client.get("/api/v1/admin/profiling").status_code == 403
+    assert client.get("/api/v1/admin/profiling", headers={"X-Admin-Token": "nope"}).status_code == 403
+    response = client.get("/api/v1/admin/profiling", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert response.json()["sample_rate"] == 0.0
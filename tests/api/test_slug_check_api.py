@@ -0,0 +1,35 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1 import users
+from app.services.slug_index import SlugIndex
+
+
+def test_suggestions_are_verified_in_the_same_query(monkeypatch):
+    # The index hasn't seen "jane" yet, so only the database knows it's taken
+    index = SlugIndex()
+    index.load([])
+    monkeypatch.setattr(users, "slug_index", index)
+    first_candidate = index.candidates("jane", "Product Designer")[0]
+
+    queries = []
+
+    async def check(slugs):
+        queries.append(slugs)
+        return {slug: slug not in ("jane", first_candidate) for slug in slugs}
+
+    monkeypatch.setattr(users.BusinessCardService, "check_slugs_availability", staticmethod(check))
+
+    app = FastAPI()
+    app.include_router(users.router, prefix="/api/v1/users")
+    response = TestClient(app).post("/api/v1/users/check-slugs", json={
+        "slugs": ["jane", "jane-doe"], "title": "Product Designer", "suggestions": 3,
+    })
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["results"]["jane"]["available"] is False
+    assert body["results"]["jane-doe"]["available"] is True
+    suggested = body["suggestions"]["jane"]
+    assert len(suggested) == 3 and first_candidate not in suggested
+    assert len(queries) == 1 and set(suggested) <= set(queries[0])
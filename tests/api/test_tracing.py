@@ -0,0 +1,75 @@
+import json
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import tracing
+from app.core.tracing import Tracer, TracingMiddleware, parse_traceparent
+
+def read_spans(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+def test_spans_nest_across_awaits_and_threads(tmp_path):
+    tracer = Tracer(enabled=True, path=str(tmp_path / "spans.jsonl"))
+
+    def query():
+        with tracer.span("select business_cards", **{"db.sql.table": "business_cards"}):
+            pass
+
+    async def request():
+        with tracer.span("PUT /users/business-card/{card_id}"):
+            with tracer.span("BusinessCardService.get_by_id"):
+                await asyncio.to_thread(query)
+
+    asyncio.run(request())
+    tracer.shutdown()
+
+    db, service, root = read_spans(tmp_path / "spans.jsonl")
+    assert root["parent_span_id"] is None
+    assert service["parent_span_id"] == root["span_id"]
+    assert db["parent_span_id"] == service["span_id"]
+    assert {span["trace_id"] for span in (db, service, root)} == {root["trace_id"]}
+    assert db["attributes"]["db.sql.table"] == "business_cards"
+
+def test_incoming_traceparent_is_continued_and_errors_recorded(tmp_path):
+    tracer = Tracer(enabled=True, path=str(tmp_path / "spans.jsonl"))
+    parent = "00-" + "a" * 32 + "-" + "b" * 16 + "-01"
+    try:
+        with tracer.span("bcrypt.verify", traceparent=parent):
+            raise ValueError("bad hash")
+    except ValueError:
+        pass
+    tracer.shutdown()
+
+    [span] = read_spans(tmp_path / "spans.jsonl")
+    assert (span["trace_id"], span["parent_span_id"]) == ("a" * 32, "b" * 16)
+    assert span["status"] == {"code": "ERROR", "description": "ValueError: bad hash"}
+
+def test_unsampled_traces_record_nothing(tmp_path):
+    tracer = Tracer(enabled=True, path=str(tmp_path / "spans.jsonl"), sample_rate=0.0)
+    with tracer.span("root"):
+        with tracer.span("child"):
+            pass
+    tracer.shutdown()
+    assert not (tmp_path / "spans.jsonl").exists()
+    assert parse_traceparent("00-" + "a" * 32 + "-" + "b" * 16 + "-00")[2] is False
+
+def test_middleware_names_root_span_after_route_template(tmp_path, monkeypatch):
+    tracer = Tracer(enabled=True, path=str(tmp_path / "spans.jsonl"))
+    monkeypatch.setattr(tracing, "tracer", tracer)
+    app = FastAPI()
+    app.add_middleware(TracingMiddleware, tracer=tracer)
+
+    @app.get("/users/business-card/{card_id}")
+    @tracing.traced()
+    async def card(card_id: int):
+        return {"id": card_id}
+
+    TestClient(app).get("/users/business-card/7")
+    tracer.shutdown()
+
+    handler, root = read_spans(tmp_path / "spans.jsonl")
+    assert root["name"] == "GET /users/business-card/{card_id}"
+    assert root["attributes"]["http.status_code"] == 200
+    assert handler["name"].endswith("card") and handler["parent_span_id"] == root["span_id"]
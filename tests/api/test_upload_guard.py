@@ -0,0 +1,82 @@
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from app.main import app as main_app
+
+from app.core.uploads import UploadGuardMiddleware, sniff_image_type
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 100
+
+class FakeTiers:
+    def __init__(self, tier):
+        self.tier = tier
+        self.lookups = 0
+
+    async def get(self, email):
+        self.lookups += 1
+        return self.tier
+
+def make_client(tiers):
+    app = FastAPI()
+    app.add_middleware(UploadGuardMiddleware, tiers=tiers)
+
+    @app.post("/api/v1/users/business-card")
+    async def create(photo: UploadFile = File(None)):
+        return {"size": len(await photo.read())}
+
+    return TestClient(app)
+
+def test_sniff_image_type():
+    assert sniff_image_type(PNG) == "image/png"
+    assert sniff_image_type(b"\xff\xd8\xff\xe0") == "image/jpeg"
+    assert sniff_image_type(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == "image/webp"
+    assert sniff_image_type(b"<?php echo 1; ?>") is None
+
+def test_accepts_small_image_without_tier_lookup():
+    tiers = FakeTiers("basic")
+    response = make_client(tiers).post("/api/v1/users/business-card", files={"photo": ("a.jpg", PNG, "image/jpeg")})
+    assert response.status_code == 200
+    assert response.json() == {"size": len(PNG)}
+    assert tiers.lookups == 0
+
+def test_rejects_non_image_by_magic_bytes():
+    response = make_client(FakeTiers("basic")).post(
+        "/api/v1/users/business-card", files={"photo": ("a.png", b"<html>" * 20, "image/png")}
+    )
+    assert response.status_code == 415
+
+def test_rejects_declared_length_over_cap():
+    client = make_client(FakeTiers("basic"))
+    big = PNG + b"\x00" * (12 * 1024 * 1024)
+    response = client.post("/api/v1/users/business-card", files={"photo": ("a.png", big, "image/png")})
+    assert response.status_code == 413
+
+def test_rejects_single_file_over_cap_when_streamed():
+    tiers = FakeTiers("basic")
+    client = make_client(tiers)
+    big = PNG + b"\x00" * (6 * 1024 * 1024)
+
+    def chunks():
+        boundary = b"xyz"
+        yield b"--xyz\r\nContent-Disposition: form-data; name=\"photo\"; filename=\"a.png\"\r\nContent-Type: image/png\r\n\r\n"
+        for i in range(0, len(big), 65536):
+            yield big[i:i + 65536]
+        yield b"\r\n--xyz--\r\n"
+
+    response = client.post(
+        "/api/v1/users/business-card",
+        content=chunks(),
+        headers={"Content-Type": "multipart/form-data; boundary=xyz", "Authorization": "Bearer not-a-jwt"},
+    )
+    assert response.status_code == 413
+    assert response.json() == {"detail": "File too large"}
+
+def test_refused_uploads_carry_cors_headers():
+    client = TestClient(main_app)
+    response = client.post(
+        "/api/v1/users/business-card",
+        files={"photo": ("a.png", b"<html>" * 20, "image/png")},
+        headers={"Origin": "http://localhost:5173"},
+    )
+    assert response.status_code == 415
+    assert response.headers["access-control-allow-origin"] == "http://localhost:5173"
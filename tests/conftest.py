@@ -0,0 +1,153 @@
+from fnmatch import fnmatch
+from types import SimpleNamespace
+
+import pytest
+
+
+class FakeTable:
+    """In-memory rows of one table, keyed by id"""
+
+    def __init__(self, rows=()):
+        self.rows = {}
+        self.next_id = 1
+        self.updated = []
+        for row in rows:
+            self.add(row)
+
+    def add(self, row):
+        row = dict(row)
+        row.setdefault("id", self.next_id)
+        self.next_id = max(self.next_id, row["id"]) + 1
+        self.rows[row["id"]] = row
+        return row
+
+
+def _like(value, pattern):
+    return fnmatch(value or "", pattern)
+
+
+# PostgREST operators as used inside or_() expressions
+_OPERATORS = {
+    "eq": lambda value, arg: str(value) == arg,
+    "like": _like,
+}
+
+
+class FakeQuery:
+    """The PostgREST request builder calls the services make, run against a FakeTable"""
+
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self.table = client.tables.setdefault(name, FakeTable())
+        self.calls = []
+        self.action = "select"
+        self.data = None
+        self.filters = []
+        self.ordering = None
+        self.row_limit = None
+
+    def _record(self, method, *args):
+        self.calls.append((method, args))
+        return self
+
+    def select(self, columns="*", **kwargs):
+        return self._record("select", columns)
+
+    def insert(self, row):
+        self.action, self.data = "insert", row
+        return self._record("insert", row)
+
+    def update(self, data):
+        self.action, self.data = "update", data
+        return self._record("update", data)
+
+    def delete(self):
+        self.action = "delete"
+        return self._record("delete")
+
+    def _filter(self, method, column, value, test):
+        self.filters.append(lambda row: test(row.get(column), value))
+        return self._record(method, column, value)
+
+    def eq(self, column, value):
+        return self._filter("eq", column, value, lambda a, b: a == b)
+
+    def neq(self, column, value):
+        return self._filter("neq", column, value, lambda a, b: a != b)
+
+    def gt(self, column, value):
+        return self._filter("gt", column, value, lambda a, b: a is not None and a > b)
+
+    def gte(self, column, value):
+        return self._filter("gte", column, value, lambda a, b: a is not None and a >= b)
+
+    def lte(self, column, value):
+        return self._filter("lte", column, value, lambda a, b: a is not None and a <= b)
+
+    def in_(self, column, values):
+        return self._filter("in_", column, values, lambda a, b: a in b)
+
+    def is_(self, column, value):
+        return self._filter("is_", column, value, lambda a, b: a is None if b == "null" else a == b)
+
+    def or_(self, expression):
+        terms = []
+        for term in expression.split(","):
+            column, operator, arg = term.split(".", 2)
+            terms.append((column, _OPERATORS[operator], arg))
+        self.filters.append(lambda row: any(test(row.get(column), arg) for column, test, arg in terms))
+        return self._record("or_", expression)
+
+    def order(self, column, desc=False):
+        self.ordering = (column, desc)
+        return self._record("order", column)
+
+    def limit(self, n):
+        self.row_limit = n
+        return self._record("limit", n)
+
+    def execute(self):
+        self.client.executed.append((self.name, self.calls))
+        table = self.table
+        if self.action == "insert":
+            rows = self.data if isinstance(self.data, list) else [self.data]
+            return SimpleNamespace(data=[dict(table.add(row)) for row in rows], count=None)
+
+        matched = [row for row in table.rows.values() if all(test(row) for test in self.filters)]
+        if self.ordering:
+            column, desc = self.ordering
+            matched.sort(key=lambda row: row[column], reverse=desc)
+        if self.action == "update":
+            for row in matched:
+                row.update(self.data)
+                table.updated.append(row["id"])
+        elif self.action == "delete":
+            for row in matched:
+                del table.rows[row["id"]]
+        elif self.row_limit is not None:
+            matched = matched[:self.row_limit]
+        return SimpleNamespace(data=[dict(row) for row in matched], count=None)
+
+
+class FakeSupabase:
+    """Stand-in for the Supabase client's table API over in-memory tables"""
+
+    def __init__(self, **tables):
+        self.tables = {name: FakeTable(rows) for name, rows in tables.items()}
+        self.executed = []
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    from_ = table
+
+
+@pytest.fixture
+def fake_supabase(monkeypatch):
+    """Install a FakeSupabase as ``get_supabase`` in a service module: ``fake_supabase(module, table=[rows])``"""
+    def install(module, **tables):
+        client = FakeSupabase(**tables)
+        monkeypatch.setattr(module, "get_supabase", lambda: client)
+        return client
+    return install
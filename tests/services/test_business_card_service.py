@@ -0,0 +1,126 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.schemas.user.business_card import BusinessCardUpdate
+from app.services import business_card
+from app.services.business_card import BusinessCardService
+from app.services.slug_routes import SlugRoutingTable, MISSING
+
+
+CARD = {"id": 1, "user_id": 10, "slug": "jane", "title": "Founder", "updated_at": "2024-01-01T00:00:00+00:00"}
+USER = SimpleNamespace(id=10)
+
+
+def test_update_is_a_single_conditional_query(fake_supabase):
+    client = fake_supabase(business_card, business_cards=[CARD])
+    card = asyncio.run(BusinessCardService.update_business_card(
+        card_id=1,
+        card_data=BusinessCardUpdate(title="CTO"),
+        current_user=USER,
+        expected_updated_at="2024-01-01T00:00:00+00:00"
+    ))
+    assert card["title"] == "CTO"
+    assert len(client.executed) == 1
+    table, calls = client.executed[0]
+    assert ("eq", ("user_id", 10)) in calls
+    assert ("eq", ("updated_at", "2024-01-01T00:00:00+00:00")) in calls
+
+
+def test_stale_version_is_a_conflict(fake_supabase):
+    fake_supabase(business_card, business_cards=[dict(CARD, updated_at="2024-01-02T00:00:00+00:00")])
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(BusinessCardService.update_business_card(
+            card_id=1,
+            card_data=BusinessCardUpdate(title="CTO"),
+            current_user=USER,
+            expected_updated_at="2024-01-01T00:00:00+00:00"
+        ))
+    assert exc.value.status_code == 409
+
+
+def test_missing_or_foreign_card_is_not_found(fake_supabase):
+    fake_supabase(business_card, business_cards=[dict(CARD, user_id=11)])
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(BusinessCardService.update_business_card(
+            card_id=1,
+            card_data=BusinessCardUpdate(title="CTO"),
+            current_user=USER
+        ))
+    assert exc.value.status_code == 404
+
+
+def test_rename_releases_the_old_slug(fake_supabase, monkeypatch):
+    index = SimpleNamespace(added=[], discarded=[])
+    index.add = index.added.append
+    index.discard = index.discarded.append
+    routes = SimpleNamespace(calls=[], card=lambda slug: MISSING)
+    routes.set_card = lambda *args, **kwargs: routes.calls.append((args, kwargs))
+    monkeypatch.setattr(business_card, "slug_index", index)
+    monkeypatch.setattr(business_card, "slug_routes", routes)
+
+    client = fake_supabase(business_card, business_cards=[CARD], users=[])
+    asyncio.run(BusinessCardService.update_business_card(
+        card_id=1,
+        card_data=BusinessCardUpdate(slug="jane-doe"),
+        current_user=USER,
+    ))
+
+    assert index.discarded == ["jane"] and index.added == ["jane-doe"]
+    assert routes.calls == [(("jane-doe", 1, 10), {"old_slug": "jane"})]
+    table, calls = client.executed[-1]
+    assert ("eq", ("slug", "jane")) in calls
+
+
+def test_resending_the_current_slug_is_not_read_first(fake_supabase, monkeypatch):
+    routes = SlugRoutingTable()
+    routes.cards.build([("jane", (1, 10))])
+    routes.users.build([])
+    routes.ready = True
+    monkeypatch.setattr(business_card, "slug_routes", routes)
+
+    client = fake_supabase(business_card, business_cards=[CARD])
+    card = asyncio.run(BusinessCardService.update_business_card(
+        card_id=1,
+        card_data=BusinessCardUpdate(slug="jane", title="CTO"),
+        current_user=USER,
+    ))
+    assert card["title"] == "CTO"
+    assert len(client.executed) == 1
+
+
+def test_new_photo_is_stored_and_the_old_one_released(fake_supabase, monkeypatch):
+    released = []
+
+    async def store(user_id, photo):
+        return "cas/ab/ab12_card.webp"
+
+    async def release_later(stored, card_id, replacement=None):
+        released.append((stored, card_id, replacement))
+
+    monkeypatch.setattr(business_card.BusinessCardsService, "_handle_photo_upload", staticmethod(store))
+    monkeypatch.setattr(business_card.BusinessCardsService, "_release_later", staticmethod(release_later))
+
+    fake_supabase(business_card, business_cards=[dict(CARD, photo_url="10/old.png")])
+    card = asyncio.run(BusinessCardService.update_business_card(
+        card_id=1,
+        card_data=BusinessCardUpdate(),
+        photo=SimpleNamespace(filename="me.png"),
+        current_user=USER,
+    ))
+    assert card["photo_url"].endswith("cas/ab/ab12_card.webp")
+    assert released == [("10/old.png", 1, "cas/ab/ab12_card.webp")]
+
+
+def test_slug_batches_are_split_to_fit_the_query_string(fake_supabase):
+    client = fake_supabase(business_card, users=[{"id": 1, "slug": "slug-3"}], business_cards=[{"id": 1, "slug": "slug-240"}])
+    slugs = [f"slug-{i}" for i in range(250)]
+
+    availability = asyncio.run(BusinessCardService.check_slugs_availability(slugs))
+
+    assert [slug for slug, available in availability.items() if not available] == ["slug-3", "slug-240"]
+    sizes = [len(args[1]) for table, calls in client.executed for method, args in calls if method == "in_"]
+    assert max(sizes) <= business_card.SLUG_QUERY_CHUNK
+    assert sum(sizes) == 2 * len(slugs)
@@ -0,0 +1,29 @@
+from datetime import datetime, timezone
+
+from app.core.http_cache import version_etag, is_not_modified, latest, http_date, validators
+
+UPDATED = "2024-01-01T12:00:00.123456+00:00"
+
+def test_version_etag_is_weak_and_tracks_versions():
+    etag = version_etag("cards", [(1, UPDATED)])
+    assert etag.startswith('W/"')
+    assert etag == version_etag("cards", [(1, UPDATED)])
+    assert etag != version_etag("cards", [(1, "2024-01-02T00:00:00+00:00")])
+
+def test_if_none_match_takes_precedence():
+    etag = version_etag("me", 1)
+    headers = {"if-none-match": etag, "if-modified-since": "Mon, 01 Jan 2001 00:00:00 GMT"}
+    assert is_not_modified(headers, etag, UPDATED)
+    assert not is_not_modified({"if-none-match": '"other"'}, etag, UPDATED)
+
+def test_if_modified_since_uses_second_resolution():
+    assert is_not_modified({"if-modified-since": "Mon, 01 Jan 2024 12:00:00 GMT"}, "x", UPDATED)
+    assert not is_not_modified({"if-modified-since": "Mon, 01 Jan 2024 11:59:59 GMT"}, "x", UPDATED)
+    assert not is_not_modified({"if-modified-since": "garbage"}, "x", UPDATED)
+
+def test_validators_and_latest():
+    newest = latest(UPDATED, None, "2023-06-01T00:00:00Z")
+    assert newest == datetime(2024, 1, 1, 12, 0, 0, 123456, tzinfo=timezone.utc)
+    headers = validators('W/"v"', newest)
+    assert headers["Last-Modified"] == http_date(UPDATED) == "Mon, 01 Jan 2024 12:00:00 GMT"
+    assert "Last-Modified" not in validators('W/"v"', None)
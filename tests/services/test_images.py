@@ -0,0 +1,104 @@
+import os
+import asyncio
+import tempfile
+
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+
+from app.services.images import ImagePipeline, render_variants, variant_urls, cas_path, cas_digest, derivative_paths
+from app.services.slug_resolver import public_profile
+
+def test_render_variants_resizes_and_strips_exif():
+    workdir = tempfile.mkdtemp()
+    source = os.path.join(workdir, "source")
+    exif = Image.Exif()
+    exif[0x010F] = "Camera Maker"
+    Image.new("RGB", (1200, 800), "red").save(source, "JPEG", exif=exif.tobytes())
+
+    rendered = render_variants(source, workdir, "abc", quality=80, avif=False)
+
+    sizes = {item["variant"]: (item["width"], item["height"]) for item in rendered}
+    assert sizes == {"thumb": (96, 64), "card": (320, 213), "retina": (640, 427)}
+    for item in rendered:
+        assert item["filename"] == f"abc_{item['variant']}.webp"
+        with Image.open(item["path"]) as out:
+            assert out.format == "WEBP"
+            assert not out.getexif()
+
+def test_small_images_are_not_upscaled():
+    workdir = tempfile.mkdtemp()
+    source = os.path.join(workdir, "source")
+    Image.new("RGBA", (50, 40)).save(source, "PNG")
+    rendered = render_variants(source, workdir, "abc", quality=80, avif=False)
+    assert {(item["width"], item["height"]) for item in rendered} == {(50, 40)}
+
+def render_in_pool(source, workdir):
+    pipeline = ImagePipeline(workers=1)
+    try:
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(pipeline.render(source, "abc", workdir))
+    finally:
+        pipeline.shutdown()
+    return exc.value.status_code
+
+def test_images_just_over_the_pixel_limit_are_refused(monkeypatch):
+    # Between 1x and 2x the limit Pillow only warns; the pool makes that an error
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 10_000)
+    workdir = tempfile.mkdtemp()
+    source = os.path.join(workdir, "source")
+    Image.new("RGB", (120, 100)).save(source, "PNG")
+    assert render_in_pool(source, workdir) == 413
+
+def test_undecodable_images_are_unsupported():
+    workdir = tempfile.mkdtemp()
+    source = os.path.join(workdir, "source")
+    with open(source, "wb") as out:
+        out.write(b"<html>not an image</html>")
+    assert render_in_pool(source, workdir) == 415
+
+def test_public_profile_uses_thumbnail_variant():
+    url = "https://x.supabase.co/storage/v1/object/public/user_profile_photos/1/abc_card.webp"
+    assert variant_urls(url)["retina"].endswith("/1/abc_retina.webp")
+    assert variant_urls("https://x/1/legacy.png") is None
+
+    resolved = {
+        "user": {"full_name": "Jane", "slug": "jane"},
+        "card": {"photo_url": url, "company_logo_url": "https://x/1/legacy.png"},
+    }
+    profile = public_profile(resolved)["profile"]
+    assert profile["photo_url"].endswith("/1/abc_thumb.webp")
+    assert profile["photo_variants"]["card"] == url
+    assert profile["company_logo_url"] == "https://x/1/legacy.png"
+    assert "company_logo_variants" not in profile
+
+def test_cas_paths():
+    url = "https://x.supabase.co/storage/v1/object/public/user_profile_photos/cas/ab/abcd_card.webp?t=1"
+    assert cas_path(url) == "cas/ab/abcd_card.webp"
+    assert cas_path("https://x/user_profile_photos/1/abc_card.webp") is None
+    assert cas_digest("cas/ab/abcd_card.webp") == "abcd"
+    assert "cas/ab/abcd_thumb.avif" in derivative_paths("cas/ab/abcd_card.webp")
+
+def test_identical_upload_is_not_stored_twice(monkeypatch):
+    import asyncio
+    import hashlib
+    from io import BytesIO
+    import httpx
+    from fastapi import UploadFile
+    from app.db import storage as storage_module
+    from app.services.user_profile import BusinessCardsService
+
+    data = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+    digest = hashlib.sha256(data).hexdigest()
+    requests = []
+
+    def handler(request):
+        requests.append((request.method, request.url.path))
+        return httpx.Response(200)
+
+    client = storage_module.StorageClient("https://x.supabase.co", "key", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr("app.services.user_profile.storage", client)
+
+    path = asyncio.run(BusinessCardsService._store_derivatives(UploadFile(BytesIO(data), size=len(data))))
+    assert path == f"cas/{digest[:2]}/{digest}_card.webp"
+    assert requests == [("HEAD", f"/storage/v1/object/user_profile_photos/{path}")]
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from app.services import jobs
+from app.services.jobs import JobQueue
+
+
+@pytest.fixture
+def outbox(fake_supabase):
+    return fake_supabase(jobs, jobs=[]).tables["jobs"]
+
+
+def test_successful_job_is_removed_from_outbox(outbox):
+    queue = JobQueue()
+    calls = []
+
+    async def handler(card_id):
+        calls.append(card_id)
+
+    queue.register("release", handler)
+
+    async def scenario():
+        await queue.enqueue("release", card_id=7)
+        assert len(outbox.rows) == 1
+        assert await queue.run(queue.queue.get_nowait())
+
+    asyncio.run(scenario())
+    assert calls == [7]
+    assert outbox.rows == {}
+
+
+def test_failed_job_is_retried_with_backoff_then_marked_failed(outbox):
+    queue = JobQueue(max_attempts=2, base_delay=60)
+
+    async def handler():
+        raise RuntimeError("storage down")
+
+    queue.register("flaky", handler)
+
+    async def scenario():
+        await queue.enqueue("flaky")
+        assert not await queue.run(queue.queue.get_nowait())
+        row = outbox.rows[1]
+        assert row["status"] == "pending" and row["last_error"] == "storage down"
+        # Not due again until the backoff has passed
+        assert await queue.claim_due(10) == []
+
+        row["run_at"] = "2000-01-01T00:00:00+00:00"
+        claimed = await queue.claim_due(10)
+        assert [job["attempts"] for job in claimed] == [2]
+        assert not await queue.run(claimed[0])
+
+    asyncio.run(scenario())
+    assert outbox.rows[1]["status"] == "failed"
+    assert queue.stats == {"enqueued": 1, "succeeded": 0, "retried": 1, "failed": 1}
+
+
+def test_claims_do_not_overlap(outbox):
+    first, second = JobQueue(), JobQueue()
+    outbox.add({"id": 1, "kind": "x", "payload": {}, "attempts": 3, "status": "pending",
+                "run_at": "2000-01-01T00:00:00+00:00"})
+
+    async def scenario():
+        return await first.claim_due(10), await second.claim_due(10)
+
+    claimed_first, claimed_second = asyncio.run(scenario())
+    assert [job["id"] for job in claimed_first] == [1]
+    assert claimed_second == []
+
+
+def test_unknown_kind_is_rejected(outbox):
+    with pytest.raises(ValueError):
+        asyncio.run(JobQueue().enqueue("nope"))
+
+
+def test_delayed_job_waits_in_the_outbox(outbox):
+    queue = JobQueue()
+
+    async def handler(card_id):
+        pass
+
+    queue.register("release", handler)
+
+    async def scenario():
+        await queue.enqueue("release", delay=3600, card_id=7)
+        assert queue.queue.empty()
+        assert await queue.claim_due(10) == []
+
+        outbox.rows[1]["run_at"] = "2000-01-01T00:00:00+00:00"
+        claimed = await queue.claim_due(10)
+        assert [(job["attempts"], job["payload"]) for job in claimed] == [(1, {"card_id": 7})]
+
+    asyncio.run(scenario())
@@ -0,0 +1,52 @@
+import time
+import asyncio
+
+from app.core.metrics import Exposition
+from app.core.loop_monitor import LoopMonitor
+
+def hog_the_loop():
+    time.sleep(0.3)
+
+def test_blocking_call_is_caught_with_its_stack():
+    monitor = LoopMonitor(interval=0.01, threshold=0.05)
+
+    async def main():
+        monitor.start()
+        await asyncio.sleep(0.05)
+        hog_the_loop()
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+    asyncio.run(main())
+
+    [(function, count)] = monitor.stalls.items()
+    assert function.endswith("test_loop_monitor:hog_the_loop") and count == 1
+    stall = monitor.recent[0]
+    assert "hog_the_loop" in stall["stack"][-1]
+    assert stall["blocked_ms"] >= 200
+    assert monitor.max_lag >= 0.2
+
+def test_quiet_loop_has_no_stalls():
+    monitor = LoopMonitor(interval=0.01, threshold=0.1)
+
+    async def main():
+        monitor.start()
+        await asyncio.sleep(0.1)
+        await monitor.stop()
+
+    asyncio.run(main())
+
+    assert monitor.stalls == {}
+    assert monitor.lag.series[()].count > 0
+
+def test_stalls_are_exposed_per_function():
+    monitor = LoopMonitor()
+    monitor.stalls["app.services.images:ImagePipeline.render"] = 2
+    monitor.lag.observe((), 0.002)
+    out = Exposition()
+    monitor.expose(out)
+    text = out.render()
+
+    assert 'event_loop_stalls_total{function="app.services.images:ImagePipeline.render"} 2' in text
+    assert 'event_loop_lag_seconds_bucket{le="0.005"} 1' in text
+    assert 'event_loop_lag_seconds_count 1' in text
@@ -0,0 +1,55 @@
+import gzip
+from starlette.requests import Request
+
+from app.core.http_cache import etag_matches, choose_encoding
+from app.services.profile_cache import PublicProfileCache
+from app.services.slug_routes import SlugRoutingTable
+
+def make_request(headers):
+    raw = [(k.lower().encode(), v.encode()) for k, v in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+CARD = {"id": 1, "user_id": 10, "slug": "jane", "updated_at": "2024-01-01T00:00:00+00:00"}
+PROFILE = {"full_name": "Jane", "slug": "jane", "profile": {"display_name": "Jane"}}
+
+def test_etag_and_encoding_negotiation():
+    assert etag_matches('W/"abc", "def"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches(None, '"abc"')
+    assert choose_encoding("gzip;q=0.5, identity", ("gzip",)) == "gzip"
+    assert choose_encoding("gzip;q=0", ("gzip",)) is None
+    assert choose_encoding("*", ("gzip",)) == "gzip"
+
+def test_cached_payload_serves_gzip_and_304():
+    cache = PublicProfileCache()
+    payload = cache.put("jane", PROFILE, CARD)
+
+    response = payload.response(make_request({"accept-encoding": "gzip"}))
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(response.body) == payload.body
+    assert response.headers["last-modified"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+    assert response.headers["etag"] == f"W/{payload.etag}"
+    assert payload.response(make_request({})).headers["etag"] == payload.etag
+
+    response = payload.response(make_request({"if-none-match": payload.etag}))
+    assert response.status_code == 304
+    response = payload.response(make_request({"if-none-match": f"W/{payload.etag}", "accept-encoding": "gzip"}))
+    assert response.status_code == 304
+
+def test_routing_table_changes_invalidate_cache():
+    table = SlugRoutingTable()
+    cache = PublicProfileCache()
+    table.add_listener(cache.on_change)
+    cache.put("jane", PROFILE, CARD)
+    cache.put("jane-card", PROFILE, {"id": 2, "user_id": 10})
+
+    table.set_card("jane-card", 2, 10)
+    assert cache.get("jane") is None
+    assert cache.get("jane-card") is None
+
+def test_lru_eviction():
+    cache = PublicProfileCache(max_entries=1)
+    cache.put("jane", PROFILE, CARD)
+    cache.put("bob", PROFILE, {"id": 2, "user_id": 20})
+    assert cache.get("jane") is None
+    assert cache.get("bob") is not None
@@ -0,0 +1,46 @@
+import json
+import asyncio
+
+import pytest
+
+from app.services import qr_regen
+from app.services.qr_regen import QRRegeneration
+
+
+@pytest.fixture
+def cards(fake_supabase):
+    client = fake_supabase(qr_regen, business_cards=[
+        {"id": i, "slug": f"card-{i}", "qr_code_url": f"https://yourdomain.com/profile/card-{i}"} for i in range(1, 6)
+    ])
+    table = client.tables["business_cards"]
+    table.rows[3]["qr_code_url"] = "https://kinvo.app/card-3"
+    return table
+
+
+def test_rewrites_stale_urls_and_records_progress(cards, tmp_path):
+    state = tmp_path / "state.json"
+    report = asyncio.run(QRRegeneration("https://kinvo.app/", str(state), page_size=2).run())
+
+    assert sorted(cards.updated) == [1, 2, 4, 5]
+    assert all(row["qr_code_url"] == f"https://kinvo.app/{row['slug']}" for row in cards.rows.values())
+    assert report["scanned"] == 5 and report["current"] == 1 and report["updated"] == 4
+    assert json.loads(state.read_text())["complete"] is True
+
+
+def test_resumes_after_last_completed_card(cards, tmp_path):
+    state = tmp_path / "state.json"
+    state.write_text(json.dumps({"base_url": "https://kinvo.app", "last_id": 2}))
+    asyncio.run(QRRegeneration("https://kinvo.app", str(state), page_size=2).run())
+    assert sorted(cards.updated) == [4, 5]
+
+    # Progress for a different base URL doesn't apply
+    cards.updated.clear()
+    asyncio.run(QRRegeneration("https://other.app", str(state), page_size=2).run())
+    assert sorted(cards.updated) == [1, 2, 3, 4, 5]
+
+
+def test_dry_run_changes_nothing(cards, tmp_path):
+    report = asyncio.run(QRRegeneration("https://kinvo.app", str(tmp_path / "state.json"), dry_run=True).run())
+    assert report["updated"] == 4
+    assert cards.updated == []
+    assert not (tmp_path / "state.json").exists()
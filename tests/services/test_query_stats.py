@@ -0,0 +1,64 @@
+import json
+import asyncio
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.logs import JsonFormatter
+from app.db import session
+from app.db.session import InstrumentedClient, QueryStats, run_query
+
+
+class FakeBuilder:
+    """Chains like a PostgREST builder and returns fixed rows"""
+
+    def __init__(self, rows, fail=False):
+        self.rows = rows
+        self.fail = fail
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+    def execute(self):
+        if self.fail:
+            raise RuntimeError("connection reset")
+        return SimpleNamespace(data=self.rows)
+
+
+@pytest.fixture
+def stats(monkeypatch):
+    fresh = QueryStats(slow_ms=10_000)
+    monkeypatch.setattr(session, "query_stats", fresh)
+    return fresh
+
+
+def load_cards(client):
+    return client.table("business_cards").select("id, slug").eq("user_id", 7).or_("a.eq.1,b.eq.2").order("id").limit(10).execute()
+
+
+def test_records_table_operation_filter_shape_and_call_site(stats):
+    client = InstrumentedClient(SimpleNamespace(table=lambda name: FakeBuilder([{"id": 1}, {"id": 2}])))
+    load_cards(client)
+    asyncio.run(run_query(client.table("users").select("id")))
+
+    [top, other] = sorted(stats.snapshot(), key=lambda call: call["target"])
+    assert top["target"] == "business_cards" and top["op"] == "select"
+    assert top["filters"] == "eq(user_id),or,order(id),limit"
+    # Captured where the query was built, not in the worker thread that ran it
+    assert top["caller"].endswith("test_query_stats:load_cards")
+    assert top["rows"] == 2
+    assert other["caller"].endswith(":test_records_table_operation_filter_shape_and_call_site")
+
+
+def test_slow_and_failed_calls_are_logged(stats, caplog):
+    stats.slow_ms = 0
+    client = InstrumentedClient(SimpleNamespace(table=lambda name: FakeBuilder([], fail=True)))
+    with caplog.at_level(logging.WARNING, logger="app.db.slow_queries"):
+        with pytest.raises(RuntimeError):
+            client.table("jobs").delete().eq("id", 3).execute()
+
+    entry = json.loads(JsonFormatter().format(caplog.records[0]))
+    assert entry["message"] == "slow_query"
+    assert (entry["target"], entry["op"], entry["filters"], entry["error"]) == ("jobs", "delete", "eq(id)", True)
+    assert stats.snapshot()[0]["errors"] == 1
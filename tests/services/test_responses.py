@@ -0,0 +1,30 @@
+from decimal import Decimal
+
+import orjson
+import pytest
+from pydantic import BaseModel, EmailStr, HttpUrl
+
+from app.core.responses import dumps
+
+
+class Card(BaseModel):
+    email: EmailStr
+    website: HttpUrl
+
+
+def test_known_types_are_encoded():
+    card = Card(email="jane@example.com", website="https://example.com")
+    body = orjson.loads(dumps({"card": card, "website": card.website, "price": Decimal("9.50"), "count": Decimal("3")}))
+    assert body == {
+        "card": {"email": "jane@example.com", "website": "https://example.com/"},
+        "website": "https://example.com/",
+        "price": 9.5,
+        "count": 3,
+    }
+
+
+def test_unknown_types_fail_instead_of_turning_into_strings():
+    with pytest.raises(TypeError):
+        dumps({"photo": b"\x89PNG"})
+    with pytest.raises(TypeError):
+        dumps({"value": object()})
@@ -0,0 +1,113 @@
+import json
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.db.storage import StorageClient
+from app.services import business_card
+from app.services.business_card import BusinessCardService
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 100
+
+
+class LocalStorage:
+    """Stand-in for Supabase Storage: signed uploads, HEAD, ranged GET and delete"""
+
+    def __init__(self):
+        self.objects = {}
+        self.signed = set()
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path.removeprefix("/storage/v1")
+        if request.method == "POST" and path.startswith("/object/upload/sign/"):
+            key = path.removeprefix("/object/upload/sign/")
+            self.signed.add(key)
+            return httpx.Response(200, json={"url": f"/object/upload/sign/{key}?token=t"})
+        if request.method == "PUT" and path.startswith("/object/upload/sign/"):
+            key = path.removeprefix("/object/upload/sign/")
+            if key not in self.signed or request.url.params.get("token") != "t":
+                return httpx.Response(403)
+            self.objects[key] = request.read()
+            return httpx.Response(200, json={"Key": key})
+        key = path.removeprefix("/object/")
+        if request.method == "DELETE":
+            for prefix in json.loads(request.read())["prefixes"]:
+                self.objects.pop(f"{key}/{prefix}", None)
+            return httpx.Response(200, json=[])
+        if key not in self.objects:
+            return httpx.Response(400, json={"error": "not_found"})
+        body = self.objects[key]
+        if request.method == "HEAD":
+            return httpx.Response(200, headers={"content-length": str(len(body)), "content-type": "image/png"})
+        end = int(request.headers["range"].split("-")[1]) + 1
+        return httpx.Response(206, content=body[:end])
+
+
+@pytest.fixture
+def local_storage(monkeypatch):
+    stand_in = LocalStorage()
+    client = StorageClient("https://x.supabase.co", "key", transport=httpx.MockTransport(stand_in))
+    monkeypatch.setattr(business_card, "storage", client)
+    return stand_in
+
+
+@pytest.fixture
+def cards(fake_supabase):
+    client = fake_supabase(business_card, business_cards=[{"id": 1, "user_id": 10, "slug": "jane", "photo_url": None}])
+    return client.tables["business_cards"].rows[1]
+
+
+@pytest.fixture
+def released(monkeypatch):
+    calls = []
+
+    async def release_later(stored, card_id, replacement=None):
+        calls.append((stored, card_id, replacement))
+
+    monkeypatch.setattr(business_card.BusinessCardsService, "_release_later", staticmethod(release_later))
+    return calls
+
+
+def put(stand_in, url, body):
+    """The client's direct upload, which never touches the API"""
+    return httpx.Client(transport=httpx.MockTransport(stand_in)).put(url, content=body)
+
+
+def test_sign_upload_then_attach(local_storage, cards, released):
+    signed = asyncio.run(BusinessCardService.sign_upload(10, "image/png"))
+    assert signed["path"].startswith("10/uploads/") and signed["path"].endswith(".png")
+    assert put(local_storage, signed["upload_url"], PNG).status_code == 200
+
+    card = asyncio.run(BusinessCardService.attach_upload(1, 10, "photo", signed["path"], max_bytes=1024))
+    assert card["slug"] == "jane"
+    # The canonical path is stored; the public URL is built when the card is read
+    assert cards["photo_url"] == signed["path"]
+    assert released == []
+
+
+def test_reupload_releases_the_replaced_image(local_storage, cards, released):
+    cards["photo_url"] = "10/uploads/old.png"
+    signed = asyncio.run(BusinessCardService.sign_upload(10, "image/png"))
+    put(local_storage, signed["upload_url"], PNG)
+
+    asyncio.run(BusinessCardService.attach_upload(1, 10, "photo", signed["path"], max_bytes=1024))
+    assert cards["photo_url"] == signed["path"]
+    assert released == [("10/uploads/old.png", 1, signed["path"])]
+
+
+def test_attach_rejects_foreign_paths(local_storage):
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(BusinessCardService.attach_upload(1, 10, "photo", "11/uploads/a.png", max_bytes=1024))
+    assert exc.value.status_code == 403
+
+
+def test_attach_deletes_mislabelled_upload(local_storage, cards):
+    signed = asyncio.run(BusinessCardService.sign_upload(10, "image/png"))
+    put(local_storage, signed["upload_url"], b"<html>not an image</html>" * 4)
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(BusinessCardService.attach_upload(1, 10, "photo", signed["path"], max_bytes=1024))
+    assert exc.value.status_code == 415
+    assert f"user_profile_photos/{signed['path']}" not in local_storage.objects
@@ -0,0 +1,43 @@
+from app.services.slug_index import SlugIndex, validate_slug, slugify
+
+def make_index(*slugs):
+    index = SlugIndex()
+    index.load(slugs)
+    return index
+
+def test_prefix_lookup():
+    index = make_index("jane", "jane-doe", "jane1", "janet", "john")
+    assert index.with_prefix("jane") == ["jane", "jane-doe", "jane1", "janet"]
+    assert index.with_prefix("x") == []
+
+def test_add_and_discard():
+    index = make_index("jane")
+    index.add("amy")
+    assert "amy" in index
+    index.discard("jane")
+    assert "jane" not in index
+    assert len(index) == 1
+
+def test_candidates_skip_taken_numeric_suffixes():
+    index = make_index("jane", "jane1", "jane-1", "jane2")
+    candidates = index.candidates("jane")
+    assert "jane1" not in candidates
+    assert "jane2" not in candidates
+    assert "jane-2" in candidates
+
+def test_candidates_are_ranked_title_first():
+    index = make_index("jane")
+    candidates = index.candidates("jane", title="Product Designer")
+    assert candidates[0] == "jane-product"
+    assert "jane-pd" in candidates
+    assert all(validate_slug(c) is None for c in candidates)
+
+def test_candidates_respect_max_length():
+    index = make_index("a" * 20)
+    assert all(len(c) <= 20 for c in index.candidates("a" * 20, title="Engineer"))
+
+def test_validate_and_slugify():
+    assert validate_slug("jane doe") == "Slug cannot contain spaces"
+    assert validate_slug("jane_doe") is not None
+    assert validate_slug("jane-doe") is None
+    assert slugify("The Jane Doe Studio!") == "the-jane-doe-studio"
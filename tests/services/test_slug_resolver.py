@@ -0,0 +1,84 @@
+import asyncio
+import time
+from app.services import slug_resolver
+from app.services.slug_resolver import SlugResolver, public_profile
+from app.services.slug_routes import SlugRoutingTable
+
+CARD = {"id": 1, "user_id": 10, "slug": "jane", "display_name": "Jane", "contact": '{"phone": "1"}'}
+USER = {"id": 10, "email": "jane@example.com", "full_name": "Jane Doe", "slug": "jane"}
+
+def test_card_slug_is_resolved_before_user_slug(monkeypatch):
+    resolver = SlugResolver()
+    monkeypatch.setattr(SlugResolver, "_by_card_slug", staticmethod(lambda *args: {"user": USER, "card": dict(CARD)}))
+    monkeypatch.setattr(SlugResolver, "_by_user_slug", staticmethod(lambda *args: (_ for _ in ()).throw(AssertionError("not reached"))))
+
+    resolved = asyncio.run(resolver.resolve("jane"))
+    assert resolved["card"]["id"] == 1
+    assert resolver.stats["card_hits"] == 1
+
+def test_falls_back_to_user_slug(monkeypatch):
+    resolver = SlugResolver()
+    monkeypatch.setattr(SlugResolver, "_by_card_slug", staticmethod(lambda *args: None))
+    monkeypatch.setattr(SlugResolver, "_by_user_slug", staticmethod(lambda *args: {"user": USER, "card": None}))
+
+    resolved = asyncio.run(resolver.resolve("jane"))
+    assert resolved["user"]["id"] == 10
+    assert resolver.stats["user_hits"] == 1
+
+def test_slug_missing_from_routing_table_is_still_looked_up(monkeypatch):
+    # Created on another worker since this worker's last poll
+    routes = SlugRoutingTable()
+    routes.cards.build([])
+    routes.users.build([])
+    routes.ready = True
+    monkeypatch.setattr(slug_resolver, "slug_routes", routes)
+    monkeypatch.setattr(SlugResolver, "_by_card_slug", staticmethod(lambda *args: None))
+    monkeypatch.setattr(SlugResolver, "_by_user_slug", staticmethod(lambda *args: {"user": USER, "card": None}))
+
+    resolved = asyncio.run(SlugResolver().resolve("jane"))
+    assert resolved["user"]["id"] == 10
+
+def test_concurrent_lookups_are_coalesced(monkeypatch):
+    resolver = SlugResolver()
+    calls = []
+
+    def slow_lookup(slug, *args):
+        calls.append(slug)
+        time.sleep(0.05)
+        return {"user": USER, "card": dict(CARD)}
+
+    monkeypatch.setattr(SlugResolver, "_by_card_slug", staticmethod(slow_lookup))
+
+    async def run():
+        return await asyncio.gather(*(resolver.resolve("jane") for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(r["card"]["id"] == 1 for r in results)
+    assert resolver.stats["coalesced"] == 4
+
+def test_first_caller_going_away_does_not_cancel_the_others(monkeypatch):
+    resolver = SlugResolver()
+
+    def slow_lookup(slug, *args):
+        time.sleep(0.05)
+        return {"user": USER, "card": dict(CARD)}
+
+    monkeypatch.setattr(SlugResolver, "_by_card_slug", staticmethod(slow_lookup))
+
+    async def run():
+        first = asyncio.create_task(resolver.resolve("jane"))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(resolver.resolve("jane"))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    resolved = asyncio.run(run())
+    assert resolved["card"]["id"] == 1
+    assert resolver._in_flight == {}
+
+def test_public_profile_hides_private_fields():
+    profile = public_profile({"user": USER, "card": dict(CARD, contact={"phone": "1"})})
+    assert "email" not in profile
+    assert profile["profile"]["slug"] == "jane"
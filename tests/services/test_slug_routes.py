@@ -0,0 +1,87 @@
+import asyncio
+
+from app.services import slug_routes
+from app.services.slug_routes import CompactSlugMap, SlugRoutingTable, MISSING
+
+def test_compact_map_lookup():
+    m = CompactSlugMap(width=2)
+    m.build([("jane", (1, 10)), ("amy", (2, 20)), ("zoe", (3, 30))])
+    assert m.get("amy") == (2, 20)
+    assert m.get("zoe") == (3, 30)
+    assert m.get("bob") is None
+    assert len(m) == 3
+
+def test_compact_map_overlay_and_compact():
+    m = CompactSlugMap(width=1, overlay_limit=2)
+    m.build([("jane", (1,))])
+    m.set("bob", (2,))
+    m.delete("jane")
+    assert m.get("jane") is None
+    assert m.get("bob") == (2,)
+    m.set("carl", (3,))  # exceeds the overlay limit and compacts
+    assert dict(m.items()) == {"bob": (2,), "carl": (3,)}
+
+def test_routing_table_not_ready_returns_none():
+    table = SlugRoutingTable()
+    assert table.card("jane") is None
+    assert table.user("jane") is None
+
+def test_routing_table_write_through():
+    table = SlugRoutingTable()
+    table.cards.build([("jane", (1, 10))])
+    table.users.build([("jane", (10,))])
+    table.ready = True
+    assert table.card("jane") == (1, 10)
+    assert table.user("jane") == 10
+    assert table.card("bob") is MISSING
+
+    table.set_card("jane-doe", 1, 10, old_slug="jane")
+    assert table.card("jane") is MISSING
+    assert table.card("jane-doe") == (1, 10)
+
+def test_footprint_report():
+    table = SlugRoutingTable()
+    table.cards.build((f"slug-{i}", (i, i)) for i in range(1000))
+    report = table.footprint()
+    assert report["entries"] == 1000
+    assert report["bytes_per_slug"] < 60
+
+def test_poll_applies_each_change_once(fake_supabase):
+    client = fake_supabase(slug_routes, business_cards=[
+        {"id": 1, "user_id": 10, "slug": "jane", "updated_at": "2024-01-01T00:00:00"},
+    ], users=[])
+    table = SlugRoutingTable()
+    changed = []
+    table.add_listener(lambda name, row: changed.append(row.get("slug")))
+
+    async def scenario():
+        await table.load()
+        client.tables["business_cards"].add({"id": 2, "user_id": 20, "slug": "amy", "updated_at": "2024-01-02T00:00:00"})
+        assert await table.poll() == 1
+        # The newest row matches the >= watermark again but was already applied
+        assert await table.poll() == 0
+
+    asyncio.run(scenario())
+    assert table.card("amy") == (2, 20)
+    assert changed == ["amy"]
+
+def test_full_reload_notifies_changed_and_vanished_slugs(fake_supabase):
+    client = fake_supabase(slug_routes, business_cards=[
+        {"id": 1, "user_id": 10, "slug": "jane", "updated_at": "2024-01-01T00:00:00"},
+        {"id": 2, "user_id": 20, "slug": "amy", "updated_at": "2024-01-01T00:00:00"},
+    ], users=[])
+    table = SlugRoutingTable()
+    changed = []
+    table.add_listener(lambda name, row: changed.append(row["slug"]))
+
+    async def scenario():
+        await table.load()
+        cards = client.tables["business_cards"].rows
+        cards[1].update(slug="jane-doe", updated_at="2024-01-02T00:00:00")
+        del cards[2]
+        await table.load()
+
+    asyncio.run(scenario())
+    assert sorted(changed) == ["amy", "jane", "jane-doe"]
+    assert table.card("jane") is MISSING
+    assert table.card("jane-doe") == (1, 10)
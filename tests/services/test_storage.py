@@ -0,0 +1,63 @@
+import asyncio
+from io import BytesIO
+
+import httpx
+from fastapi import UploadFile
+from starlette.datastructures import Headers
+
+from app.db.storage import StorageClient, StorageError, iter_upload, public_url, object_path, expand_image_urls
+
+def make_upload(data: bytes) -> UploadFile:
+    return UploadFile(BytesIO(data), size=len(data), filename="me.png", headers=Headers({"content-type": "image/png"}))
+
+def test_upload_streams_in_bounded_chunks():
+    seen = {}
+
+    async def handler(request: httpx.Request):
+        chunks = [chunk async for chunk in request.stream]
+        seen.update(url=str(request.url), headers=request.headers, chunks=chunks)
+        return httpx.Response(200, json={"Key": "user_profile_photos/1/a.png"})
+
+    data = b"x" * (1024 * 1024 + 10)
+    client = StorageClient("https://x.supabase.co", "key", transport=httpx.MockTransport(handler))
+    result = asyncio.run(client.upload("user_profile_photos", "1/a.png", make_upload(data)))
+
+    assert result["Key"] == "user_profile_photos/1/a.png"
+    assert seen["url"] == "https://x.supabase.co/storage/v1/object/user_profile_photos/1/a.png"
+    assert seen["headers"]["content-length"] == str(len(data))
+    assert seen["headers"]["content-type"] == "image/png"
+    assert b"".join(seen["chunks"]) == data
+
+def test_iter_upload_yields_bounded_chunks():
+    async def collect():
+        return [chunk async for chunk in iter_upload(make_upload(b"x" * 1000), chunk_size=300)]
+
+    chunks = asyncio.run(collect())
+    assert [len(chunk) for chunk in chunks] == [300, 300, 300, 100]
+
+def test_upload_error_raises():
+    transport = httpx.MockTransport(lambda request: httpx.Response(409, text="Duplicate"))
+    client = StorageClient("https://x.supabase.co", "key", transport=transport)
+    try:
+        asyncio.run(client.upload("user_profile_photos", "1/a.png", make_upload(b"x")))
+    except StorageError as e:
+        assert e.status_code == 409
+    else:
+        raise AssertionError("expected StorageError")
+
+def test_public_url_is_built_from_stored_path():
+    url = public_url("cas/ab/ab12_card.webp")
+    assert url.endswith("/storage/v1/object/public/user_profile_photos/cas/ab/ab12_card.webp")
+    assert object_path(url) == "cas/ab/ab12_card.webp"
+
+def test_legacy_urls_pass_through():
+    legacy = "https://x.supabase.co/storage/v1/object/public/user_profile_photos/7/a.png?"
+    assert public_url(legacy) == legacy
+    assert public_url("/uploads/placeholder.jpg") == "/uploads/placeholder.jpg"
+    assert object_path(legacy) == "7/a.png"
+
+def test_expand_image_urls():
+    card = expand_image_urls({"id": 1, "photo_url": "7/a.png", "company_logo_url": None})
+    assert card["photo_url"] == public_url("7/a.png")
+    assert card["company_logo_url"] is None
+    assert expand_image_urls(None) is None
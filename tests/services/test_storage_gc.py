@@ -0,0 +1,96 @@
+import json
+import asyncio
+
+import httpx
+import pytest
+
+from app.db.storage import StorageClient
+from app.services import storage_gc
+from app.services.storage_gc import StorageGC
+
+OLD = "2020-01-01T00:00:00Z"
+NEW = "2999-01-01T00:00:00Z"
+SHA = "ab" + "0" * 62
+GONE = "ab" + "1" * 62
+
+
+class Bucket:
+    """Stand-in for the Storage list and delete endpoints over flat object paths"""
+
+    def __init__(self, objects):
+        self.objects = dict(objects)
+        self.deleted = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.read())
+        if request.method == "DELETE":
+            for path in body["prefixes"]:
+                self.objects.pop(path, None)
+            self.deleted.extend(body["prefixes"])
+            return httpx.Response(200, json=[])
+
+        prefix = f"{body['prefix']}/" if body["prefix"] else ""
+        entries = {}
+        for path, created in self.objects.items():
+            if not path.startswith(prefix):
+                continue
+            name, _, rest = path[len(prefix):].partition("/")
+            if rest:
+                entries[name] = {"name": name, "id": None}
+            else:
+                entries[name] = {"name": name, "id": path, "created_at": created, "metadata": {"size": 10}}
+        page = [entries[name] for name in sorted(entries)][body["offset"]:body["offset"] + body["limit"]]
+        return httpx.Response(200, json=page)
+
+
+@pytest.fixture
+def bucket():
+    return Bucket({
+        f"cas/ab/{SHA}_card.webp": OLD,
+        f"cas/ab/{SHA}_thumb.webp": OLD,
+        f"cas/ab/{GONE}_card.webp": OLD,
+        f"cas/ab/{GONE}_thumb.webp": OLD,
+        "7/legacy.png": OLD,
+        "7/replaced.png": OLD,
+        "7/company_logos/.placeholder": OLD,
+        "7/uploads/pending.png": NEW,
+        "7/uploads/abandoned.png": OLD,
+        "not-a-user/file.png": OLD,
+    })
+
+
+@pytest.fixture
+def cards(fake_supabase):
+    return fake_supabase(storage_gc, business_cards=[
+        {"id": 1, "user_id": 7, "photo_url": f"cas/ab/{SHA}_card.webp",
+         "company_logo_url": "https://x.supabase.co/storage/v1/object/public/user_profile_photos/7/legacy.png?"},
+    ])
+
+
+def run_gc(bucket, **kwargs):
+    client = StorageClient("https://x.supabase.co", "key", transport=httpx.MockTransport(bucket))
+    return asyncio.run(StorageGC(client=client, page_size=2, **kwargs).run())
+
+
+def test_dry_run_reports_orphans_without_deleting(bucket, cards):
+    report = run_gc(bucket, dry_run=True)
+
+    assert report["orphans"] == 4
+    assert report["deleted"] == 0
+    assert bucket.deleted == []
+
+
+def test_collects_only_unreferenced_old_objects(bucket, cards):
+    report = run_gc(bucket)
+
+    assert sorted(bucket.deleted) == sorted([
+        f"cas/ab/{GONE}_card.webp", f"cas/ab/{GONE}_thumb.webp", "7/replaced.png", "7/uploads/abandoned.png",
+    ])
+    # Every derivative of a referenced image is kept, as are recent uploads and placeholders
+    assert f"cas/ab/{SHA}_thumb.webp" in bucket.objects
+    assert "7/uploads/pending.png" in bucket.objects
+    assert "7/company_logos/.placeholder" in bucket.objects
+    assert "not-a-user/file.png" in bucket.objects
+    assert report["objects"] == 9
+    assert report["deleted"] == 4
+    assert report["shards"] == 2